@@ -12,3 +12,14 @@ class CacheMixin(APIView):
             return cache_page(settings.CACHE_TIMEOUT)(view)
         else:
             return view
+
+
+def uncached_view(func):
+    """
+        The view behind func without CacheMixin's cache_page, for callers
+        doing their own caching or needing fresh responses.
+    """
+    view_class = getattr(func, 'cls', None)
+    if view_class is None:
+        return func
+    return APIView.as_view.__func__(view_class)
@@ -1,4 +1,74 @@
+import json
+import base64
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
 from rest_framework.pagination import PaginationSerializer
+from common.utils import get_data_epoch
 
 class KLPPaginationSerializer(PaginationSerializer):
-    results_field = 'features'
\ No newline at end of file
+    results_field = 'features'
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps([
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in values
+    ]))
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(str(cursor)))
+    except (TypeError, ValueError):
+        raise ParseError("Invalid cursor.")
+
+
+def keyset_filter(ordering, values):
+    '''
+        Q for the rows after values in ordering, e.g. for
+        ('-date', '-id') that is date < d OR (date = d AND id < i)
+    '''
+    q = None
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = '%s__lt' % name if field.startswith('-') else '%s__gt' % name
+        condition = Q(**dict(equal, **{lookup: value}))
+        q = condition if q is None else q | condition
+        equal[name] = value
+    return q
+
+
+def get_approximate_count(queryset):
+    '''
+        Total for cursor paginated lists. Unfiltered tables use the planner
+        estimate, filtered ones are counted once per data epoch.
+    '''
+    if not hasattr(queryset, 'query'):
+        return len(queryset)
+
+    if not queryset.query.where:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE relname = %s",
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+
+    try:
+        sql = str(queryset.query)
+    except Exception:
+        return queryset.count()
+    key = 'count_%s' % hashlib.md5(
+        "%s:%s" % (get_data_epoch(), sql.encode('utf-8'))).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.CACHE_TIMEOUT)
+    return count
@@ -0,0 +1,78 @@
+import threading
+from django.conf import settings
+from django.db import connection, close_old_connections
+from common.utils import LazyThreadPool
+
+query_pool = LazyThreadPool(settings.REPORT_QUERY_WORKERS or 1)
+
+_local = threading.local()
+
+
+class QueryBatch(object):
+    """
+        Independent queries that are run together, each on its own
+        connection from a bounded pool of threads. Queries are added under
+        a name and run() returns the results by name:
+
+            batch = QueryBatch()
+            batch.count('num_schools', schools)
+            batch.aggregate('boys', schools, num_boys=Sum('boys_count'))
+            results = batch.run()
+
+        Batches made while running another batch's query, or with
+        REPORT_QUERY_WORKERS = 0, run their queries one after another.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def call(self, name, func, *args, **kwargs):
+        self.queries.append((name, func, args, kwargs))
+
+    def count(self, name, queryset):
+        self.call(name, queryset.count)
+
+    def exists(self, name, queryset):
+        self.call(name, queryset.exists)
+
+    def aggregate(self, name, queryset, *args, **kwargs):
+        self.call(name, queryset.aggregate, *args, **kwargs)
+
+    def list(self, name, queryset):
+        self.call(name, list, queryset)
+
+    def sql(self, name, sql, params=None):
+        self.call(name, fetch_sql, sql, params)
+
+    def run(self, parallel=None):
+        if parallel is None:
+            parallel = settings.REPORT_QUERY_WORKERS > 0 and \
+                not getattr(_local, 'in_batch', False)
+        if not parallel or len(self.queries) < 2:
+            return dict(
+                (name, func(*args, **kwargs))
+                for name, func, args, kwargs in self.queries
+            )
+
+        pending = [
+            (name, query_pool.get().apply_async(run_query, (func, args, kwargs)))
+            for name, func, args, kwargs in self.queries
+        ]
+        # get() re-raises the first failed query's exception
+        return dict((name, result.get()) for name, result in pending)
+
+
+def run_query(func, args, kwargs):
+    _local.in_batch = True
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _local.in_batch = False
+        # closes the thread's connection only past CONN_MAX_AGE or on error
+        close_old_connections()
+
+
+def fetch_sql(sql, params=None):
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    return cursor.fetchall()
@@ -1,9 +1,21 @@
+from django.utils.datastructures import SortedDict
+from django.utils.encoding import force_text, is_protected_type
 from rest_framework import serializers
+from rest_framework.fields import get_component
 from rest_framework.renderers import JSONRenderer
 from drf_compound_fields.fields import DictField
 
 
 class KLPSerializer(serializers.ModelSerializer):
+    """
+        fields=a,b and omit=c in the query params trim the fields returned.
+        Fields left out are not computed at all, and views building their
+        querysets with with_related() skip the joins and prefetches listed
+        for them in field_lookups.
+    """
+    # {field name: {'select_related': (...), 'prefetch_related': (...)}}
+    field_lookups = {}
+
     # geometry = DictField(source='get_geometry')
     def __init__(self, *args, **kwargs):
         super(KLPSerializer, self).__init__(*args, **kwargs)
@@ -14,6 +26,45 @@ class KLPSerializer(serializers.ModelSerializer):
             if geometry == 'yes':
                 self.fields['geometry'] = DictField(source='get_geometry')
 
+            for name in self.fields.keys():
+                if not self.is_requested(request, name):
+                    del self.fields[name]
+
+    @classmethod
+    def is_requested(cls, request, name):
+        if name == 'geometry':
+            return request.GET.get('geometry', 'no') == 'yes'
+        # writes always get every field
+        if request.method != 'GET':
+            return True
+        fields = request.GET.get('fields', '')
+        if fields and name not in fields.split(','):
+            return False
+        return name not in request.GET.get('omit', '').split(',')
+
+    @classmethod
+    def related_lookups(cls, request):
+        select_related = set()
+        prefetch_related = set()
+        for name, lookups in cls.field_lookups.items():
+            if cls.is_requested(request, name):
+                select_related.update(lookups.get('select_related', ()))
+                prefetch_related.update(lookups.get('prefetch_related', ()))
+        return sorted(select_related), sorted(prefetch_related)
+
+    @classmethod
+    def with_related(cls, queryset, request):
+        """
+            Adds the select_related and prefetch_related the requested fields
+            need to queryset.
+        """
+        select_related, prefetch_related = cls.related_lookups(request)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
 
 class KLPSimpleGeoSerializer(serializers.ModelSerializer):
 
@@ -30,3 +81,109 @@ class KLPSimpleGeoSerializer(serializers.ModelSerializer):
 
             if geometry == 'yes' and simplify == 'yes':
                 self.fields['geometry'] = DictField(source='get_simple_geometry')
+
+
+class BatchMixin(object):
+    """
+        Hands every object of a list to prepare() before serializing any of
+        them, so that what the rows need from other tables can be loaded for
+        the whole page at once.
+    """
+
+    def prepare(self, objects):
+        pass
+
+    def to_native_list(self, objects):
+        objects = list(objects)
+        self.prepare(objects)
+        return [self.to_native(obj) for obj in objects]
+
+    def field_to_native(self, obj, field_name):
+        # as the results of a page
+        return self.to_native_list(get_component(obj, self.source or field_name))
+
+    @property
+    def data(self):
+        if self._data is None:
+            many = self.many
+            if many is None:
+                many = hasattr(self.object, '__iter__')
+            if many:
+                self._data = self.to_native_list(self.object)
+            else:
+                self._data = self.to_native_list([self.object])[0]
+        return self._data
+
+
+def to_simple(value):
+    # what the DRF fields make of a plain column value
+    if value is None or is_protected_type(value):
+        return value
+    return force_text(value)
+
+
+class ValuesSerializer(BatchMixin, serializers.Serializer):
+    """
+        Read-only stand-in for a model serializer on long lists. Rows come
+        from values_list() and are turned straight into dicts, without model
+        instances or per field serialization, giving the same output.
+
+        columns are (output name, lookup) pairs in output order. Dotted names
+        nest, e.g. ('type.name', 'schooldetails__type__name'). A lookup can
+        be a tuple of lookups, whose values are passed to the transforms entry
+        of the name. Nested objects in nullable are None when their id is,
+        like a nested serializer over a missing relation.
+    """
+    columns = ()
+    transforms = {}
+    nullable = ()
+
+    def __init__(self, *args, **kwargs):
+        super(ValuesSerializer, self).__init__(*args, **kwargs)
+        request = self.context.get('request')
+        self.plan = []
+        position = 0
+        for name, lookup in self.columns:
+            width = len(lookup) if isinstance(lookup, tuple) else 1
+            path = name.split('.')
+            if request is None or KLPSerializer.is_requested(request, path[0]):
+                self.plan.append(
+                    (path, position, width, self.transforms.get(name)))
+            position += width
+
+    @classmethod
+    def can_serve(cls, request):
+        return request.GET.get('geometry', 'no') != 'yes'
+
+    @classmethod
+    def get_lookups(cls):
+        lookups = []
+        for name, lookup in cls.columns:
+            lookups.extend(lookup if isinstance(lookup, tuple) else [lookup])
+        return lookups
+
+    @classmethod
+    def values_list(cls, queryset):
+        # prefetches can't be applied to rows
+        return queryset.prefetch_related(None).values_list(*cls.get_lookups())
+
+    @classmethod
+    def get_values(cls, row, lookups):
+        positions = cls.get_lookups()
+        return [row[positions.index(lookup)] for lookup in lookups]
+
+    def to_native(self, row):
+        data = SortedDict()
+        for path, position, width, transform in self.plan:
+            if transform is None:
+                value = to_simple(row[position])
+            else:
+                value = transform(*row[position:position + width])
+            target = data
+            for key in path[:-1]:
+                target = target.setdefault(key, SortedDict())
+            target[path[-1]] = value
+        for name in self.nullable:
+            if name in data and data[name].get('id') is None:
+                data[name] = None
+        return data
@@ -2,9 +2,12 @@ import os
 import csv
 import json
 import codecs
+import time
+import threading
 import requests
 import datetime
 import cStringIO
+from multiprocessing.pool import ThreadPool
 
 from django.conf import settings
 from django.utils import timezone
@@ -66,6 +69,72 @@ def get_logfile_path(name, ext):
     filename = "%s_%s.%s" % (base_path, datestamp, ext,)
     return filename
 
+
+def get_data_epoch():
+    """
+        Returns the current data epoch, or None if it was never bumped.
+        Shared by all worker processes on the host.
+    """
+    try:
+        with open(settings.DATA_EPOCH_FILE) as f:
+            return f.read()
+    except IOError:
+        return None
+
+
+def bump_data_epoch():
+    """
+        Marks the data as changed, so in-process indexes get rebuilt.
+        Call after imports / materialized view refreshes.
+    """
+    with open(settings.DATA_EPOCH_FILE, 'w') as f:
+        f.write(repr(time.time()))
+
+
+class DataEpochCache(object):
+    """
+        Holds something built from the db in the worker process. It is
+        built on first use and again whenever the data epoch changes.
+        Subclasses implement build().
+    """
+
+    def __init__(self):
+        self.epoch = None
+        self.value = None
+        self.lock = threading.Lock()
+
+    def build(self):
+        raise NotImplementedError
+
+    def get(self):
+        epoch = get_data_epoch()
+        if self.value is None or epoch != self.epoch:
+            with self.lock:
+                if self.value is None or epoch != self.epoch:
+                    self.value = self.build()
+                    self.epoch = epoch
+        return self.value
+
+
+class LazyThreadPool(object):
+    """
+        A thread pool of `size` threads, made on first use so that it
+        belongs to the server process using it rather than the one it was
+        forked from.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        if self.pool is None:
+            with self.lock:
+                if self.pool is None:
+                    self.pool = ThreadPool(self.size)
+        return self.pool
+
 class Date(object):
     """
     A class with helper functions for checking and retrieving datetime objects.
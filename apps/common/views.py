@@ -1,11 +1,16 @@
 from django import http
 from django.views.generic.base import TemplateView
 from django.core.exceptions import PermissionDenied
-from common.pagination import KLPPaginationSerializer
+from django.utils.datastructures import SortedDict
+from common.pagination import (
+    KLPPaginationSerializer, encode_cursor, decode_cursor, keyset_filter,
+    get_approximate_count
+)
 from rest_framework import generics
 from rest_framework import viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.templatetags.rest_framework import replace_query_param
 from common.filters import KLPInBBOXFilter
 
 
@@ -23,9 +28,25 @@ class KLPAPIView(APIView):
 
 
 class KLPListAPIView(generics.ListAPIView):
+    '''
+        Lists setting cursor_ordering can also be paged with ?cursor=
+        (empty for the first page) instead of ?page=. Pages are then keyed
+        on the last row seen, so deep pages cost the same as the first one,
+        and count is an estimate.
+
+        Lists setting values_serializer_class are serialized from
+        values_list() rows whenever that serializer can serve the request.
+    '''
 
     pagination_serializer_class = KLPPaginationSerializer
 
+    # e.g. ('-date', '-id') - the sort field, with id as the tie breaker
+    cursor_ordering = None
+
+    # a common.serializers.ValuesSerializer giving the same output as
+    # serializer_class
+    values_serializer_class = None
+
     def __init__(self, *args, **kwargs):
         super(KLPListAPIView, self).__init__(*args, **kwargs)
         if hasattr(self, 'bbox_filter_field') and self.bbox_filter_field and KLPInBBOXFilter not in self.filter_backends:
@@ -45,6 +66,68 @@ class KLPListAPIView(generics.ListAPIView):
             return None
         return per_page
 
+    def use_values(self):
+        return self.values_serializer_class is not None and \
+            self.values_serializer_class.can_serve(self.request)
+
+    def get_serializer_class(self):
+        if self.use_values():
+            return self.values_serializer_class
+        return super(KLPListAPIView, self).get_serializer_class()
+
+    def filter_queryset(self, queryset):
+        queryset = super(KLPListAPIView, self).filter_queryset(queryset)
+        if self.use_values():
+            return self.values_serializer_class.values_list(queryset)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if self.cursor_ordering is None or 'cursor' not in request.GET:
+            return super(KLPListAPIView, self).list(request, *args, **kwargs)
+
+        page_size = self.get_paginate_by()
+        if page_size is None:
+            return super(KLPListAPIView, self).list(request, *args, **kwargs)
+
+        self.object_list = self.filter_queryset(self.get_queryset())
+        objects, last = self.get_cursor_page(
+            self.object_list, request.GET.get('cursor'), page_size)
+
+        next_url = None
+        if last is not None:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'cursor', encode_cursor(last))
+
+        serializer = self.get_serializer(objects, many=True)
+        return Response(SortedDict([
+            ('count', get_approximate_count(self.object_list)),
+            ('next', next_url),
+            ('previous', None),
+            (self.pagination_serializer_class.results_field, serializer.data),
+        ]))
+
+    def get_cursor_page(self, queryset, cursor, page_size):
+        '''
+            Returns the objects after cursor, and the sort values of the
+            last one if there are more.
+        '''
+        queryset = queryset.order_by(*self.cursor_ordering)
+        if cursor:
+            queryset = queryset.filter(
+                keyset_filter(self.cursor_ordering, decode_cursor(cursor)))
+
+        objects = list(queryset[:page_size + 1])
+        if len(objects) <= page_size:
+            return objects, None
+        objects = objects[:page_size]
+        return objects, self.get_cursor_values(objects[-1])
+
+    def get_cursor_values(self, obj):
+        fields = [field.lstrip('-') for field in self.cursor_ordering]
+        if self.use_values():
+            return self.values_serializer_class.get_values(obj, fields)
+        return [getattr(obj, field) for field in fields]
+
 
 class KLPModelViewSet(viewsets.ModelViewSet):
     pass
@@ -9,7 +9,7 @@ from .models import State, QuestionGroupType, IncomingNumber
 from users.models import User
 from schools.models import School, BoundaryType
 from stories.models import (
-    Question, Questiongroup
+    AnswerOption, Question, Questiongroup
 )
 
 # Exotel numbers. Find them at http://my.exotel.in/viamentis/apps#installed-apps
@@ -97,18 +97,14 @@ def is_school_primary(school_id):
     return (school_type == u'Primary School')
 
 def is_answer_accepted(question, answer):
-    is_answer_accepted = True
+    # The options a question lists are the answers coded first (see
+    # AnswerOption), read without eval'ing the options text.
     if question.question_type.name in ['checkbox', 'radio']:
         checkbox_accepted_answers = {'1': 'Yes', '2': 'No', '3': 'Unknown'}
         if answer not in checkbox_accepted_answers:
-            is_answer_accepted = False
-        elif checkbox_accepted_answers[answer] not in eval(question.options):
-            is_answer_accepted = False
-    else:
-        if answer not in eval(question.options):
-            is_answer_accepted = False
-
-    return is_answer_accepted
+            return False
+        answer = checkbox_accepted_answers[answer]
+    return answer in AnswerOption.listed(question)
 
 def cast_answer(question, answer):
     if question.question_type.name in ['checkbox', 'radio']:
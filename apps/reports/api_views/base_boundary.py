@@ -1,6 +1,7 @@
 from schools.models import Boundary
 from . import BaseReport
 from django.db.models import Sum
+from common.queries import QueryBatch
 from rest_framework.exceptions import ParseError
 
 
@@ -42,18 +43,26 @@ class BaseBoundaryReport(BaseReport):
                     9540: [431, 433, 444, 9541],
                     9541: [431, 433, 444, 9540]}
 
+    # the parent chain the report info shows, loaded with the boundary
+    boundary_related = ('hierarchy', 'type', 'parent__hierarchy',
+                        'parent__parent__hierarchy')
+
     # Get dise information for the boundary
     def get_dise_school_info(self, active_schools, academic_year):
         dise_schools = active_schools  # TODO.filter(acyear=academic_year)
+        batch = QueryBatch()
+        batch.count('num_schools', dise_schools)
+        batch.aggregate('totals', dise_schools,
+                        num_boys=Sum('boys_count'),
+                        num_girls=Sum('girls_count'),
+                        num_teachers=Sum('teacher_count'))
+        results = batch.run()
         agg = {
-            'num_schools': dise_schools.count(),
-            'gender': {'boys': dise_schools.aggregate(
-                                num_boys=Sum('boys_count'))['num_boys'],
-                       'girls': dise_schools.aggregate(
-                                num_girls=Sum('girls_count'))['num_girls']
+            'num_schools': results['num_schools'],
+            'gender': {'boys': results['totals']['num_boys'],
+                       'girls': results['totals']['num_girls']
                        },
-            'teacher_count': dise_schools.aggregate(
-                                num_teachers=Sum('teacher_count'))['num_teachers']
+            'teacher_count': results['totals']['num_teachers']
         }
         agg['num_students'] = agg['gender']['boys'] + agg['gender']['girls']
         return agg
@@ -63,14 +72,12 @@ class BaseBoundaryReport(BaseReport):
     def get_parent_info(self, boundary):
         parent = {"schoolcount": 0}
         if boundary.get_admin_level() != 1:
-            parentObject = Boundary.objects.get(id=boundary.parent.id)
-            schools = parentObject.schools()
-            parent["schoolcount"] = schools.count()
+            parent["schoolcount"] = boundary.parent.schools().count()
         else:
-            neighbours = Boundary.objects.filter(parent=1, type=1)
-            for neighbour in neighbours:
-                count = neighbour.schools().count()
-                parent["schoolcount"] += count
+            batch = QueryBatch()
+            for neighbour in Boundary.objects.filter(parent=1, type=1):
+                batch.count(neighbour.id, neighbour.schools())
+            parent["schoolcount"] = sum(batch.run().values())
         return parent
 
     def getDistrictNeighbours(self, boundary):
@@ -1,6 +1,7 @@
 from schools.models import ElectedrepMaster
 from . import BaseReport
 from common.exceptions import APIError
+from common.queries import QueryBatch
 
 
 class BaseElectedRepReport(BaseReport):
@@ -20,14 +21,18 @@ class BaseElectedRepReport(BaseReport):
             electedrep.current_elected_rep.lower()
 
     def getNeighbours(self, neighbours, elect_type, reportInfo):
-        for neighbour in neighbours:
-            try:
-                electedrep = ElectedrepMaster.objects.filter(
-                    elec_comm_code=neighbour, const_ward_type=elect_type)
-            except Exception:
-                raise APIError('ElectedRep neighbour id ('+neighbour+') not found', 404)
+        batch = QueryBatch()
+        for i, neighbour in enumerate(neighbours):
+            batch.list(i, ElectedrepMaster.objects.filter(
+                elec_comm_code=neighbour, const_ward_type=elect_type))
+        try:
+            results = batch.run()
+        except Exception:
+            raise APIError('ElectedRep neighbour ids (' + '|'.join(neighbours) +
+                           ') not found', 404)
+        for i in range(len(neighbours)):
             neighbour = {}
-            for rep in electedrep:
+            for rep in results[i]:
                 neighbour["commision_code"] = rep.elec_comm_code
                 neighbour["name"] = rep.const_ward_name.lower()
                 neighbour["type"] = rep.const_ward_type.lower()
@@ -1,5 +1,6 @@
 from django.db.models import Count
 from rest_framework.exceptions import ParseError
+from schools.models import TeacherSchoolYear
 
 
 class BaseReport():
@@ -28,9 +29,8 @@ class BaseReport():
 
     # Returns the number of teachers in the schools for the year
     def get_teachercount(self, active_schools, academic_year):
-        teachers = active_schools.filter(
-            studentgroup__teachers__teacherstudentgroup__academic_year=academic_year
-            ).aggregate(
-            count=Count('studentgroup__teachers__id', distinct=True))
+        teachers = TeacherSchoolYear.objects.filter(
+            school__in=active_schools, academic_year=academic_year
+            ).aggregate(count=Count('teacher', distinct=True))
         numteachers = teachers["count"]
         return numteachers
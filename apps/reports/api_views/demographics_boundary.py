@@ -13,7 +13,6 @@ class DemographicsBoundaryReportDetails(KLPAPIView, BaseSchoolAggView,
     '''
     This class returns the demographic report details
     '''
-    reportInfo = {}
 
     def get_details_data(self, boundaryData, active_schools, academic_year):
         self.reportInfo["categories"] = {}
@@ -41,7 +40,8 @@ class DemographicsBoundaryReportDetails(KLPAPIView, BaseSchoolAggView,
         self.reportInfo["report_info"]["year"] = year
 
         try:
-            boundary = Boundary.objects.get(pk=boundaryid)
+            boundary = Boundary.objects.select_related(
+                *self.boundary_related).get(pk=boundaryid)
         except Exception:
             raise APIError('Boundary not found', 404)
 
@@ -51,6 +51,7 @@ class DemographicsBoundaryReportDetails(KLPAPIView, BaseSchoolAggView,
         self.get_details_data(boundaryData, active_schools, academic_year)
 
     def get(self, request):
+        self.reportInfo = {}
         mandatoryparams = {'id': [], 'language': ['english', 'kannada']}
         self.check_mandatory_params(mandatoryparams)
         id = self.request.GET.get("id")
@@ -67,7 +68,6 @@ class DemographicsBoundaryComparisonDetails(KLPAPIView, BaseSchoolAggView,
     '''
         Returns report comparison details
     '''
-    reportInfo = {"comparison": {"year-wise": {}, "neighbours": {}}}
 
     parentInfo = {}
 
@@ -193,7 +193,8 @@ class DemographicsBoundaryComparisonDetails(KLPAPIView, BaseSchoolAggView,
             raise APIError('Academic year is not valid.\
                     It should be in the form of 2011-2012.', 404)
         try:
-            boundary = Boundary.objects.get(pk=boundaryid)
+            boundary = Boundary.objects.select_related(
+                *self.boundary_related).get(pk=boundaryid)
         except Exception:
             raise APIError('Boundary not found', 404)
 
@@ -204,6 +205,7 @@ class DemographicsBoundaryComparisonDetails(KLPAPIView, BaseSchoolAggView,
                                  year)
 
     def get(self, request):
+        self.reportInfo = {"comparison": {"year-wise": {}, "neighbours": {}}}
         mandatoryparams = {'id': [], 'language': ["english", "kannada"]}
         self.check_mandatory_params(mandatoryparams)
 
@@ -13,7 +13,6 @@ class DemographicsElectedRepReportDetails(KLPAPIView, BaseSchoolAggView,
          This class returns the demographic report details of the elected rep
     '''
 
-    reportInfo = {}
 
     def get_details_data(self, electedrepData, active_schools, academic_year):
         self.reportInfo["categories"] = {}
@@ -51,6 +50,7 @@ class DemographicsElectedRepReportDetails(KLPAPIView, BaseSchoolAggView,
         self.get_details_data(electedrepData, active_schools, academic_year)
 
     def get(self, request):
+        self.reportInfo = {}
         mandatoryparams = {'id': [], 'language': ['english', 'kannada']}
         self.check_mandatory_params(mandatoryparams)
         id = self.request.GET.get("id")
@@ -67,7 +67,6 @@ class DemographicsElectedRepComparisonDetails(KLPAPIView, BaseSchoolAggView,
     '''
         Returns report comparison details
     '''
-    reportInfo = {"comparison": {"year-wise": {}, "electedrep": {}}}
     totalschools = 0
 
     def fillComparison(self, electedrep, academic_year):
@@ -202,6 +201,7 @@ class DemographicsElectedRepComparisonDetails(KLPAPIView, BaseSchoolAggView,
                                  year)
 
     def get(self, request):
+        self.reportInfo = {"comparison": {"year-wise": {}, "electedrep": {}}}
         mandatoryparams = {'id': [], 'language': ["english", "kannada"]}
         self.check_mandatory_params(mandatoryparams)
 
@@ -9,7 +9,6 @@ from django.conf import settings
 
 class DiseBoundaryDetails(KLPAPIView, BaseSchoolAggView, BaseBoundaryReport):
 
-    reportInfo = {}
 
     def get_boundary_info(self, boundaryid):
         year = self.request.GET.get('year', settings.DEFAULT_ACADEMIC_YEAR)
@@ -20,7 +19,8 @@ class DiseBoundaryDetails(KLPAPIView, BaseSchoolAggView, BaseBoundaryReport):
                     It should be in the form of 2011-2012.', 404)
         self.reportInfo["academic_year"] = year
         try:
-            boundary = Boundary.objects.get(pk=boundaryid)
+            boundary = Boundary.objects.select_related(
+                *self.boundary_related).get(pk=boundaryid)
         except Exception:
             raise APIError('Boundary not found', 404)
         self.get_boundary_summary_data(boundary, self.reportInfo)
@@ -32,6 +32,7 @@ class DiseBoundaryDetails(KLPAPIView, BaseSchoolAggView, BaseBoundaryReport):
                     "dise": comparisonboundary.dise_slug, "type": "district"})
 
     def get(self, request):
+        self.reportInfo = {}
         mandatoryparams = {'id': [], 'language': ["english", "kannada"]}
         self.check_mandatory_params(mandatoryparams)
 
@@ -8,7 +8,6 @@ from django.conf import settings
 
 class ElectedRepInfo(KLPAPIView, BaseElectedRepReport):
 
-    reportInfo = {}
 
     def get_electedrep_info(self, electedrepid):
         year = self.request.GET.get('year', settings.DEFAULT_ACADEMIC_YEAR)
@@ -30,6 +29,7 @@ class ElectedRepInfo(KLPAPIView, BaseElectedRepReport):
         self.getParentData(electedrep, self.reportInfo)
 
     def get(self, request):
+        self.reportInfo = {}
         mandatoryparams = {'id': [], 'language': ["english", "kannada"]}
         self.check_mandatory_params(mandatoryparams)
 
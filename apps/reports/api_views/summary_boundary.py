@@ -12,7 +12,6 @@ class BoundarySummaryReport(KLPAPIView, BaseSchoolAggView, BaseBoundaryReport):
     '''
         Returns report summary
     '''
-    reportInfo = {"report_info": {}}
     parentInfo = {}
 
     # filling the counts in the data structure to be returned
@@ -56,7 +55,8 @@ class BoundarySummaryReport(KLPAPIView, BaseSchoolAggView, BaseBoundaryReport):
 
         # Check if boundary id is valid
         try:
-            boundary = Boundary.objects.get(pk=boundaryid)
+            boundary = Boundary.objects.select_related(
+                *self.boundary_related).get(pk=boundaryid)
         except Exception:
             raise APIError('Boundary not found', 404)
 
@@ -78,6 +78,7 @@ class BoundarySummaryReport(KLPAPIView, BaseSchoolAggView, BaseBoundaryReport):
         self.get_counts(boundaryData, active_schools, academic_year)
 
     def get(self, request):
+        self.reportInfo = {"report_info": {}}
         if not self.request.GET.get('id'):
             raise ParseError("Mandatory parameter id not passed")
 
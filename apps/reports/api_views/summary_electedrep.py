@@ -12,7 +12,6 @@ class ElectedRepSummaryReport(KLPAPIView, BaseSchoolAggView, BaseElectedRepRepor
     '''
         Returns report summary
     '''
-    reportInfo = {}
     parentInfo = {}
 
     # filling the counts in the data structure to be returned
@@ -79,6 +78,7 @@ class ElectedRepSummaryReport(KLPAPIView, BaseSchoolAggView, BaseElectedRepRepor
         self.get_counts(electedrepData, active_schools, academic_year)
 
     def get(self, request):
+        self.reportInfo = {}
         if not self.request.GET.get('id'):
             raise ParseError("Mandatory parameter id not passed")
 
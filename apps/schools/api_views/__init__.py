@@ -1,7 +1,8 @@
 from .school import (
     SchoolsList, SchoolsInfo, SchoolInfo, SchoolsDiseInfo,
     SchoolDemographics, SchoolProgrammes, SchoolFinance, SchoolInfra,
-    SchoolLibrary, SchoolNutrition, MeetingReportListView
+    SchoolLibrary, SchoolNutrition, MeetingReportListView, SchoolsBulkInfo,
+    SchoolProfileView
 )
 from .assessment import (
     AssessmentsList, AssessmentInfo, ProgrammesList, ProgrammeInfo,
@@ -26,13 +27,12 @@ from schools.serializers import (
     AssemblySerializer, ParliamentSerializer, PincodeSerializer
 )
 from schools.models import School, Boundary, Assembly, Parliament, Postal
+from schools.search import search, in_order, typeahead
+from schools.merge import MergeExecutor
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
-from django.core.urlresolvers import resolve, Resolver404
-from django.db.models import Q
-import urlparse
 
 
 class OmniSearch(KLPAPIView):
@@ -66,79 +66,64 @@ class OmniSearch(KLPAPIView):
                 'error': 'A text must be provided to search'
             }, status=404)
 
+        # Boundaries, constituencies and pincodes come from the in-process
+        # typeahead index when it holds the geometry asked for.
+        if typeahead.can_serve(request):
+            response.update(typeahead.search(text, request))
+            results = search(text, ['pre_schools', 'primary_schools'])
+        else:
+            results = search(text)
+
+        schools = School.objects.select_related(
+            'instcoord',
+            'schooldetails__type',
+            'address'
+        ).prefetch_related(
+            'schooldetails'
+        )
+
         response['pre_schools'] = SchoolListSerializer(
-            School.objects.filter(
-                (Q(name__icontains=text) | Q(id__contains=text)
-                    | Q(dise_info__dise_code__contains=text)),
-                Q(status=2),
-                Q(instcoord__coord__isnull=False),
-                Q(schooldetails__type__name='PreSchool')
-            ).select_related(
-                'instcoord',
-                'schooldetails__type',
-                'address'
-            ).prefetch_related(
-                'schooldetails'
-            )[:3],
+            in_order(schools, results['pre_schools']),
             many=True,
             context=context
         ).data
 
         response['primary_schools'] = SchoolListSerializer(
-            School.objects.filter(
-                (Q(name__icontains=text) | Q(id__contains=text)
-                    | Q(dise_info__dise_code__contains=text)),
-                Q(status=2),
-                Q(instcoord__coord__isnull=False),
-                Q(schooldetails__type__name='Primary School')
-            ).select_related(
-                'instcoord',
-                'schooldetails__type',
-                'address'
-            ).prefetch_related(
-                'schooldetails'
-            )[:3],
+            in_order(schools, results['primary_schools']),
             many=True,
             context=context
         ).data
 
+        if typeahead.can_serve(request):
+            return Response(response)
+
         response['boundaries'] = BoundarySerializer(
-            Boundary.objects.filter(
-                status=2,
-                name__icontains=text,
-                boundarycoord__coord__isnull=False
-            ).select_related(
-                'boundarycoord',
-                'hierarchy__name',
-                'parent__hierarchy__name'
-            ).prefetch_related('parent', 'hierarchy')[:10],
+            in_order(
+                Boundary.objects.select_related(
+                    'boundarycoord',
+                    'hierarchy__name',
+                    'parent__hierarchy__name'
+                ).prefetch_related('parent', 'hierarchy'),
+                results['boundaries']
+            ),
             many=True,
             context=context
         ).data
 
         response['assemblies'] = AssemblySerializer(
-            Assembly.objects.filter(
-                name__icontains=text,
-                coord__isnull=False
-            )[:10],
+            in_order(Assembly.objects.all(), results['assemblies']),
             many=True,
             context=context
         ).data
 
         response['parliaments'] = ParliamentSerializer(
-            Parliament.objects.filter(
-                name__icontains=text,
-                coord__isnull=False
-            )[:10],
+            in_order(Parliament.objects.all(), results['parliaments']),
             many=True,
             context=context
         ).data
 
         response['pincodes'] = PincodeSerializer(
-            Postal.objects.filter(
-                pincode__icontains=text,
-                coord__isnull=False
-            )[:10],
+            in_order(Postal.objects.all(), results['pincodes']),
             many=True,
             context=context
         ).data
@@ -150,6 +135,8 @@ class MergeEndpoints(KLPAPIView):
     """Merges multiple endpoint outputs
     E.g. - /merge?endpoints=/schools/school/33312/infrastructure&endpoints=/schools/school/33312/library
     merges output of both infrastructure and library endpoints and returns a single JSON.
+    The endpoints are run concurrently. Those that fail are left out and
+    listed under errors, with their status code.
 
     Keyword arguments:
     endpoints -- first endpoint
@@ -157,24 +144,17 @@ class MergeEndpoints(KLPAPIView):
     """
     def get(self, request, format=None):
         endpoints = request.GET.getlist('endpoints', [])
-        data = {}
 
         if not endpoints:
             return Response({
                 'error': 'no endpoints specified'
             }, status=404)
 
-        for endpoint in endpoints:
-            parsed = urlparse.urlparse(endpoint)
-            try:
-                view, args, kwargs = resolve(parsed.path, urlconf=dubdubdub.api_urls)
-                kwargs['request'] = request
-
-                data[endpoint] = view(*args, **kwargs).data
-            except Exception as e:
-                print e
-                continue
-
+        executor = MergeExecutor(request, dubdubdub.api_urls,
+                                 reverse('api_root'))
+        data, errors = executor.run(endpoints)
+        if errors:
+            data['errors'] = errors
         return Response(data, status=200)
 
 
@@ -215,7 +195,10 @@ def api_root(request, format=None):
                                       format=format, kwargs={'pk': 3573}),
 
             'School Nutrition': reverse('api_school_nutrition', request=request,
-                                      format=format, kwargs={'pk': 33313})
+                                      format=format, kwargs={'pk': 33313}),
+
+            'School Profile': reverse('api_school_profile', request=request,
+                                      format=format, kwargs={'pk': 3573})
         },
 
         'Boundary': {
@@ -257,6 +240,10 @@ def api_root(request, format=None):
                 'api_aggregation_boundary_schools',
                 request=request, format=format, kwargs={'id': 8967}
             ),
+            'Teacher Counts for Boundaries': reverse(
+                'api_aggregation_boundary_teachers',
+                request=request, format=format
+            ) + '?boundaries=8877,8773&years=2013-2014,2014-2015',
             'School Aggregations for Assembly': reverse(
                 'api_aggregation_assembly_schools',
                 request=request, format=format, kwargs={'id': 129}
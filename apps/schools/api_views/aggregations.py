@@ -1,4 +1,7 @@
-from schools.models import AcademicYear, School, Boundary, Assembly, Parliament, Postal
+from schools.models import (
+    AcademicYear, School, Boundary, Assembly, Parliament, Postal,
+    TeacherSchoolYear
+)
 from schools.serializers import (
     BoundaryLibLangAggSerializer, BoundaryLibLevelAggSerializer,
     BoundarySerializer, AssemblySerializer, ParliamentSerializer,
@@ -9,6 +12,7 @@ import dubdubdub.urls
 
 from common.utils import Date
 from common.models import SumCase
+from common.queries import QueryBatch
 from common.views import KLPListAPIView, KLPDetailAPIView, KLPAPIView
 from common.exceptions import APIError
 
@@ -47,40 +51,36 @@ class BoundaryLibLevelAggView(KLPListAPIView):
 class BaseSchoolAggView(object):
     def get_aggregations(self, active_schools, academic_year):
         active_schools = active_schools.filter(schoolextra__academic_year=academic_year)
-        agg = {
-            'num_schools': active_schools.count(),
-            'moi': active_schools.values('moi').annotate(num=Count('moi')),
-            'cat': active_schools.values('cat').annotate(
-                num_schools=Count('cat'),
-                num_boys=Sum('schoolextra__num_boys'),
-                num_girls=Sum('schoolextra__num_girls')
-            ),
-            'mgmt': active_schools.values('mgmt').annotate(num=Count('mgmt')),
-            'gender': active_schools.values('sex').annotate(num=Count('sex'))
-        }
-
         active_institutions = active_schools.filter(institutionagg__academic_year=academic_year)
-        agg['mt'] = active_institutions.values('institutionagg__mt').annotate(
+
+        # independent of each other, run together
+        batch = QueryBatch()
+        batch.count('num_schools', active_schools)
+        batch.list('moi', active_schools.values('moi').annotate(num=Count('moi')))
+        batch.list('cat', active_schools.values('cat').annotate(
+            num_schools=Count('cat'),
+            num_boys=Sum('schoolextra__num_boys'),
+            num_girls=Sum('schoolextra__num_girls')
+        ))
+        batch.list('mgmt', active_schools.values('mgmt').annotate(num=Count('mgmt')))
+        batch.list('gender', active_schools.values('sex').annotate(num=Count('sex')))
+        batch.list('mt', active_institutions.values('institutionagg__mt').annotate(
             num_students=Sum('institutionagg__num'),
             num_boys=SumCase('institutionagg__num', when="gender='male'"),
             num_girls=SumCase('institutionagg__num', when="gender='female'")
-        )
+        ))
+        batch.aggregate('enrolment', active_schools,
+                        num_boys=Sum('schoolextra__num_boys'),
+                        num_girls=Sum('schoolextra__num_girls'))
+        agg = batch.run()
 
         for mt in agg['mt']:
             mt['name'] = mt['institutionagg__mt']
             del mt['institutionagg__mt']
 
-        agg['num_boys'] = active_schools.filter(
-            schoolextra__academic_year=academic_year
-        ).aggregate(
-            num_boys=Sum('schoolextra__num_boys')
-        ).get('num_boys', 0)
-
-        agg['num_girls'] = active_schools.filter(
-            schoolextra__academic_year=academic_year
-        ).aggregate(
-            num_girls=Sum('schoolextra__num_girls')
-        ).get('num_girls', 0)
+        enrolment = agg.pop('enrolment')
+        agg['num_boys'] = enrolment.get('num_boys', 0)
+        agg['num_girls'] = enrolment.get('num_girls', 0)
 
         return agg
 
@@ -239,3 +239,34 @@ class PincodeSchoolAggView(KLPAPIView, BaseSchoolAggView):
         agg['pincode'] = PincodeSerializer(pincode).data
 
         return Response(agg)
+
+
+class BoundaryTeacherCountView(KLPAPIView):
+    """
+    Number of teachers in the active schools of each boundary, per academic
+    year, counted in one query over the teacher-school-year table.
+
+    boundaries - comma separated boundary ids
+    years - comma separated academic years, defaults to the current one
+    """
+    def get(self, request):
+        try:
+            boundary_ids = [int(boundary_id) for boundary_id in
+                            request.GET.get('boundaries', '').split(',')]
+        except ValueError:
+            raise APIError('boundaries should be a comma separated list of ids', 400)
+
+        years = request.GET.get('years', settings.DEFAULT_ACADEMIC_YEAR).split(',')
+        academic_years = dict(AcademicYear.objects.filter(
+            name__in=years).values_list('id', 'name'))
+        if len(academic_years) != len(set(years)):
+            raise APIError('Academic year is not valid. It should be in the form of 2011-2012.', 404)
+
+        counts = TeacherSchoolYear.counts(boundary_ids, academic_years.keys())
+        data = {}
+        for boundary_id in boundary_ids:
+            data[boundary_id] = dict(
+                (name, counts.get((boundary_id, year_id), 0))
+                for year_id, name in academic_years.items()
+            )
+        return Response(data)
@@ -12,7 +12,8 @@ from schools.serializers import (
     AssessmentListSerializer, AssessmentInfoSerializer, ProgrammeListSerializer,
     ProgrammeInfoSerializer, BoundaryAssessmentInfoSerializer,
     BoundaryProgrammeInfoSerializer, ProgrammePercentileSerializer,
-    BoundaryProgrammePercentileSerializer, PartnerSerializer
+    BoundaryProgrammePercentileSerializer, PartnerSerializer,
+    ProgrammeListValuesSerializer
 )
 from rest_framework.response import Response
 from rest_framework.exceptions import APIException, PermissionDenied,\
@@ -136,6 +137,7 @@ class ProgrammesList(KLPListAPIView, CacheMixin):
           paramType: form
     '''
     serializer_class = ProgrammeListSerializer
+    values_serializer_class = ProgrammeListValuesSerializer
     bbox_filter_field = "instcoord__coord"
 
     def get_queryset(self):
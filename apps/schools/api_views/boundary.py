@@ -3,7 +3,9 @@ from common.views import KLPListAPIView, KLPDetailAPIView
 from common.mixins import CacheMixin
 from schools.serializers import (
     BoundarySerializer, BoundaryWithParentSerializer, AssemblySerializer,
-    ParliamentSerializer, PincodeSerializer)
+    ParliamentSerializer, PincodeSerializer, BoundaryValuesSerializer,
+    BoundaryWithParentValuesSerializer, AssemblyValuesSerializer,
+    ParliamentValuesSerializer)
 from django.db.models import Q
 
 
@@ -23,6 +25,7 @@ class AdminDetails(KLPDetailAPIView, CacheMixin):
 class AssemblyList(KLPListAPIView):
     """Returns list of assemblies"""
     serializer_class = AssemblySerializer
+    values_serializer_class = AssemblyValuesSerializer
     bbox_filter_field = 'coord'
 
     def get_queryset(self):
@@ -38,6 +41,7 @@ class AssemblyList(KLPListAPIView):
 class ParliamentList(KLPListAPIView):
     """Returns list of assemblies"""
     serializer_class = ParliamentSerializer
+    values_serializer_class = ParliamentValuesSerializer
     bbox_filter_field = 'coord'
 
     def get_queryset(self):
@@ -53,6 +57,7 @@ class ParliamentList(KLPListAPIView):
 class AssemblyInParliament(KLPListAPIView):
     """Returns list of assemblies"""
     serializer_class = AssemblySerializer
+    values_serializer_class = AssemblyValuesSerializer
     bbox_filter_field = 'coord'
 
     def get_queryset(self):
@@ -113,6 +118,7 @@ class Admin1s(KLPListAPIView, CacheMixin):
     bbox -- Bounding box to search within e.g. 77.349415,12.822471,77.904224,14.130930
     """
     serializer_class = BoundarySerializer
+    values_serializer_class = BoundaryValuesSerializer
     bbox_filter_field = 'boundarycoord__coord'
 
     def get_queryset(self):
@@ -154,6 +160,7 @@ class Admin2sInsideAdmin1(KLPListAPIView):
     bbox -- Bounding box to search within e.g. 77.349415,12.822471,77.904224,14.130930
     """
     serializer_class = BoundarySerializer
+    values_serializer_class = BoundaryValuesSerializer
     bbox_filter_field = 'boundarycoord__coord'
 
     def get_queryset(self):
@@ -174,6 +181,7 @@ class Admin3sInsideAdmin1(KLPListAPIView):
     bbox -- Bounding box to search within e.g. 77.349415,12.822471,77.904224,14.130930
     """
     serializer_class = BoundarySerializer
+    values_serializer_class = BoundaryValuesSerializer
     bbox_filter_field = 'boundarycoord__coord'
 
     def get_queryset(self):
@@ -193,6 +201,7 @@ class Admin2s(KLPListAPIView, CacheMixin):
     bbox -- Bounding box to search within e.g. 77.349415,12.822471,77.904224,14.130930
     """
     serializer_class = BoundaryWithParentSerializer
+    values_serializer_class = BoundaryWithParentValuesSerializer
     bbox_filter_field = 'boundarycoord__coord'
 
     def get_queryset(self):
@@ -230,6 +239,7 @@ class Admin3sInsideAdmin2(KLPListAPIView):
     bbox -- Bounding box to search within e.g. 77.349415,12.822471,77.904224,14.130930
     """
     serializer_class = BoundarySerializer
+    values_serializer_class = BoundaryValuesSerializer
     bbox_filter_field = 'boundarycoord__coord'
 
     def get_queryset(self):
@@ -246,6 +256,7 @@ class Admin3s(KLPListAPIView, CacheMixin):
     bbox -- Bounding box to search within e.g. 77.349415,12.822471,77.904224,14.130930
     """
     serializer_class = BoundaryWithParentSerializer
+    values_serializer_class = BoundaryWithParentValuesSerializer
     bbox_filter_field = 'boundarycoord__coord'
 
     def get_queryset(self):
@@ -1,6 +1,11 @@
 from django.conf import settings
-from django.db.models import Count
-from schools.models import School, DiseInfo, MdmAgg, MeetingReport
+from django.http import HttpResponse
+from rest_framework.response import Response
+from schools.models import (
+    School, DiseInfo, MdmAgg, MeetingReport, AcademicYear,
+    SchoolProfile
+)
+from common.exceptions import APIError
 from schools.filters import SchoolFilter
 from common.views import (
     KLPListAPIView,
@@ -9,14 +14,19 @@ from common.views import (
     KLPModelViewSet
 )
 from common.mixins import CacheMixin
+from common.pagination import decode_cursor
+from schools.facets import school_facets, SchoolIdList
+from schools.profiles import SECTION_SERIALIZERS, SchoolSections, build_profiles
 from schools.serializers import SchoolListSerializer, SchoolInfoSerializer,\
     SchoolDiseSerializer, SchoolDemographicsSerializer, MeetingReportSerializer, \
     SchoolProgrammesSerializer, SchoolFinanceSerializer, SchoolInfraSerializer,\
-    SchoolLibrarySerializer, SchoolNutritionSerializer, PrechoolInfraSerializer
+    SchoolLibrarySerializer, SchoolNutritionSerializer, PrechoolInfraSerializer,\
+    SchoolListValuesSerializer
 
 
 class MeetingReportListView(KLPListAPIView, CacheMixin):
     serializer_class = MeetingReportSerializer
+    cursor_ordering = ('id',)
 
     def get_queryset(self):
         queryset = MeetingReport.objects.select_related('school').all()
@@ -36,18 +46,69 @@ class SchoolsList(KLPListAPIView, CacheMixin):
     admin2 -- ID of the Block/Project to search inside
     admin3 -- ID of the Cluster/Circle to search inside
     bbox -- Bounding box to search within e.g. 77.349415,12.822471,77.904224,14.130930
+    dise_facility -- comma separated DISE facilities the schools must have
+    facets -- yes/[no] - Whether to return the school count per filter value
+    cursor -- page by cursor instead of page number, empty for the first page
+    fields -- comma separated fields to return, e.g. id,name
+    omit -- comma separated fields to leave out
+
+    Facet counts follow the data epoch, bumped by imports and by edits to
+    meeting reports and programmes; a cached page may lag by CACHE_TIMEOUT.
     """
 
     serializer_class = SchoolListSerializer
+    values_serializer_class = SchoolListValuesSerializer
     bbox_filter_field = "instcoord__coord"
     filter_class = SchoolFilter
     search_fields = ('name', 'id', 'dise_info__dise_code',)
+    cursor_ordering = ('id',)
+
+    # Filters the facet index can't answer, these go to the database
+    db_only_params = (
+        'bbox', 'search', 'volunteer_activity_date',
+        'volunteer_activity_min_date', 'volunteer_activity_max_date',
+        'volunteer_activity_type', 'volunteer_activity_org',
+    )
+
+    def use_facets(self):
+        return not any(self.request.GET.get(param, '')
+                       for param in self.db_only_params)
+
+    def filter_queryset(self, queryset):
+        if isinstance(queryset, SchoolIdList):
+            if self.use_values():
+                return self.values_serializer_class.values_list(queryset)
+            return queryset
+        return super(SchoolsList, self).filter_queryset(queryset)
+
+    def get_cursor_page(self, queryset, cursor, page_size):
+        if not isinstance(queryset, SchoolIdList):
+            return super(SchoolsList, self).get_cursor_page(
+                queryset, cursor, page_size)
+        last_id = decode_cursor(cursor)[0] if cursor else None
+        schools = queryset.after(last_id, page_size + 1)
+        if len(schools) <= page_size:
+            return schools, None
+        return schools[:page_size], self.get_cursor_values(schools[page_size - 1])
+
+    def list(self, request, *args, **kwargs):
+        response = super(SchoolsList, self).list(request, *args, **kwargs)
+        if request.GET.get('facets', '') == 'yes' and self.use_facets() \
+                and isinstance(response.data, dict):
+            index, result = self.facet_result
+            response.data['facets'] = school_facets.get_counts(index, result)
+        return response
 
     def get_queryset(self):
+        if self.use_facets():
+            self.facet_result = index, result = school_facets.filter(self.request.GET)
+            qset = self.serializer_class.with_related(
+                School.objects.all(), self.request)
+            return SchoolIdList(school_facets.get_ids(index, result), qset)
+
         qset = School.objects.filter(status=2).distinct('id')
-        get_geom = self.request.GET.get('geometry', 'no')
-        if get_geom == 'yes':
-            qset = qset.select_related('instcoord')
+        # only join and prefetch what the requested fields read
+        qset = self.serializer_class.with_related(qset, self.request)
 
         stype = self.request.GET.get('school_type', 'both')
 
@@ -55,10 +116,6 @@ class SchoolsList(KLPListAPIView, CacheMixin):
             qset = qset.filter(schooldetails__type=2)
         elif stype == 'primaryschools':
             qset = qset.filter(schooldetails__type=1)
-        qset = qset.select_related(
-            'schooldetails__type', 'address',
-            'admin3', 'admin3__hierarchy__name'
-        )
 
         if self.request.GET.get('admin1', ''):
             admin1 = self.request.GET.get('admin1')
@@ -111,27 +168,10 @@ class SchoolsInfo(SchoolsList, CacheMixin):
     admin3 -- ID of the Cluster/Circle to search inside
     """
     serializer_class = SchoolInfoSerializer
+    values_serializer_class = None
     filter_class = SchoolFilter
     search_fields = ('name', 'id', 'dise_info__dise_code',)
 
-    def get_queryset(self):
-        # inherit all the filtering from SchoolsList
-        qset = super(SchoolsInfo, self).get_queryset()
-
-        qset = qset.select_related(
-            'address', 'schooldetails__admin3',
-            'schooldetails__admin2', 'schooldetails__admin1',
-            'schooldetails__type', 'schooldetails__assembly',
-            'schooldetails__parliament', 'electedrep__ward',
-            'schooldetails__admin1__hierarchy',
-            'schooldetails__admin2__hierarchy',
-            'schooldetails__admin3__hierarchy',
-        ).prefetch_related(
-            'dise_info__disefacilityagg_set',
-            'story_set'
-        )
-        return qset
-
 
 class SchoolsDiseInfo(KLPListAPIView):
     """Returns list of schools with DISE data
@@ -152,18 +192,15 @@ class SchoolsDiseInfo(KLPListAPIView):
 
 class SchoolInfo(KLPDetailAPIView, CacheMixin):
     """Returns info for a single school.
+
+    fields -- comma separated fields to return, e.g. id,name,images
+    omit -- comma separated fields to leave out
     """
     serializer_class = SchoolInfoSerializer
 
     def get_queryset(self):
-        return School.objects.filter(status=2)\
-            .select_related('instcoord', 'address', 'schooldetails__admin3',
-                            'schooldetails__admin2', 'schooldetails__admin1',
-                            'schooldetails__type', 'schooldetails__assembly',
-                            'schooldetails__parliament', 'electedrep__ward',
-                            'schooldetails__admin1__hierarchy',
-                            'schooldetails__admin2__hierarchy',
-                            'schooldetails__admin3__hierarchy')
+        return self.serializer_class.with_related(
+            School.objects.filter(status=2), self.request)
 
 
 class SchoolDemographics(KLPDetailAPIView):
@@ -180,17 +217,18 @@ class SchoolInfra(KLPDetailAPIView, CacheMixin):
     """Returns infrastructure info for a single school.
     """
     def get_serializer_class(self):
-        sid = self.kwargs.get('pk') if hasattr(self, 'kwargs') else None
-
-        if sid:
-            school = School.objects.get(pk=sid)
-
-            if school.schooldetails.type_id == 2:
-                return PrechoolInfraSerializer
-            else:
-                return SchoolInfraSerializer
+        # retrieve() has already fetched the school as self.object
+        school = getattr(self, 'object', None)
+        if school is None:
+            sid = self.kwargs.get('pk') if hasattr(self, 'kwargs') else None
+            if not sid:
+                return None
+            school = School.objects.select_related('schooldetails').get(pk=sid)
+
+        if school.schooldetails.type_id == 2:
+            return PrechoolInfraSerializer
         else:
-            return None
+            return SchoolInfraSerializer
 
     def get_queryset(self):
         return School.objects.filter(status=2)\
@@ -199,7 +237,10 @@ class SchoolInfra(KLPDetailAPIView, CacheMixin):
                             'schooldetails__admin1__hierarchy',
                             'schooldetails__admin2__hierarchy',
                             'schooldetails__admin3__hierarchy',
-                            'schooldetails__admin2', 'schooldetails__admin1')
+                            'schooldetails__admin2', 'schooldetails__admin1')\
+            .prefetch_related('dise_info__diserteagg_set__rte_metric',
+                              'dise_info__disefacilityagg_set__df_metric',
+                              'anganwadiinfraagg_set__ai_metric')
 
 
 class SchoolLibrary(KLPDetailAPIView, CacheMixin):
@@ -247,3 +288,71 @@ class SchoolFinance(KLPDetailAPIView):
     def get_queryset(self):
         return School.objects.filter(status=2)\
             .select_related('dise_info',)
+
+
+class SchoolsBulkInfo(KLPAPIView, CacheMixin):
+    """Returns several sections of the school page for many schools at once,
+    as a map keyed by school id. Each table behind a section is read once
+    for all the schools.
+
+    ids -- comma separated school ids, at most 50
+    sections -- comma separated, any of info, demographics, programmes,
+                nutrition, infra, library, finance. Defaults to all of them.
+    """
+    max_schools = 50
+
+    def get(self, request, format=None):
+        try:
+            ids = [int(i) for i in request.GET.get('ids', '').split(',') if i]
+        except ValueError:
+            raise APIError('ids must be comma separated school ids', 400)
+        if not ids:
+            raise APIError('ids is required', 400)
+        if len(ids) > self.max_schools:
+            raise APIError('At most %d schools at a time' % self.max_schools, 400)
+
+        sections = request.GET.get('sections', '')
+        sections = sections.split(',') if sections else SECTION_SERIALIZERS.keys()
+        for section in sections:
+            if section not in SECTION_SERIALIZERS:
+                raise APIError('Unknown section %s' % section, 400)
+
+        context = {
+            'request': request,
+            'view': self
+        }
+        return Response(SchoolSections(sections, context).serialize(ids))
+
+
+class SchoolProfileView(KLPAPIView):
+    """Returns the whole school page, all the sections of schools/bulk, as
+    precomputed by the rebuild_school_profiles command.
+
+    academic_year -- defaults to the current one, whose profile is stored;
+    others are built on request
+    """
+
+    def get(self, request, pk, format=None):
+        academic_year = request.GET.get(
+            'academic_year', settings.DEFAULT_ACADEMIC_YEAR)
+        documents = []
+        if academic_year == settings.DEFAULT_ACADEMIC_YEAR:
+            documents = SchoolProfile.objects.filter(
+                school_id=pk).values_list('document', flat=True)
+        if documents:
+            document = documents[0]
+        else:
+            # another year, or a school added since the last rebuild
+            pk = int(pk)
+            profiles = build_profiles(
+                [pk], self.get_academic_year(academic_year).name)
+            if pk not in profiles:
+                raise APIError('School not found', 404)
+            document = profiles[pk]
+        return HttpResponse(document, content_type='application/json')
+
+    def get_academic_year(self, name):
+        try:
+            return AcademicYear.objects.get(name=name)
+        except AcademicYear.DoesNotExist:
+            raise APIError('Unknown academic year %s' % name, 404)
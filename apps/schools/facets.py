@@ -0,0 +1,282 @@
+import array
+import binascii
+from bisect import bisect_right
+from django.conf import settings
+from django.db.models.query import ValuesListQuerySet
+from common.utils import DataEpochCache
+from schools.models import (
+    School, SchoolDetails, InstitutionAssessmentCohorts, Programme,
+    MeetingReport, DiseFacilityAgg
+)
+
+SCHOOL_TYPES = {
+    'primaryschools': 1,
+    'preschools': 2,
+}
+
+
+def to_bitset(positions, size):
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    if not bits:
+        return 0
+    return int(binascii.hexlify(bytes(bits[::-1])), 16)
+
+
+def to_bytes(bitset, size):
+    length = (size + 7) // 8
+    if not length:
+        return bytearray()
+    return bytearray(binascii.unhexlify('%0*x' % (length * 2, bitset)))[::-1]
+
+
+def to_positions(bitset, size):
+    return [
+        i * 8 + j
+        for i, byte in enumerate(to_bytes(bitset, size)) if byte
+        for j in range(8) if byte >> j & 1
+    ]
+
+
+def popcount(bitset):
+    return bin(bitset).count('1')
+
+
+class Facet(object):
+    """
+        Schools per value of one field, as positions into the facet index.
+        Values held by many schools are kept as int bitsets, the rest as
+        sorted position arrays, turned into bitsets only when filtered on.
+    """
+
+    def __init__(self, size, positions_by_value):
+        self.size = size
+        self.values = {}
+        for value, positions in positions_by_value.items():
+            positions = sorted(set(positions))
+            if len(positions) * 32 > size:
+                self.values[value] = to_bitset(positions, size)
+            else:
+                self.values[value] = array.array('I', positions)
+
+    def get(self, value):
+        stored = self.values.get(value, 0)
+        if isinstance(stored, array.array):
+            return to_bitset(stored, self.size)
+        return stored
+
+    def union(self, values):
+        bitset = 0
+        for value in values:
+            bitset |= self.get(value)
+        return bitset
+
+    def counts(self, result, result_bytes):
+        counts = {}
+        for value, stored in self.values.items():
+            if isinstance(stored, array.array):
+                count = sum(
+                    1 for p in stored if result_bytes[p >> 3] >> (p & 7) & 1
+                )
+            else:
+                count = popcount(result & stored)
+            if count:
+                counts[value] = count
+        return counts
+
+
+class SchoolFacets(DataEpochCache):
+    """
+        In-process facet index over the active schools. Every SchoolsList
+        filter becomes an intersection of bitsets, and the number of matching
+        schools per facet value comes for free.
+    """
+
+    def build(self):
+        schools = list(School.objects.filter(status=2).order_by('id').values_list(
+            'id', 'cat', 'sex', 'moi', 'mgmt', 'dise_info_id'
+        ))
+        ids = array.array('I', [school[0] for school in schools])
+        position = dict((school_id, i) for i, school_id in enumerate(ids))
+        size = len(ids)
+
+        fields = {}
+
+        def add(facet, value, school_id):
+            if school_id in position and value is not None:
+                fields.setdefault(facet, {}).setdefault(value, []).append(
+                    position[school_id])
+
+        dise_schools = {}
+        for school_id, cat, sex, moi, mgmt, dise_code in schools:
+            add('cat', cat, school_id)
+            add('sex', sex, school_id)
+            add('moi', moi, school_id)
+            add('mgmt', mgmt, school_id)
+            if dise_code:
+                dise_schools[dise_code] = school_id
+
+        for school_id, admin1, admin2, admin3, stype in \
+                SchoolDetails.objects.values_list(
+                    'school_id', 'admin1_id', 'admin2_id', 'admin3_id',
+                    'type_id'):
+            add('admin1', admin1, school_id)
+            add('admin2', admin2, school_id)
+            add('admin3', admin3, school_id)
+            add('school_type', stype, school_id)
+
+        for school_id, programme, partner in \
+                InstitutionAssessmentCohorts.objects.values_list(
+                    'school_id', 'assessment__programme_id',
+                    'assessment__programme__partner_id').distinct():
+            add('programme', programme, school_id)
+            add('partner_id', partner, school_id)
+
+        for school_id in MeetingReport.objects.values_list(
+                'school_id', flat=True).distinct():
+            add('meetingreport', 'yes', school_id)
+
+        for dise_code, metric in DiseFacilityAgg.objects.filter(
+                score=100).values_list('dise_info_id', 'df_metric_id'):
+            add('dise_facility', metric, dise_schools.get(dise_code))
+
+        programme_years = {}
+        for programme, year in Programme.objects.values_list(
+                'id', 'academic_year__name'):
+            programme_years.setdefault(year, []).append(programme)
+
+        return {
+            'ids': ids,
+            'size': size,
+            'all': (1 << size) - 1,
+            'programme_years': programme_years,
+            'facets': dict(
+                (name, Facet(size, values)) for name, values in fields.items()
+            ),
+        }
+
+    def get_facet(self, index, name):
+        return index['facets'].get(name) or Facet(index['size'], {})
+
+    def filter(self, params):
+        """
+            Returns (index, bitset) of the schools matching the SchoolsList
+            params.
+        """
+        index = self.get()
+        result = index['all']
+
+        stype = params.get('school_type', 'both')
+        if stype in SCHOOL_TYPES:
+            result &= self.get_facet(index, 'school_type').get(
+                SCHOOL_TYPES[stype])
+
+        for name in ('admin1', 'admin2', 'admin3'):
+            if params.get(name, ''):
+                result &= self.get_facet(index, name).get(
+                    self.to_int(params.get(name)))
+                break
+
+        for name in ('cat', 'sex', 'moi', 'mgmt'):
+            if params.get(name, ''):
+                result &= self.get_facet(index, name).get(params.get(name))
+
+        if params.get('partner_id', ''):
+            result &= self.get_facet(index, 'partner_id').get(
+                self.to_int(params.get('partner_id')))
+
+        if params.get('programmes', ''):
+            acyear = params.get('academic_year', settings.DEFAULT_ACADEMIC_YEAR)
+            programme_ids = index['programme_years'].get(acyear, [])
+            try:
+                requested = map(lambda x: int(x), params.get('programmes').split(','))
+                programme_ids = [p for p in programme_ids if p in requested]
+            except ValueError:
+                # malformed programmes are ignored, as before
+                pass
+            result &= self.get_facet(index, 'programme').union(programme_ids)
+
+        if params.get('dise_facility', ''):
+            for metric in params.get('dise_facility').split(','):
+                result &= self.get_facet(index, 'dise_facility').get(metric)
+
+        # only narrows down the schools if any of them has a report
+        if params.get('meetingreport', '') == 'yes':
+            with_reports = result & self.get_facet(index, 'meetingreport').get('yes')
+            if with_reports:
+                result = with_reports
+
+        return index, result
+
+    def to_int(self, value):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+
+    def get_ids(self, index, result):
+        ids = index['ids']
+        return [ids[position] for position in to_positions(result, index['size'])]
+
+    def get_counts(self, index, result):
+        result_bytes = to_bytes(result, index['size'])
+        return dict(
+            (name, facet.counts(result, result_bytes))
+            for name, facet in index['facets'].items()
+        )
+
+
+class SchoolIdList(object):
+    """
+        Stands in for a queryset over a known, ordered list of school ids,
+        so that pagination only ever fetches the schools on the page.
+    """
+
+    def __init__(self, ids, queryset):
+        self.ids = ids
+        self.queryset = queryset
+
+    def select_related(self, *fields):
+        return SchoolIdList(self.ids, self.queryset.select_related(*fields))
+
+    def prefetch_related(self, *lookups):
+        return SchoolIdList(self.ids, self.queryset.prefetch_related(*lookups))
+
+    def values_list(self, *fields):
+        # fields start with 'id'
+        return SchoolIdList(self.ids, self.queryset.values_list(*fields))
+
+    def count(self):
+        return len(self.ids)
+
+    def after(self, pk, limit):
+        """
+            The schools following pk, for cursor pagination.
+        """
+        start = bisect_right(self.ids, pk) if pk is not None else 0
+        return self.fetch(self.ids[start:start + limit])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def fetch(self, ids):
+        if isinstance(self.queryset, ValuesListQuerySet):
+            schools = dict(
+                (row[0], row) for row in self.queryset.filter(id__in=ids))
+        else:
+            schools = self.queryset.in_bulk(ids)
+        return [schools[pk] for pk in ids if pk in schools]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.fetch(self.ids[key])
+        return self.fetch([self.ids[key]])[0]
+
+    def __iter__(self):
+        for i in range(0, len(self.ids), 1000):
+            for school in self.fetch(self.ids[i:i + 1000]):
+                yield school
+
+
+school_facets = SchoolFacets()
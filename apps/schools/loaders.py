@@ -0,0 +1,258 @@
+from collections import defaultdict
+from django.db.models import Sum
+from common.utils import cached_property
+from schools.models import (
+    Boundary, SchoolDetails, InstitutionAssessmentCohorts,
+    InstitutionAssessmentSinglescoreGender, InstitutionAssessmentSinglescoreMt,
+    BoundaryAssessmentSinglescore, BoundaryAssessmentSinglescoreGender,
+    BoundaryAssessmentSinglescoreMt, BoundaryAssessmentPercentile
+)
+
+SCORE_FIELDS = ('singlescore', 'percentile', 'gradesinglescore')
+
+
+def group_rows(queryset, key_fields, value_fields):
+    """
+        Runs one values() query and returns {key: [row, ...]}, key being the
+        tuple of key_fields and each row a dict of value_fields.
+    """
+    grouped = defaultdict(list)
+    for row in queryset.values(*(key_fields + value_fields)):
+        grouped[tuple(row.pop(field) for field in key_fields)].append(row)
+    return grouped
+
+
+def cohort_details(queryset, entity):
+    """
+        Total, per gender and per mother tongue cohort sizes for every
+        (entity, assessment, studentgroup) in queryset, in one query.
+    """
+    totals = defaultdict(lambda: {
+        'total': 0, 'gender': defaultdict(int), 'mt': defaultdict(int)
+    })
+    for row in queryset.values(entity, 'assessment', 'studentgroup', 'sex', 'mt')\
+            .annotate(total=Sum('cohortsnum')):
+        cohorts = totals[(row[entity], row['assessment'], row['studentgroup'])]
+        cohorts['total'] += row['total']
+        cohorts['gender'][row['sex']] += row['total']
+        cohorts['mt'][row['mt']] += row['total']
+
+    details = {}
+    for key, cohorts in totals.items():
+        details[key] = {
+            'total': cohorts['total'],
+            'gender': [{'sex': sex, 'total': total}
+                       for sex, total in cohorts['gender'].items()],
+            'mt': [{'mt': mt, 'total': total}
+                   for mt, total in cohorts['mt'].items()],
+        }
+    return details
+
+
+class AssessmentLoader(object):
+    """
+        Loads what the assessment serializers show for a whole page of
+        score rows at once. Each table is read with a single query over the
+        entities and assessments of the page, the first time it is needed,
+        instead of a dozen queries per row.
+    """
+    entity = None
+    gender_model = None
+    mt_model = None
+
+    def __init__(self, objects):
+        self.entity_ids = set(self.get_entity_id(obj) for obj in objects)
+        self.assessment_ids = set(obj.assessment_id for obj in objects)
+
+    def get_entity_id(self, obj):
+        return getattr(obj, self.entity + '_id')
+
+    def get_key(self, obj, entity_id=None):
+        if entity_id is None:
+            entity_id = self.get_entity_id(obj)
+        return (entity_id, obj.assessment_id, obj.studentgroup)
+
+    def get_ancestors(self, obj):
+        """
+            The (btype, boundary id) pairs shown alongside obj.
+        """
+        raise NotImplementedError
+
+    @cached_property
+    def boundary_ids(self):
+        ids = set()
+        for ancestors in self.ancestors.values():
+            ids.update(boundary_id for btype, boundary_id in ancestors)
+        return ids
+
+    def filter(self, model, entity, ids):
+        return model.objects.filter(**{
+            entity + '__in': ids,
+            'assessment__in': self.assessment_ids
+        })
+
+    def group(self, model, entity, ids, value_fields, studentgroup=True):
+        key_fields = (entity, 'assessment')
+        if studentgroup:
+            key_fields += ('studentgroup',)
+        return group_rows(
+            self.filter(model, entity, ids), key_fields, value_fields)
+
+    @cached_property
+    def gender(self):
+        return self.group(self.gender_model, self.entity, self.entity_ids,
+                          ('sex',) + SCORE_FIELDS)
+
+    @cached_property
+    def mt(self):
+        return self.group(self.mt_model, self.entity, self.entity_ids,
+                          ('mt',) + SCORE_FIELDS)
+
+    @cached_property
+    def boundary_scores(self):
+        return self.group(BoundaryAssessmentSinglescore, 'boundary',
+                          self.boundary_ids, SCORE_FIELDS + ('boundary__name',))
+
+    @cached_property
+    def boundary_gender(self):
+        return self.group(BoundaryAssessmentSinglescoreGender, 'boundary',
+                          self.boundary_ids, ('sex',) + SCORE_FIELDS)
+
+    @cached_property
+    def boundary_mt(self):
+        return self.group(BoundaryAssessmentSinglescoreMt, 'boundary',
+                          self.boundary_ids, ('mt',) + SCORE_FIELDS)
+
+    @cached_property
+    def boundary_percentiles(self):
+        return self.group(BoundaryAssessmentPercentile, 'boundary',
+                          self.boundary_ids, ('percentile', 'boundary__name'),
+                          studentgroup=False)
+
+    def get_cohorts_details(self, obj):
+        return self.cohorts.get(self.get_key(obj), {
+            'total': None, 'gender': [], 'mt': []
+        })
+
+    def get_singlescore_details(self, obj):
+        key = self.get_key(obj)
+        singlescore = {
+            'gender': self.gender.get(key, []),
+            'mt': self.mt.get(key, []),
+            'boundary': [],
+        }
+        for btype, boundary_id in self.get_ancestors(obj):
+            key = self.get_key(obj, boundary_id)
+            # a missing score fails like the single row lookups did
+            data = dict(self.boundary_scores[key][0])
+            data['boundary'] = boundary_id
+            data['gender'] = self.boundary_gender.get(key, [])
+            data['mt'] = self.boundary_mt.get(key, [])
+            data['btype'] = btype
+            singlescore['boundary'].append(data)
+        return singlescore
+
+    def get_boundary_percentiles(self, obj):
+        data = []
+        for btype, boundary_id in self.get_ancestors(obj):
+            percentile = dict(
+                self.boundary_percentiles[(boundary_id, obj.assessment_id)][0])
+            percentile['boundary'] = boundary_id
+            percentile['btype'] = btype
+            data.append(percentile)
+        return data
+
+
+class InstitutionAssessmentLoader(AssessmentLoader):
+    """
+        For the school score rows, shown with their district, block and
+        cluster scores.
+    """
+    entity = 'school'
+    gender_model = InstitutionAssessmentSinglescoreGender
+    mt_model = InstitutionAssessmentSinglescoreMt
+
+    @cached_property
+    def ancestors(self):
+        return dict(
+            (school_id, [('admin_1', admin1), ('admin_2', admin2),
+                         ('admin_3', admin3)])
+            for school_id, admin1, admin2, admin3 in
+            SchoolDetails.objects.filter(school__in=self.entity_ids)
+            .values_list('school', 'admin1', 'admin2', 'admin3')
+        )
+
+    def get_ancestors(self, obj):
+        return self.ancestors[obj.school_id]
+
+    @cached_property
+    def cohorts(self):
+        return cohort_details(
+            self.filter(InstitutionAssessmentCohorts, 'school', self.entity_ids),
+            'school')
+
+
+class BoundaryAssessmentLoader(AssessmentLoader):
+    """
+        For the boundary score rows, shown with the scores of the boundaries
+        above them. Cohorts are summed over the schools in the boundary.
+    """
+    entity = 'boundary'
+    gender_model = BoundaryAssessmentSinglescoreGender
+    mt_model = BoundaryAssessmentSinglescoreMt
+
+    @cached_property
+    def boundaries(self):
+        return dict(
+            (row[0], row[1:]) for row in
+            Boundary.objects.filter(id__in=self.entity_ids)
+            .values_list('id', 'hierarchy', 'parent', 'parent__parent')
+        )
+
+    @cached_property
+    def ancestors(self):
+        ancestors = {}
+        for boundary_id, (hierarchy, parent, grandparent) in self.boundaries.items():
+            if hierarchy in (11, 15):
+                ancestors[boundary_id] = [('admin_1', grandparent),
+                                          ('admin_2', parent)]
+            elif hierarchy in (10, 14):
+                ancestors[boundary_id] = [('admin_1', parent)]
+            else:
+                ancestors[boundary_id] = []
+        return ancestors
+
+    def get_ancestors(self, obj):
+        return self.ancestors[obj.boundary_id]
+
+    @cached_property
+    def boundary_ids(self):
+        # the page's own boundaries, so their gender and mt scores come with
+        # those of the boundaries above them
+        return super(BoundaryAssessmentLoader, self).boundary_ids | self.entity_ids
+
+    @property
+    def gender(self):
+        return self.boundary_gender
+
+    @property
+    def mt(self):
+        return self.boundary_mt
+
+    @cached_property
+    def cohorts(self):
+        levels = defaultdict(set)
+        for boundary_id, (hierarchy, parent, grandparent) in self.boundaries.items():
+            if hierarchy in (11, 15):
+                levels['admin3'].add(boundary_id)
+            elif hierarchy in (10, 14):
+                levels['admin2'].add(boundary_id)
+            elif hierarchy in (9, 13):
+                levels['admin1'].add(boundary_id)
+
+        cohorts = {}
+        for level, ids in levels.items():
+            entity = 'school__schooldetails__' + level
+            cohorts.update(cohort_details(
+                self.filter(InstitutionAssessmentCohorts, entity, ids), entity))
+        return cohorts
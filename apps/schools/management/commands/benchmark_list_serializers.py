@@ -0,0 +1,65 @@
+import time
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from schools.models import School, Boundary
+from schools.serializers import (
+    SchoolListSerializer, SchoolListValuesSerializer, BoundarySerializer,
+    BoundaryValuesSerializer
+)
+
+LISTS = (
+    ('schools', School.objects.filter(status=2).order_by('id').select_related(
+        'schooldetails__type', 'schooldetails__admin1',
+        'schooldetails__admin2', 'schooldetails__admin3', 'address',
+        'admin3__hierarchy'
+    ).prefetch_related('meetingreport_set'),
+        SchoolListSerializer, SchoolListValuesSerializer),
+    ('boundaries', Boundary.objects.order_by('id').select_related('hierarchy'),
+        BoundarySerializer, BoundaryValuesSerializer),
+)
+
+
+class Command(BaseCommand):
+    help = """Times the model serializers of the list endpoints against
+            their values_list() stand-ins.
+
+            python manage.py benchmark_list_serializers [--rows=1000,10000] [--repeat=3]
+
+            Prints the best time of --repeat runs for each size, fetching
+            included, and whether both give the same output.
+            """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--rows', default='1000,10000',
+                    help='Comma separated list sizes to time'),
+        make_option('--repeat', type='int', default=3,
+                    help='Number of runs to take the best of'),
+    )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['rows'].split(',')]
+        for name, queryset, serializer_class, values_serializer_class in LISTS:
+            for size in sizes:
+                model_time, model_data = self.time(
+                    options['repeat'],
+                    lambda: serializer_class(queryset[:size], many=True).data)
+                values_time, values_data = self.time(
+                    options['repeat'],
+                    lambda: values_serializer_class(
+                        values_serializer_class.values_list(queryset)[:size],
+                        many=True).data)
+                print "%s x %d: model %.3fs, values %.3fs (%.1fx), %s" % (
+                    name, len(model_data), model_time, values_time,
+                    model_time / values_time if values_time else 0,
+                    'same output' if model_data == values_data else 'OUTPUT DIFFERS'
+                )
+
+    def time(self, repeat, serialize):
+        best = None
+        for i in range(repeat):
+            start = time.time()
+            data = serialize()
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best, data
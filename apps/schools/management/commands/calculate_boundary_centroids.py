@@ -1,55 +1,186 @@
-from schools.models import School, Boundary, BoundaryHierarchy, BoundaryCoord
-from django.core.management.base import BaseCommand
+import os
 import json
-from datetime import datetime
+import psycopg2
+from optparse import make_option
+from django.conf import settings
+from django.db import connection
+from django.core.management.base import BaseCommand
 from common.utils import get_logfile_path
 
+# Hierarchy name -> column of mvw_school_details holding that boundary
+BOUNDARY_TYPES = {
+    'district': 'district_id',
+    'block': 'block_or_project_id',
+    'project': 'block_or_project_id',
+    'cluster': 'cluster_or_circle_id',
+    'circle': 'cluster_or_circle_id'
+}
+
+# One pass over all school points. Every school contributes its point once
+# per admin level, and the hierarchy join keeps only the boundary types
+# above (so preschool districts and the like fall out on their own).
+# The fingerprint changes whenever a school moves, or is added to or
+# removed from a boundary, and drives the incremental mode.
+CENTROIDS_QUERY = """
+    WITH points AS (
+        SELECT sd.district_id AS bid, ic.instid, ic.coord
+            FROM mvw_school_details sd
+            JOIN mvw_inst_coord ic ON ic.instid = sd.id
+        UNION ALL
+        SELECT sd.block_or_project_id, ic.instid, ic.coord
+            FROM mvw_school_details sd
+            JOIN mvw_inst_coord ic ON ic.instid = sd.id
+        UNION ALL
+        SELECT sd.cluster_or_circle_id, ic.instid, ic.coord
+            FROM mvw_school_details sd
+            JOIN mvw_inst_coord ic ON ic.instid = sd.id
+    )
+    SELECT p.bid,
+        bh.name,
+        ST_AsText(ST_Centroid(ST_Collect(p.coord))),
+        md5(string_agg(p.instid || ':' || ST_AsText(p.coord), ','
+                       ORDER BY p.instid))
+    FROM points p
+    JOIN tb_boundary b ON b.id = p.bid
+    JOIN tb_bhierarchy bh ON bh.id = b.hid
+    WHERE bh.name IN %s
+    GROUP BY p.bid, bh.name
+"""
+
+EMPTY_BOUNDARIES_QUERY = """
+    SELECT b.id FROM tb_boundary b
+    JOIN tb_bhierarchy bh ON bh.id = b.hid
+    WHERE bh.name IN %s
+    AND NOT EXISTS (
+        SELECT 1 FROM mvw_school_details sd
+        JOIN mvw_inst_coord ic ON ic.instid = sd.id
+        WHERE b.id IN (sd.district_id, sd.block_or_project_id,
+                       sd.cluster_or_circle_id)
+    )
+    ORDER BY b.id
+"""
+
+# Runs on klp-coord. Update what exists, insert the rest - klp-coord
+# predates ON CONFLICT so there is no single statement upsert.
+UPSERT_QUERIES = [
+    """CREATE TEMP TABLE centroids_staging (
+        id_bndry integer PRIMARY KEY,
+        type varchar(20),
+        coord geometry
+    ) ON COMMIT DROP;""",
+    "INSERT INTO centroids_staging VALUES %s;",
+    """UPDATE boundary_coord bc SET coord = cs.coord
+        FROM centroids_staging cs WHERE bc.id_bndry = cs.id_bndry;""",
+    """INSERT INTO boundary_coord (id_bndry, type, coord)
+        SELECT cs.id_bndry, cs.type, cs.coord FROM centroids_staging cs
+        WHERE NOT EXISTS (
+            SELECT 1 FROM boundary_coord bc WHERE bc.id_bndry = cs.id_bndry
+        );""",
+]
+
+STATE_FILE = os.path.join(settings.LOGS_FOLDER, 'boundary_centroids_state.json')
+
+
 class Command(BaseCommand):
     help = """Calculates boundary centroids (based on points of schools within)
-            Generates a boundaries_sql.sql file that needs to be run
-            on the klp-coord db.
+            in a single pass and upserts them into boundary_coord on the
+            klp-coord db.
+
+            python manage.py calculate_boundary_centroids [--incremental] [--dry-run]
+
+            --incremental only writes boundaries whose schools changed since
+            the last run. --dry-run writes a boundaries_sql.sql file instead
+            of touching klp-coord.
             After this, remember to refresh materialized views.
             """
 
-    def handle(self, *args, **kwargs):
-        now = datetime.now()
+    option_list = BaseCommand.option_list + (
+        make_option('--incremental', action='store_true', default=False,
+                    help='Only upsert boundaries whose schools changed since the last run'),
+        make_option('--dry-run', action='store_true', default=False,
+                    dest='dry_run',
+                    help='Write the SQL to a file instead of running it on klp-coord'),
+    )
+
+    def handle(self, *args, **options):
+        centroids = self.get_centroids()
+        print "%d boundaries with schools" % len(centroids)
+
+        previous = self.load_state() if options['incremental'] else {}
+        changed = [
+            c for c in centroids if previous.get(str(c['id'])) != c['fingerprint']
+        ]
+        print "%d boundaries to update" % len(changed)
 
-        #error_file = open("gis_errors.txt", "w")
-        #success_file = open("gis_success.txt", "w")
+        if options['dry_run']:
+            self.write_sql(changed)
+        elif changed:
+            self.upsert(changed)
+
+        if not options['dry_run']:
+            self.save_state(centroids)
+
+        errors = open(get_logfile_path("empty_boundaries", "txt"), "w")
+        errors.write(json.dumps(self.get_empty_boundaries(), indent=2))
+        errors.close()
+
+    def get_centroids(self):
+        cursor = connection.cursor()
+        cursor.execute(CENTROIDS_QUERY, [tuple(BOUNDARY_TYPES.keys())])
+        return [{
+            'id': bid,
+            'type': name.capitalize(),
+            'wkt': wkt,
+            'fingerprint': fingerprint
+        } for bid, name, wkt, fingerprint in cursor.fetchall()]
+
+    def get_empty_boundaries(self):
+        cursor = connection.cursor()
+        cursor.execute(EMPTY_BOUNDARIES_QUERY, [tuple(BOUNDARY_TYPES.keys())])
+        return [row[0] for row in cursor.fetchall()]
+
+    def upsert(self, centroids):
+        coord_connection, cursor = self.connectKlpCoord()
+        values = ",".join(
+            cursor.mogrify(
+                "(%s, %s, ST_SetSRID(ST_GeomFromText(%s), 4326))",
+                (c['id'], c['type'], c['wkt'])
+            ) for c in centroids
+        )
+        try:
+            for query in UPSERT_QUERIES:
+                if '%s' in query:
+                    query = query % values
+                cursor.execute(query)
+            coord_connection.commit()
+        except:
+            coord_connection.rollback()
+            raise
+        finally:
+            coord_connection.close()
+
+    def write_sql(self, centroids):
         output_sql = open(get_logfile_path("boundaries_sql", "sql"), "w")
-        BOUNDARY_TYPES = {
-            'district': 'admin1',
-            'block': 'admin2',
-            'project': 'admin2',
-            'cluster': 'admin3',
-            'circle': 'admin3'
-        }
-        empty_boundaries = []
-        for hierarchy in BoundaryHierarchy.objects.all():
-            hierarchy_name = hierarchy.name
-            if hierarchy_name not in BOUNDARY_TYPES:
-                continue
-            admin_level = BOUNDARY_TYPES[hierarchy_name]
-            boundaries = Boundary.objects.filter(hierarchy=hierarchy)
-            for boundary in boundaries:
-                qstring = "schooldetails__%s" % admin_level
-                filter_q = {qstring: boundary}
-                schools = School.objects.filter(**filter_q).exclude(instcoord__isnull=True)
-                if not schools.exists():
-                    empty_boundaries.append(boundary.id)
-                    continue
-                #import pdb;pdb.set_trace()
-                points = [s.instcoord.coord for s in schools]
-                multipoint_string = ", ".join(["%f %f" % (p.x, p.y,) for p in points])
-                multipoint_wkt = "MULTIPOINT(%s)" % multipoint_string
-                hierarchy_cap = hierarchy_name.capitalize()
-                if BoundaryCoord.objects.filter(boundary=boundary).exists():
-                    sql = "UPDATE boundary_coord SET coord=ST_SetSRID(ST_Centroid('%s'), 4326) WHERE id_bndry=%d;" % (multipoint_wkt, boundary.id,)
-                else:
-                    sql = "INSERT INTO boundary_coord (id_bndry, type, coord) VALUES (%d, '%s', ST_SetSRID(ST_Centroid('%s'), 4326));" % (boundary.id, hierarchy_cap, multipoint_wkt,)
-                print sql
-                output_sql.write(sql + "\n")
+        for c in centroids:
+            sql = "UPDATE boundary_coord SET coord=ST_SetSRID(ST_GeomFromText('%s'), 4326) WHERE id_bndry=%d;\n" % (c['wkt'], c['id'],)
+            sql += "INSERT INTO boundary_coord (id_bndry, type, coord) SELECT %d, '%s', ST_SetSRID(ST_GeomFromText('%s'), 4326) WHERE NOT EXISTS (SELECT 1 FROM boundary_coord WHERE id_bndry=%d);\n" % (c['id'], c['type'], c['wkt'], c['id'],)
+            output_sql.write(sql)
         output_sql.close()
-        errors = open(get_logfile_path("empty_boundaries", "txt"), "w")
-        errors.write(json.dumps(empty_boundaries, indent=2))
-        errors.close()
\ No newline at end of file
+
+    def load_state(self):
+        if not os.path.exists(STATE_FILE):
+            return {}
+        with open(STATE_FILE) as f:
+            return json.load(f)
+
+    def save_state(self, centroids):
+        if not os.path.exists(settings.LOGS_FOLDER):
+            os.mkdir(settings.LOGS_FOLDER)
+        with open(STATE_FILE, "w") as f:
+            json.dump(dict(
+                (str(c['id']), c['fingerprint']) for c in centroids
+            ), f)
+
+    def connectKlpCoord(self):
+        coord_connection = psycopg2.connect("dbname=klp-coord user=klp")
+        return coord_connection, coord_connection.cursor()
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.core.cache import cache
+from common.utils import bump_data_epoch
 
 
 class Command(BaseCommand):
@@ -7,4 +8,5 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         cache.clear()
+        bump_data_epoch()
         self.stdout.write('Successfully Cleared Cache')
@@ -0,0 +1,117 @@
+import os
+import time
+from multiprocessing import Pool
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from schools.models import SchoolExtra
+from schools.snapshots import (
+    snapshot_urls, snapshot_key, render_snapshot, load_manifest,
+    save_manifest
+)
+
+
+class Command(BaseCommand):
+    help = """Writes the read API responses that only change on refresh
+            (boundary lists and details, boundary and constituency
+            aggregations, reports, programme info) as static, gzipped
+            json files with a manifest, for nginx to serve.
+
+            python manage.py export_snapshot [--root=<dir>] [--workers=4]
+                [--years=2014-2015,2013-2014|all] [--boundaries=1,2]
+
+            Files are <root>/<url path>/<sorted query string>.json, or
+            index.json without a query string, each with a .json.gz next
+            to it. manifest.json maps every url to its file and md5.
+            Unchanged responses are not rewritten. With --boundaries, only
+            the responses of those boundaries and the ones above them are
+            regenerated and the rest of the manifest is kept. E.g.
+
+                location /api/v1/ {
+                    gzip_static on;
+                    set $snapshot_query $args;
+                    if ($args = "") { set $snapshot_query index; }
+                    try_files /snapshot$uri/$snapshot_query.json @app;
+                }
+            """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--root',
+                    default=os.path.join(settings.PROJECT_ROOT, 'snapshot'),
+                    help='Directory to write the snapshot to'),
+        make_option('--workers', type='int', default=4,
+                    help='Number of processes rendering responses'),
+        make_option('--years', default=settings.DEFAULT_ACADEMIC_YEAR,
+                    help='Comma separated academic years, or all'),
+        make_option('--boundaries',
+                    help='Comma separated ids of the changed boundaries'),
+    )
+
+    def handle(self, *args, **options):
+        root = options['root']
+        if options['years'] == 'all':
+            years = sorted(SchoolExtra.objects.values_list(
+                'academic_year__name', flat=True).distinct())
+        else:
+            years = options['years'].split(',')
+
+        boundary_ids = None
+        if options['boundaries']:
+            boundary_ids = [int(i) for i in options['boundaries'].split(',')]
+
+        urls = snapshot_urls(years, boundary_ids)
+        manifest = load_manifest(root)
+        previous = manifest['files']
+        tasks = [
+            (path, params, root,
+             previous.get(snapshot_key(path, params), {}).get('md5'))
+            for path, params in urls
+        ]
+        print "Rendering %d responses with %d workers" % (
+            len(tasks), options['workers'])
+
+        # the workers are forked, they must not share our connection
+        connection.close()
+        pool = Pool(options['workers'])
+        files = {}
+        failed = []
+        try:
+            for i, (key, entry) in enumerate(
+                    pool.imap_unordered(render_snapshot, tasks, 20)):
+                if entry is None:
+                    failed.append(key)
+                else:
+                    files[key] = entry
+                if (i + 1) % 1000 == 0:
+                    print "%d/%d" % (i + 1, len(tasks))
+        finally:
+            pool.close()
+            pool.join()
+
+        if boundary_ids is None:
+            # responses no longer in the url space go away
+            for key, entry in previous.items():
+                if key not in files:
+                    self.remove(root, entry)
+        else:
+            previous.update(files)
+            files = previous
+        for key in failed:
+            if key in files:
+                self.remove(root, files.pop(key))
+
+        manifest = {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'years': years,
+            'files': files,
+        }
+        save_manifest(root, manifest)
+        print "%d files written to %s, %d failed" % (
+            len(files), root, len(failed))
+
+    def remove(self, root, entry):
+        filename = os.path.join(root, entry['path'])
+        for name in (filename, filename + '.gz'):
+            if os.path.exists(name):
+                os.remove(name)
@@ -4,7 +4,7 @@ from optparse import make_option
 from schools.models import School, MeetingReport
 from django.core.files import File
 from datetime import datetime
-from common.utils import Date
+from common.utils import Date, bump_data_epoch
 
 
 class Command(BaseCommand):
@@ -24,6 +24,7 @@ class Command(BaseCommand):
         #Run once only when the directory structure was changed.
         #self.runArchiveUpdate()
         walk(self.directory, self.processDir, None)
+        bump_data_epoch()
 
     def runArchiveUpdate(self):
         mr_list = MeetingReport.objects.all()
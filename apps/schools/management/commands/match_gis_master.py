@@ -1,53 +1,184 @@
-from schools.models import School, SchoolGIS, InstCoord
-from django.core.management.base import BaseCommand
 import json
-import csv
-from os.path import join
-from datetime import datetime
-from common.utils import get_logfile_path
+import psycopg2
+from optparse import make_option
+from django.db import connection
+from django.core.management.base import BaseCommand
+from common.utils import get_logfile_path, UnicodeWriter
+
+# Matches every school that has a numeric dise code against the GIS master
+# in one join. Duplicate codes in the GIS master are collapsed so they can
+# be reported instead of silently picking one. delta is the distance in
+# metres between the current school point and the GIS master centroid.
+MATCH_QUERY = """
+    WITH gis AS (
+        SELECT code,
+            min(name) AS name,
+            (array_agg(centroid))[1] AS centroid,
+            count(*) AS matches
+        FROM mvw_gis_master
+        GROUP BY code
+    ), schools AS (
+        SELECT id, name, dise_code,
+            CASE WHEN trim(dise_code) ~ '^[0-9]+$'
+                THEN trim(dise_code)::bigint END AS code
+        FROM tb_school
+        WHERE dise_code IS NOT NULL
+    )
+    SELECT s.id, s.name, s.dise_code, gis.name,
+        ST_AsText(gis.centroid),
+        gis.matches,
+        ic.instid IS NOT NULL,
+        ST_Distance(ic.coord::geography, gis.centroid::geography)
+    FROM schools s
+    LEFT JOIN gis ON gis.code = s.code
+    LEFT JOIN mvw_inst_coord ic ON ic.instid = s.id
+    WHERE s.code IS NOT NULL
+    ORDER BY s.id
+"""
+
+# Runs on klp-coord.
+STAGING_QUERY = """CREATE TEMP TABLE gis_staging (
+    instid integer PRIMARY KEY,
+    coord geometry
+) ON COMMIT DROP;"""
+
+STAGING_INSERT_QUERY = "INSERT INTO gis_staging VALUES %s;"
+
+APPLY_QUERIES = [
+    """UPDATE inst_coord ic SET coord = gs.coord
+        FROM gis_staging gs WHERE ic.instid = gs.instid;""",
+    """INSERT INTO inst_coord (instid, coord)
+        SELECT gs.instid, gs.coord FROM gis_staging gs
+        WHERE NOT EXISTS (
+            SELECT 1 FROM inst_coord ic WHERE ic.instid = gs.instid
+        );""",
+]
+
 
 class Command(BaseCommand):
     help = """Add points to schools from GIS master
-            Generates a gis_sql.sql file that needs to be run
-            on the klp-coord db.
+            Matches all schools against the GIS master in a single query and
+            writes the points of schools without one to inst_coord on the
+            klp-coord db.
+
+            python manage.py match_gis_master [--update-existing] [--threshold=100] [--chunk-size=1000] [--dry-run]
+
+            Schools whose existing point is more than --threshold metres
+            away from the GIS master are listed in the discrepancy report,
+            and moved as well when --update-existing is given.
+            --dry-run writes a gis_sql.sql file instead of touching klp-coord.
             After this, remember to refresh materialized views.
             """
 
-    def handle(self, *args, **kwargs):
-        output_sql = open(get_logfile_path("gis_sql", "sql"), "w")
-        #output_writer = csv.writer(output_csv)
+    option_list = BaseCommand.option_list + (
+        make_option('--update-existing', action='store_true', default=False,
+                    dest='update_existing',
+                    help='Also move schools that already have a point'),
+        make_option('--threshold', type='float', default=100.0,
+                    help='Distance in metres above which an existing point is a discrepancy'),
+        make_option('--chunk-size', type='int', default=1000,
+                    dest='chunk_size',
+                    help='Number of rows to fetch and stage at a time'),
+        make_option('--dry-run', action='store_true', default=False,
+                    dest='dry_run',
+                    help='Write the SQL to a file instead of running it on klp-coord'),
+    )
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+        chunk_size = options['chunk_size']
+
         dise_not_found = []
         successes = []
-        for school in School.objects.exclude(instcoord__isnull=False)\
-                                    .exclude(dise_info__isnull=True):
-            dise_code = school.dise_info_id
-            try:
-                dise_code_int = int(dise_code)
-            except:
-                continue
-            gis_results = SchoolGIS.objects.filter(code=dise_code_int)
-            if gis_results.count() == 0:
-                print "Dise code not found: " + dise_code
-                dise_not_found.append(dise_code_int)
-                #error_file.write("Dise code not found: " + dise_code + "\n")
-            elif gis_results.count() > 1:
-                print "More than one Dise code found: " + dise_code
-                #error_file.write("More than one Dise code found: " + dise_code + "\n")
-            else:
-                gis = gis_results[0]
-                sql = "INSERT INTO inst_coord (instid, coord) VALUES (%s, ST_GeomFromText('%s', 4326));\n" % (school.id, gis.centroid.wkt,)
-                output_sql.write(sql)    
-                success = {
-                    'gis_master_name': gis.name,
-                    'klp_name': school.name,
-                    'klp_id': school.id
-                }
-                successes.append(success)
-        output_sql.close()
-        error_file = open(get_logfile_path("gis_errors", "txt"), "w")
-        error_file.write(json.dumps(dise_not_found, indent=2))
-        error_file.close()
-        success_file = open(get_logfile_path("gis_success", "txt"), "w")
-        success_file.write(json.dumps(successes, indent=2))
-        success_file.close()
+        updates = []
+        with open(get_logfile_path("gis_discrepancies", "csv"), "w") as report_file:
+            report = UnicodeWriter(report_file)
+            report.writerow([
+                'klp_id', 'klp_name', 'dise_code', 'gis_master_name',
+                'delta_metres', 'reason'
+            ])
+            self.match(report, threshold, chunk_size, options['update_existing'],
+                       dise_not_found, successes, updates)
+
+        print "%d schools to update" % len(updates)
+        print "%d dise codes not found" % len(dise_not_found)
+
+        if options['dry_run']:
+            self.write_sql(updates)
+        elif updates:
+            self.apply(updates, chunk_size)
+
+        with open(get_logfile_path("gis_errors", "txt"), "w") as error_file:
+            error_file.write(json.dumps(dise_not_found, indent=2))
+        with open(get_logfile_path("gis_success", "txt"), "w") as success_file:
+            success_file.write(json.dumps(successes, indent=2))
+
+    def match(self, report, threshold, chunk_size, update_existing,
+              dise_not_found, successes, updates):
+        """
+        Fills dise_not_found, successes and updates from the match query,
+        writing the discrepancies to report.
+        """
+        cursor = connection.cursor()
+        cursor.execute(MATCH_QUERY)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for (school_id, school_name, dise_code, gis_name, wkt, matches,
+                 has_coord, delta) in rows:
+                if not matches:
+                    dise_not_found.append(dise_code)
+                    continue
+                if matches > 1:
+                    report.writerow([
+                        school_id, school_name, dise_code, gis_name, '',
+                        'duplicate dise code in GIS master'
+                    ])
+                    continue
+                if has_coord:
+                    if delta is None or delta <= threshold:
+                        continue
+                    report.writerow([
+                        school_id, school_name, dise_code, gis_name,
+                        "%.1f" % delta, 'point differs from GIS master'
+                    ])
+                    if not update_existing:
+                        continue
+                updates.append((school_id, wkt))
+                successes.append({
+                    'gis_master_name': gis_name,
+                    'klp_name': school_name,
+                    'klp_id': school_id
+                })
+
+    def apply(self, updates, chunk_size):
+        coord_connection, cursor = self.connectKlpCoord()
+        try:
+            cursor.execute(STAGING_QUERY)
+            for i in range(0, len(updates), chunk_size):
+                values = ",".join(
+                    cursor.mogrify(
+                        "(%s, ST_SetSRID(ST_GeomFromText(%s), 4326))", row
+                    ) for row in updates[i:i + chunk_size]
+                )
+                cursor.execute(STAGING_INSERT_QUERY % values)
+            for query in APPLY_QUERIES:
+                cursor.execute(query)
+            coord_connection.commit()
+        except:
+            coord_connection.rollback()
+            raise
+        finally:
+            coord_connection.close()
+
+    def write_sql(self, updates):
+        with open(get_logfile_path("gis_sql", "sql"), "w") as output_sql:
+            for school_id, wkt in updates:
+                sql = "UPDATE inst_coord SET coord=ST_GeomFromText('%s', 4326) WHERE instid=%s;\n" % (wkt, school_id,)
+                sql += "INSERT INTO inst_coord (instid, coord) SELECT %s, ST_GeomFromText('%s', 4326) WHERE NOT EXISTS (SELECT 1 FROM inst_coord WHERE instid=%s);\n" % (school_id, wkt, school_id,)
+                output_sql.write(sql)
 
+    def connectKlpCoord(self):
+        coord_connection = psycopg2.connect("dbname=klp-coord user=klp")
+        return coord_connection, coord_connection.cursor()
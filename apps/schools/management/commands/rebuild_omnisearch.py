@@ -0,0 +1,35 @@
+import os
+from optparse import make_option
+from django.conf import settings
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+from common.utils import bump_data_epoch
+
+SQL_FILE = os.path.join(settings.PROJECT_ROOT, 'sql', 'omni_search.sql')
+
+
+class Command(BaseCommand):
+    help = """Rebuilds the omni search table (mvw_omni_search).
+            Run after imports, once the other materialized views are refreshed.
+            The first run (or --recreate) creates it from sql/omni_search.sql,
+            which needs the pg_trgm extension.
+            """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--recreate', action='store_true', default=False,
+                    help='Drop and create the view instead of refreshing it'),
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT 1 FROM pg_matviews WHERE matviewname = 'mvw_omni_search'"
+        )
+        if options['recreate'] or not cursor.fetchone():
+            cursor.execute(open(SQL_FILE).read())
+            self.stdout.write('Created mvw_omni_search')
+        else:
+            cursor.execute("REFRESH MATERIALIZED VIEW mvw_omni_search")
+            self.stdout.write('Refreshed mvw_omni_search')
+        bump_data_epoch()
@@ -0,0 +1,45 @@
+from optparse import make_option
+from django.db import transaction
+from django.core.management.base import BaseCommand
+from schools.models import School, SchoolProfile
+from schools.profiles import save_profiles
+
+
+class Command(BaseCommand):
+    help = """Rebuilds the school profile documents served by
+            /schools/school/<id>/profile. Run after imports, once the
+            materialized views are refreshed.
+
+            python manage.py rebuild_school_profiles [--schools=1,2]
+
+            The documents are built for the current academic year. Only
+            those whose content changed are written. With --schools, only
+            those schools are rebuilt.
+            """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--schools',
+                    help='Comma separated ids of the schools to rebuild'),
+        make_option('--batch-size', dest='batch_size', type='int', default=500,
+                    help='Number of schools built at a time'),
+    )
+
+    def handle(self, *args, **options):
+        if options['schools']:
+            ids = sorted(int(i) for i in options['schools'].split(','))
+        else:
+            ids = sorted(set(
+                School.objects.filter(status=2).values_list('id', flat=True)
+            ) | set(
+                SchoolProfile.objects.values_list('school_id', flat=True)
+            ))
+
+        totals = [0, 0, 0]
+        batch_size = options['batch_size']
+        for start in range(0, len(ids), batch_size):
+            with transaction.atomic():
+                counts = save_profiles(ids[start:start + batch_size])
+            totals = [total + count for total, count in zip(totals, counts)]
+            print "%d/%d schools" % (min(start + batch_size, len(ids)), len(ids))
+
+        print "%d created, %d updated, %d deleted" % tuple(totals)
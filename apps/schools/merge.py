@@ -0,0 +1,141 @@
+import copy
+import hashlib
+import time
+import urllib
+import urlparse
+from multiprocessing import TimeoutError
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import resolve, Resolver404
+from django.db import close_old_connections
+from rest_framework.exceptions import APIException
+from common.mixins import CacheMixin, uncached_view
+from common.utils import get_data_epoch, LazyThreadPool
+
+merge_pool = LazyThreadPool(settings.MERGE_WORKERS)
+
+
+class MergeError(Exception):
+
+    def __init__(self, detail, status_code):
+        self.detail = detail
+        self.status_code = status_code
+
+
+class MergeExecutor(object):
+    """
+        Runs the endpoints of a /merge request concurrently on the shared
+        thread pool, each with its own db connection. Results of cached
+        endpoints (CacheMixin views) are kept in the cache and shared by all
+        the merges asking for them, until the data epoch changes.
+    """
+
+    def __init__(self, request, urlconf, prefix, timeout=None):
+        self.request = request
+        self.urlconf = urlconf
+        # where urlconf is mounted, for the paths the endpoints would have
+        # if requested directly
+        self.prefix = prefix
+        self.timeout = settings.MERGE_TIMEOUT if timeout is None else timeout
+
+    def run(self, endpoints):
+        """
+            Returns ({endpoint: data}, {endpoint: error}) for endpoints. An
+            error is {'status': ..., 'detail': ...}.
+        """
+        data = {}
+        errors = {}
+        pending = []
+        cached = self.get_cached(endpoints)
+        for endpoint in endpoints:
+            if endpoint in cached:
+                data[endpoint] = cached[endpoint]
+            else:
+                pending.append((endpoint, merge_pool.get().apply_async(
+                    self.call, (endpoint,))))
+
+        deadline = time.time() + self.timeout
+        for endpoint, result in pending:
+            try:
+                data[endpoint] = result.get(max(0, deadline - time.time()))
+            except TimeoutError:
+                errors[endpoint] = {'status': 504, 'detail': 'timed out'}
+            except MergeError as e:
+                errors[endpoint] = {'status': e.status_code, 'detail': e.detail}
+            except Exception as e:
+                errors[endpoint] = {'status': 500, 'detail': unicode(e)}
+        return data, errors
+
+    def call(self, endpoint):
+        # runs in a pool thread, whose connection is closed when done
+        try:
+            return self.run_endpoint(endpoint)
+        finally:
+            close_old_connections()
+
+    def run_endpoint(self, endpoint):
+        parsed = urlparse.urlparse(endpoint)
+        try:
+            view, args, kwargs = resolve(parsed.path, urlconf=self.urlconf)
+        except Resolver404:
+            raise MergeError('not found', 404)
+
+        try:
+            response = uncached_view(view)(
+                self.get_request(parsed), *args, **kwargs)
+        except APIException as e:
+            raise MergeError(e.detail, e.status_code)
+        if response.status_code >= 400:
+            raise MergeError(
+                getattr(response, 'data', None), response.status_code)
+
+        if self.is_cached(view):
+            cache.set(self.get_cache_key(endpoint), response.data,
+                      settings.CACHE_TIMEOUT)
+        return response.data
+
+    def get_request(self, parsed):
+        """
+            The request the endpoint would get on its own: its path and
+            query string, plus the params of the merge request itself.
+        """
+        request = copy.copy(self.request._request)
+        params = self.request.GET.copy()
+        params.pop('endpoints', None)
+        for key, values in urlparse.parse_qs(
+                parsed.query, keep_blank_values=True).items():
+            params.setlist(key, values)
+        request.GET = params
+        request.path = request.path_info = self.prefix + parsed.path.lstrip('/')
+        request.META = dict(request.META, PATH_INFO=request.path,
+                            QUERY_STRING=params.urlencode())
+        return request
+
+    def is_cached(self, view):
+        view_class = getattr(view, 'cls', None)
+        return settings.CACHE_ENABLED and view_class is not None and \
+            issubclass(view_class, CacheMixin)
+
+    def get_cache_key(self, endpoint):
+        request = self.get_request(urlparse.urlparse(endpoint))
+        params = sorted(
+            (key, [value.encode('utf-8') for value in values])
+            for key, values in request.GET.lists()
+        )
+        url = request.path + '?' + urllib.urlencode(params, doseq=True)
+        return 'merge:%s:%s' % (get_data_epoch(), hashlib.md5(url).hexdigest())
+
+    def get_cached(self, endpoints):
+        if not settings.CACHE_ENABLED:
+            return {}
+        keys = {}
+        for endpoint in endpoints:
+            try:
+                view = resolve(urlparse.urlparse(endpoint).path,
+                               urlconf=self.urlconf).func
+            except Resolver404:
+                continue
+            if self.is_cached(view):
+                keys[self.get_cache_key(endpoint)] = endpoint
+        found = cache.get_many(keys.keys())
+        return dict((keys[key], value) for key, value in found.items())
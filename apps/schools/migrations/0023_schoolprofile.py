@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0022_auto_20170602_0617'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchoolProfile',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('document', models.TextField()),
+                ('checksum', models.CharField(max_length=32)),
+                ('updated_at', models.DateTimeField()),
+                ('school', models.OneToOneField(to='schools.School')),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=(models.Model,),
+        ),
+    ]
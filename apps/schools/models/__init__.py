@@ -1,8 +1,9 @@
 from .education import (AcademicYear, Address, BoundaryHierarchy, Boundary,
     BoundaryType, BoundaryUsers, Child, StudentGroup, School, Student,
-    StudentStudentGroup, Teacher, TeacherStudentGroup, TeacherQualification,
+    StudentStudentGroup, Teacher, TeacherSchoolYear, TeacherStudentGroup,
+    TeacherQualification,
     BoundaryPrimarySchool, SchoolDetails, MeetingReport,
-    SchoolExtra, SchoolAggregation)
+    SchoolExtra, SchoolAggregation, SchoolProfile)
 
 from .assessments import (
     Assessment, AssessmentsV2, InstitutionAgg,
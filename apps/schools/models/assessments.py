@@ -1,7 +1,10 @@
 from __future__ import unicode_literals
 from common.models import BaseModel
+from common.utils import bump_data_epoch
 from .choices import MT_CHOICES, SEX_CHOICES
 from django.contrib.gis.db import models
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
 
 from .education import StudentsV2
 
@@ -269,6 +272,14 @@ class Programme(BaseModel):
         db_table = 'tb_programme'
 
 
+@receiver(post_save, sender=Programme)
+@receiver(post_delete, sender=Programme)
+def programme_changed(sender, raw=False, **kwargs):
+    # the facet index maps academic years to programmes
+    if not raw:
+        bump_data_epoch()
+
+
 class SchoolProgrammes(BaseModel):
     programme = models.ForeignKey('Programme',related_name='programmes')
     school = models.ForeignKey('School', related_name='schools')
@@ -2,12 +2,15 @@ from __future__ import unicode_literals
 
 import json
 
-from common.utils import cached_property
+from common.utils import cached_property, bump_data_epoch
 from stories.models import StoryImage, Question
 from common.models import BaseModel, GeoBaseModel
 
 from django.conf import settings
 from django.contrib.gis.db import models
+from django.db import connection
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
 from django.db.models import Sum, Count, Q
 from django.core.urlresolvers import reverse
 
@@ -106,9 +109,13 @@ class Boundary(BaseModel):
         return self.hierarchy.name
 
     def get_school_type(self):
-        if self.hierarchy_id in [9, 10, 11]:
+        return self.school_type_for(self.hierarchy_id)
+
+    @staticmethod
+    def school_type_for(hierarchy_id):
+        if hierarchy_id in [9, 10, 11]:
             return 'primaryschool'
-        elif self.hierarchy_id in [13, 14, 15]:
+        elif hierarchy_id in [13, 14, 15]:
             return 'preschool'
         else:
             return 'school'
@@ -522,6 +529,67 @@ class Teacher(BaseModel):
         db_table = 'tb_teacher'
 
 
+class TeacherSchoolYear(BaseModel):
+    '''
+    View table:
+    One row per teacher, school and academic year the teacher has a class
+    in, with the school's boundaries.
+    '''
+    id = models.CharField(max_length=100, primary_key=True)
+    teacher = models.ForeignKey('Teacher')
+    school = models.ForeignKey('School')
+    academic_year = models.ForeignKey('AcademicYear')
+    admin1 = models.ForeignKey('Boundary', related_name='teachers_admin1')
+    admin2 = models.ForeignKey('Boundary', related_name='teachers_admin2')
+    admin3 = models.ForeignKey('Boundary', related_name='teachers_admin3')
+
+    COUNTS_QUERY = """
+        SELECT boundary_id, academic_year_id, count(DISTINCT teacher_id)
+        FROM (
+            SELECT admin1_id AS boundary_id, academic_year_id, teacher_id, school_id
+            FROM mvw_teacher_school_year
+            WHERE admin1_id IN %(boundaries)s AND academic_year_id IN %(years)s
+            UNION ALL
+            SELECT admin2_id, academic_year_id, teacher_id, school_id
+            FROM mvw_teacher_school_year
+            WHERE admin2_id IN %(boundaries)s AND academic_year_id IN %(years)s
+            UNION ALL
+            SELECT admin3_id, academic_year_id, teacher_id, school_id
+            FROM mvw_teacher_school_year
+            WHERE admin3_id IN %(boundaries)s AND academic_year_id IN %(years)s
+        ) teachers
+        WHERE school_id IN (SELECT id FROM tb_school WHERE status = 2)
+        GROUP BY boundary_id, academic_year_id
+    """
+
+    def __unicode__(self):
+        return "%s: %s in %s" % (self.teacher_id, self.school_id,
+                                 self.academic_year_id,)
+
+    @classmethod
+    def counts(cls, boundary_ids, academic_year_ids):
+        """
+            Number of teachers in the active schools of each boundary and
+            academic year, as {(boundary id, academic year id): count}, in
+            one query. Pairs without teachers are left out.
+        """
+        if not boundary_ids or not academic_year_ids:
+            return {}
+        cursor = connection.cursor()
+        cursor.execute(cls.COUNTS_QUERY, {
+            'boundaries': tuple(boundary_ids),
+            'years': tuple(academic_year_ids),
+        })
+        return dict(
+            ((boundary_id, academic_year_id), count)
+            for boundary_id, academic_year_id, count in cursor.fetchall()
+        )
+
+    class Meta:
+        managed = False
+        db_table = 'mvw_teacher_school_year'
+
+
 class TeacherStudentGroup(BaseModel):
     teacher = models.ForeignKey('Teacher', db_column='teacherid',
                                 primary_key=True)
@@ -560,6 +628,29 @@ class MeetingReport(BaseModel):
         return "%d: %s" % (self.school.id, self.language,)
 
 
+@receiver(post_save, sender=MeetingReport)
+@receiver(post_delete, sender=MeetingReport)
+def meeting_report_changed(sender, raw=False, **kwargs):
+    # the facet index filters schools by meetingreport=yes
+    if not raw:
+        bump_data_epoch()
+
+
+class SchoolProfile(BaseModel):
+    """
+        Everything on the school page, as one JSON document per school, for
+        the current academic year. Built by the rebuild_school_profiles
+        command.
+    """
+    school = models.OneToOneField('School')
+    document = models.TextField()
+    # md5 of document, so that rebuilds only write what changed
+    checksum = models.CharField(max_length=32)
+    updated_at = models.DateTimeField()
+
+    def __unicode__(self):
+        return "%d" % (self.school_id,)
+
 
 class SchoolAggregation(BaseModel):
     school = models.ForeignKey('School')
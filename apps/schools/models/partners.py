@@ -117,9 +117,11 @@ class DiseInfo(BaseModel):
         managed = False
         db_table = 'mvw_dise_info_olap'
 
+    # Both use .all() so that the views can prefetch the aggregations
+    # (with their metrics) for any number of schools.
     def get_rte_details(self):
         dise_rte = {}
-        for rte in self.diserteagg_set.all().select_related('rte_metric'):
+        for rte in self.diserteagg_set.all():
             if rte.rte_group not in dise_rte:
                 dise_rte[rte.rte_group] = {}
             dise_rte[rte.rte_group][rte.rte_metric.value] = rte.status
@@ -127,7 +129,7 @@ class DiseInfo(BaseModel):
 
     def get_facility_details(self):
         dise_facilities = {}
-        for facility in self.disefacilityagg_set.all().select_related('df_metric'):
+        for facility in self.disefacilityagg_set.all():
             if facility.df_group not in dise_facilities:
                 dise_facilities[facility.df_group] = {}
             dise_facilities[facility.df_group][str(facility.df_metric.value).strip()] = (facility.score == 100)
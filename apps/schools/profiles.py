@@ -0,0 +1,252 @@
+import hashlib
+import json
+from collections import defaultdict
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from schools.models import (
+    School, SchoolExtra, InstitutionAgg, LibLevelAgg, LibLangAgg, LibBorrow,
+    SchoolProfile
+)
+from schools.models.education import SchoolClassTotalYear
+from schools.serializers import (
+    SchoolInfoSerializer, SchoolDemographicsSerializer,
+    SchoolProgrammesSerializer, SchoolNutritionSerializer,
+    SchoolInfraSerializer, PrechoolInfraSerializer, SchoolLibrarySerializer,
+    SchoolFinanceSerializer
+)
+from stories.models import StoryImage
+from users.models import VolunteerActivity
+
+SECTION_SERIALIZERS = {
+    'info': SchoolInfoSerializer,
+    'demographics': SchoolDemographicsSerializer,
+    'programmes': SchoolProgrammesSerializer,
+    'nutrition': SchoolNutritionSerializer,
+    'infra': SchoolInfraSerializer,
+    'library': SchoolLibrarySerializer,
+    'finance': SchoolFinanceSerializer,
+}
+
+
+class SchoolSections(object):
+    """
+        Serializes sections of the school page for many schools at once.
+        Each table behind a section is read once for all the schools and
+        handed to the serializers in place of their per school lookups.
+    """
+
+    def __init__(self, sections=None, context=None,
+                 academic_year=settings.DEFAULT_ACADEMIC_YEAR):
+        self.sections = sections or SECTION_SERIALIZERS.keys()
+        self.context = context
+        self.academic_year = academic_year
+        self.serializers = {}
+
+    def serialize(self, ids):
+        """
+            Returns {school id: {section: data}} for the active schools
+            among ids.
+        """
+        schools = self.get_schools(ids)
+        data = dict((school.id, {}) for school in schools)
+        for section in self.sections:
+            for school in schools:
+                serializer_class = SECTION_SERIALIZERS[section]
+                if section == 'infra' and school.schooldetails.type_id == 2:
+                    serializer_class = PrechoolInfraSerializer
+                data[school.id][section] = self.get_serializer(
+                    serializer_class).to_native(school)
+        return data
+
+    def get_serializer(self, serializer_class):
+        # one serializer per class, so that per serializer caches
+        # (e.g. finance's PaisaData) are shared by all the schools
+        if serializer_class not in self.serializers:
+            if self.context is None:
+                serializer = serializer_class()
+            else:
+                serializer = serializer_class(context=self.context)
+            self.serializers[serializer_class] = serializer
+        return self.serializers[serializer_class]
+
+    def get_schools(self, ids):
+        sections = self.sections
+        related = set(['schooldetails', 'schooldetails__type', 'dise_info'])
+        prefetch = set()
+        if 'info' in sections:
+            related.update([
+                'instcoord', 'address', 'schooldetails__admin3',
+                'schooldetails__admin2', 'schooldetails__admin1',
+                'schooldetails__assembly', 'schooldetails__parliament',
+                'electedrep__ward', 'schooldetails__admin1__hierarchy',
+                'schooldetails__admin2__hierarchy',
+                'schooldetails__admin3__hierarchy',
+            ])
+            prefetch.update([
+                'dise_info__disefacilityagg_set', 'meetingreport_set'
+            ])
+        if 'nutrition' in sections:
+            prefetch.add('mdmagg_set')
+        if 'infra' in sections:
+            prefetch.update([
+                'dise_info__diserteagg_set__rte_metric',
+                'dise_info__disefacilityagg_set__df_metric',
+                'anganwadiinfraagg_set__ai_metric',
+            ])
+        if 'library' in sections:
+            related.add('libinfra')
+
+        schools = list(
+            School.objects.filter(status=2, id__in=ids)
+            .select_related(*related).prefetch_related(*prefetch)
+        )
+        ids = [school.id for school in schools]
+
+        if set(sections) & set(['info', 'demographics', 'nutrition', 'infra']):
+            self.prime_enrollment(schools, ids)
+        if 'info' in sections:
+            self.prime_info(schools, ids)
+        if 'demographics' in sections:
+            self.prime_mt_profile(schools, ids)
+        if 'library' in sections:
+            self.prime_library(schools, ids)
+        return schools
+
+    def prime(self, obj, name, value):
+        # An instance attribute shadows the method or cached_property of the
+        # same name, which is what the serializers read.
+        obj.__dict__[name] = value
+
+    def prime_enrollment(self, schools, ids):
+        extras = dict(
+            (school_id, (num_boys, num_girls))
+            for school_id, num_boys, num_girls in SchoolExtra.objects.filter(
+                school_id__in=ids,
+                academic_year__name=self.academic_year
+            ).values_list('school_id', 'num_boys', 'num_girls')
+        )
+        for school in schools:
+            num_boys, num_girls = extras.get(school.id, (None, None))
+            self.prime(school.schooldetails, 'num_boys', num_boys)
+            self.prime(school.schooldetails, 'num_girls', num_girls)
+
+    def prime_info(self, schools, ids):
+        images = defaultdict(list)
+        for image in StoryImage.objects.filter(
+                is_verified=True, story__is_verified=True,
+                story__school_id__in=ids).select_related('story'):
+            images[image.story.school_id].append(image.image.url)
+
+        with_activities = set(VolunteerActivity.objects.filter(
+            school_id__in=ids).values_list('school_id', flat=True))
+
+        for school in schools:
+            self.prime(school, 'get_images', images[school.id])
+            self.prime(school, 'has_volunteer_activities',
+                       school.id in with_activities)
+
+    def prime_mt_profile(self, schools, ids):
+        profiles = defaultdict(dict)
+        for school_id, mt, num in InstitutionAgg.objects.filter(
+                school_id__in=ids,
+                academic_year__name=self.academic_year
+        ).values_list('school_id', 'mt', 'num'):
+            profile = profiles[school_id]
+            if mt in profile:
+                profile[mt] += num
+            else:
+                profile[mt] = num
+
+        for school in schools:
+            self.prime(school, 'get_mt_profile', profiles[school.id])
+
+    def prime_library(self, schools, ids):
+        level_agg = defaultdict(lambda: defaultdict(list))
+        for d in LibLevelAgg.objects.filter(school_id__in=ids).values():
+            level_agg[d['school_id']][d['book_level']].append(d)
+
+        lang_agg = defaultdict(lambda: defaultdict(list))
+        for d in LibLangAgg.objects.filter(school_id__in=ids).values():
+            lang_agg[d['school_id']][d['book_lang']].append(d)
+
+        borrow_agg = defaultdict(list)
+        for d in LibBorrow.objects.filter(school_id__in=ids).extra(
+            select={
+                'trans_month': 'getmonth(split_part(issue_date,\'/\',2))'
+            }
+        ).values('school', 'trans_year', 'class_name', 'trans_month')\
+                .annotate(child_count=Count('child_id')):
+            borrow_agg[d.pop('school')].append(d)
+
+        class_totals = defaultdict(list)
+        for t in SchoolClassTotalYear.objects.filter(
+                school_id__in=ids).select_related('academic_year'):
+            class_totals[t.school_id].append({
+                'clas': t.clas,
+                'total': t.total,
+                'academic_year': t.academic_year.name,
+            })
+
+        for school in schools:
+            self.prime(school, 'get_lib_level_agg', level_agg[school.id])
+            self.prime(school, 'get_lib_lang_agg', lang_agg[school.id])
+            self.prime(school, 'get_lib_borrow_agg', borrow_agg[school.id])
+            self.prime(school, 'get_total_students_in_class',
+                       class_totals[school.id])
+
+
+def render_profile(sections):
+    """
+        The profile document, rendered once so that it can be stored and
+        served as is. Keys are sorted so that unchanged data gives the same
+        text, and checksum.
+    """
+    # round trip through the renderer for dates, decimals and lazy strings
+    data = json.loads(JSONRenderer().render(sections))
+    return json.dumps(data, sort_keys=True, separators=(',', ':'))
+
+
+def build_profiles(ids, academic_year=settings.DEFAULT_ACADEMIC_YEAR):
+    """
+        Returns {school id: profile document} for the active schools among
+        ids. Only enrollment and the mother tongue profile vary with
+        academic_year; the other sections are the latest data.
+    """
+    data = SchoolSections(academic_year=academic_year).serialize(ids)
+    return dict(
+        (school_id, render_profile(sections))
+        for school_id, sections in data.items()
+    )
+
+
+def save_profiles(ids):
+    """
+        Rebuilds the profiles of ids, writing only those whose document
+        changed. Profiles of ids that are no longer active are removed.
+        Returns (created, updated, deleted) counts.
+    """
+    documents = build_profiles(ids)
+    existing = dict(SchoolProfile.objects.filter(
+        school_id__in=ids).values_list('school_id', 'checksum'))
+
+    now = timezone.now()
+    created = []
+    updated = 0
+    for school_id, document in documents.items():
+        checksum = hashlib.md5(document).hexdigest()
+        if school_id not in existing:
+            created.append(SchoolProfile(
+                school_id=school_id, document=document, checksum=checksum,
+                updated_at=now))
+        elif existing[school_id] != checksum:
+            SchoolProfile.objects.filter(school_id=school_id).update(
+                document=document, checksum=checksum, updated_at=now)
+            updated += 1
+    SchoolProfile.objects.bulk_create(created)
+
+    removed = [school_id for school_id in existing if school_id not in documents]
+    if removed:
+        SchoolProfile.objects.filter(school_id__in=removed).delete()
+    return len(created), updated, len(removed)
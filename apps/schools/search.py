@@ -0,0 +1,169 @@
+import copy
+from bisect import bisect_left
+from django.db import connection
+from common.utils import DataEpochCache
+from schools.models import Boundary, Assembly, Parliament, Postal
+from schools.serializers import (
+    BoundarySerializer, AssemblySerializer, ParliamentSerializer,
+    PincodeSerializer
+)
+
+# Maximum number of results returned per entity type
+SEARCH_LIMITS = {
+    'pre_schools': 3,
+    'primary_schools': 3,
+    'boundaries': 10,
+    'assemblies': 10,
+    'parliaments': 10,
+    'pincodes': 10,
+}
+
+# mvw_omni_search is defined in sql/omni_search.sql. The LIKE is served by
+# the trigram index on search_text, similarity() ranks within each type.
+SEARCH_QUERY = """
+    SELECT entity_type, entity_id FROM (
+        SELECT entity_type, entity_id,
+            row_number() OVER (
+                PARTITION BY entity_type
+                ORDER BY similarity(search_text, %s) DESC, entity_id
+            ) AS rank
+        FROM mvw_omni_search
+        WHERE search_text LIKE %s
+        AND entity_type IN %s
+    ) ranked
+    WHERE rank <= %s
+    ORDER BY entity_type, rank
+"""
+
+
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search(text, entity_types=None):
+    """
+        Searches all entities for text in a single query.
+        Returns a dict of entity type to list of ids, best match first.
+    """
+    if entity_types is None:
+        entity_types = SEARCH_LIMITS.keys()
+    results = dict((entity_type, []) for entity_type in entity_types)
+    if not entity_types:
+        return results
+
+    text = text.strip().lower()
+    cursor = connection.cursor()
+    cursor.execute(SEARCH_QUERY, [
+        text,
+        '%' + escape_like(text) + '%',
+        tuple(entity_types),
+        max(SEARCH_LIMITS[entity_type] for entity_type in entity_types),
+    ])
+    for entity_type, entity_id in cursor.fetchall():
+        if len(results[entity_type]) < SEARCH_LIMITS[entity_type]:
+            results[entity_type].append(entity_id)
+    return results
+
+
+def in_order(queryset, ids):
+    """
+        Fetches the objects for ids, keeping the order of ids.
+    """
+    if not ids:
+        return []
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+class SubstringIndex(object):
+    """
+        Sorted array of every suffix of every key, so that finding the keys
+        containing a text is two bisects.
+    """
+
+    def __init__(self, entries):
+        # entries is a list of (key, value)
+        self.entries = entries
+        suffixes = sorted(
+            (key[i:], position)
+            for position, (key, value) in enumerate(entries)
+            for i in range(len(key))
+        )
+        self.suffixes = [suffix for suffix, position in suffixes]
+        self.positions = [position for suffix, position in suffixes]
+
+    def search(self, text, limit):
+        start = bisect_left(self.suffixes, text)
+        end = bisect_left(self.suffixes, text + u'\uffff', start)
+        matches = set(self.positions[start:end])
+        # names starting with the text first, then alphabetical
+        ranked = sorted(matches, key=lambda position: (
+            not self.entries[position][0].startswith(text),
+            self.entries[position][0]
+        ))
+        return [self.entries[position][1] for position in ranked[:limit]]
+
+
+class TypeaheadIndex(DataEpochCache):
+    """
+        In-process index of the boundary, assembly, parliament and pincode
+        names, holding the serialized results so that the non-school part of
+        the omni search never hits the database.
+        Rebuilt whenever the data epoch changes.
+    """
+
+    def build(self):
+        boundaries = Boundary.objects.filter(
+            status=2,
+            boundarycoord__coord__isnull=False
+        ).select_related('boundarycoord', 'hierarchy')
+        return {
+            'boundaries': self.build_index(
+                boundaries, BoundarySerializer, 'get_geometry'),
+            'assemblies': self.build_index(
+                Assembly.objects.filter(coord__isnull=False),
+                AssemblySerializer, 'get_simple_geometry'),
+            'parliaments': self.build_index(
+                Parliament.objects.filter(coord__isnull=False),
+                ParliamentSerializer, 'get_simple_geometry'),
+            'pincodes': self.build_index(
+                Postal.objects.filter(coord__isnull=False),
+                PincodeSerializer, 'get_simple_geometry', key='pincode'),
+        }
+
+    def build_index(self, queryset, serializer_class, geometry, key='name'):
+        entries = []
+        for obj in queryset:
+            entries.append((getattr(obj, key).lower(), {
+                'data': serializer_class(obj).data,
+                'geometry': getattr(obj, geometry)(),
+            }))
+        return SubstringIndex(entries)
+
+    def can_serve(self, request):
+        """
+            Only the geometries the omni search returns by default are
+            held in memory, full polygons still come from the database.
+        """
+        return not (request.GET.get('geometry', 'no') == 'yes' and
+                    request.GET.get('simplify', 'yes') == 'no')
+
+    def search(self, text, request):
+        """
+            Returns a dict of entity type to list of serialized results,
+            in the same shape as the serializers would return them.
+        """
+        text = text.strip().lower()
+        geometry = request.GET.get('geometry', 'no') == 'yes'
+        results = {}
+        for entity_type, index in self.get().items():
+            results[entity_type] = []
+            for entry in index.search(text, SEARCH_LIMITS[entity_type]):
+                data = copy.copy(entry['data'])
+                if geometry:
+                    data['geometry'] = entry['geometry']
+                results[entity_type].append(data)
+        return results
+
+
+typeahead = TypeaheadIndex()
@@ -1,16 +1,19 @@
-from django.db.models import Sum
-from common.serializers import KLPSerializer, KLPSimpleGeoSerializer
+from collections import defaultdict
+from django.utils.datastructures import SortedDict
+from common.serializers import (
+    KLPSerializer, KLPSimpleGeoSerializer, ValuesSerializer, BatchMixin,
+    to_simple
+)
 from rest_framework import serializers
 from schools.models import (
     School, Boundary, DiseInfo, ElectedrepMaster,
     BoundaryType, Assembly, Parliament, Postal, PaisaData,
     MdmAgg, InstitutionAssessmentCohorts, InstitutionAssessmentSinglescore,
-    InstitutionAssessmentSinglescoreGender, InstitutionAssessmentSinglescoreMt,
-    BoundaryAssessmentSinglescore, BoundaryAssessmentSinglescoreMt,
-    BoundaryAssessmentSinglescoreGender, InstitutionAssessmentPercentile,
+    BoundaryAssessmentSinglescore, InstitutionAssessmentPercentile,
     BoundaryAssessmentPercentile, MeetingReport,
     BoundaryLibLangAgg, BoundaryLibLevelAgg, Programme, Partner
 )
+from schools.loaders import InstitutionAssessmentLoader, BoundaryAssessmentLoader
 
 
 class BoundaryTypeSerializer(KLPSerializer):
@@ -48,6 +51,40 @@ class BoundaryWithGrandparentSerializer(KLPSerializer):
         fields = ('id', 'name', 'type', 'school_type', 'parent')
 
 
+def boundary_columns(prefix='', name=''):
+    # the BoundarySerializer fields, for the boundary at lookup prefix
+    return (
+        (name + 'id', prefix + 'id'),
+        (name + 'name', prefix + 'name'),
+        (name + 'dise_slug', prefix + 'dise_slug'),
+        (name + 'type', prefix + 'hierarchy__name'),
+        (name + 'school_type', prefix + 'hierarchy_id'),
+        (name + 'status', prefix + 'status'),
+    )
+
+
+class BoundaryValuesSerializer(ValuesSerializer):
+    """
+        Same output as BoundarySerializer, from values_list() rows.
+    """
+    columns = boundary_columns()
+    transforms = {
+        'school_type': Boundary.school_type_for,
+    }
+
+
+class BoundaryWithParentValuesSerializer(ValuesSerializer):
+    """
+        Same output as BoundaryWithParentSerializer, from values_list() rows.
+    """
+    columns = boundary_columns()[:-1] + boundary_columns('parent__', 'parent.')
+    transforms = {
+        'school_type': Boundary.school_type_for,
+        'parent.school_type': Boundary.school_type_for,
+    }
+    nullable = ('parent',)
+
+
 class ElectedrepSerializer(KLPSerializer):
     name = serializers.CharField(source='const_ward_name')
     type = serializers.CharField(source='const_ward_type')
@@ -69,6 +106,14 @@ class ParliamentSerializer(KLPSimpleGeoSerializer):
         fields = ('id', 'name')
 
 
+class AssemblyValuesSerializer(ValuesSerializer):
+    columns = (('id', 'id'), ('name', 'name'))
+
+
+class ParliamentValuesSerializer(ValuesSerializer):
+    columns = (('id', 'id'), ('name', 'name'))
+
+
 class PincodeSerializer(KLPSimpleGeoSerializer):
     class Meta:
         model = Postal
@@ -91,6 +136,17 @@ class SchoolListSerializer(KLPSerializer):
     admin3 = serializers.CharField(source='schooldetails.admin3.name')
     meeting_reports = MeetingReportSerializer(source='meetingreport_set')
 
+    field_lookups = {
+        'boundary': {'select_related': ('admin3__hierarchy',)},
+        'address_full': {'select_related': ('address', 'admin3')},
+        'admin1': {'select_related': ('schooldetails__admin1',)},
+        'admin2': {'select_related': ('schooldetails__admin2',)},
+        'admin3': {'select_related': ('schooldetails__admin3',)},
+        'type': {'select_related': ('schooldetails__type',)},
+        'meeting_reports': {'prefetch_related': ('meetingreport_set',)},
+        'geometry': {'select_related': ('instcoord',)},
+    }
+
     class Meta:
         model = School
         fields = (
@@ -99,6 +155,56 @@ class SchoolListSerializer(KLPSerializer):
         )
 
 
+class SchoolListValuesSerializer(ValuesSerializer):
+    """
+        Same output as SchoolListSerializer, from values_list() rows. The
+        meeting reports of a page are read in one query.
+    """
+    columns = (
+        ('id', 'id'),
+        ('name', 'name'),
+    ) + boundary_columns('admin3__', 'boundary.') + (
+        ('admin1', 'schooldetails__admin1__name'),
+        ('admin2', 'schooldetails__admin2__name'),
+        ('admin3', 'schooldetails__admin3__name'),
+        ('address_full', ('address__full', 'admin3__name')),
+        ('dise_info', 'dise_info'),
+        ('type.id', 'schooldetails__type__id'),
+        ('type.name', 'schooldetails__type__name'),
+    )
+    transforms = {
+        'boundary.school_type': Boundary.school_type_for,
+        'address_full': lambda full, admin3: full or admin3.title(),
+    }
+    nullable = ('type',)
+
+    def __init__(self, *args, **kwargs):
+        super(SchoolListValuesSerializer, self).__init__(*args, **kwargs)
+        request = self.context.get('request')
+        self.with_meeting_reports = request is None or \
+            KLPSerializer.is_requested(request, 'meeting_reports')
+        self.meeting_reports = defaultdict(list)
+
+    def prepare(self, rows):
+        if not self.with_meeting_reports:
+            return
+        reports = MeetingReport.objects.filter(
+            school_id__in=[row[0] for row in rows]
+        ).values_list('school_id', 'pdf', 'language', 'generated_at')
+        for school_id, pdf, language, generated_at in reports:
+            self.meeting_reports[school_id].append(SortedDict([
+                ('pdf', pdf),
+                ('language', to_simple(language)),
+                ('generated_at', generated_at and generated_at.isoformat()),
+            ]))
+
+    def to_native(self, row):
+        data = super(SchoolListValuesSerializer, self).to_native(row)
+        if self.with_meeting_reports:
+            data['meeting_reports'] = self.meeting_reports[row[0]]
+        return data
+
+
 class SchoolInfoSerializer(KLPSerializer):
     dise_code = serializers.CharField(source='dise_info_id')
     admin3 = BoundarySerializer(source='schooldetails.admin3')
@@ -123,6 +229,28 @@ class SchoolInfoSerializer(KLPSerializer):
 
     images = serializers.CharField(source='get_images')
 
+    field_lookups = {
+        'address_full': {'select_related': ('address',)},
+        'landmark': {'select_related': ('address',)},
+        'buses': {'select_related': ('address',)},
+        'identifiers': {'select_related': ('address',)},
+        'admin1': {'select_related': ('schooldetails__admin1__hierarchy',)},
+        'admin2': {'select_related': ('schooldetails__admin2__hierarchy',)},
+        'admin3': {'select_related': ('schooldetails__admin3__hierarchy',)},
+        'type': {'select_related': ('schooldetails__type',)},
+        'assembly': {'select_related': ('schooldetails__assembly',)},
+        'parliament': {'select_related': ('schooldetails__parliament',)},
+        'ward': {'select_related': ('electedrep__ward',)},
+        'num_boys': {'select_related': ('schooldetails',)},
+        'num_girls': {'select_related': ('schooldetails',)},
+        'basic_facilities': {
+            'select_related': ('dise_info',),
+            'prefetch_related': ('dise_info__disefacilityagg_set',),
+        },
+        'meeting_reports': {'prefetch_related': ('meetingreport_set',)},
+        'geometry': {'select_related': ('instcoord',)},
+    }
+
     class Meta:
         model = School
         fields = ('id', 'name', 'mgmt', 'cat', 'moi', 'sex', 'address_full',
@@ -167,7 +295,11 @@ class SchoolNutritionSerializer(KLPSerializer):
             'num_girls', 'mdm_agg')
 
     def get_mdm_agg(self, obj):
-        return obj.mdmagg_set.all().values()
+        # built from .all() so that a prefetched mdmagg_set is used
+        return [
+            dict((f.attname, getattr(agg, f.attname)) for f in MdmAgg._meta.fields)
+            for agg in obj.mdmagg_set.all()
+        ]
 
 
 class SchoolInfraSerializer(KLPSerializer):
@@ -206,7 +338,7 @@ class PrechoolInfraSerializer(KLPSerializer):
 
     def get_ang_facility_details(self, obj):
         data = {}
-        ang_infras = obj.anganwadiinfraagg_set.all().select_related('ai_metric')
+        ang_infras = obj.anganwadiinfraagg_set.all()
         for infra in ang_infras:
             if infra.ai_group not in data:
                 data[infra.ai_group] = {}
@@ -253,12 +385,18 @@ class SchoolFinanceSerializer(KLPSerializer):
             'tlm_recd_dise', 'tlm_expnd_dise', 'classroom_count',
             'teacher_count', 'sg_amount', 'smg_amount', 'tlm_amount')
 
+    def get_paisa_data(self, criteria):
+        # PaisaData is a handful of rows, load it once per serializer
+        if not hasattr(self, '_paisa_data'):
+            self._paisa_data = list(PaisaData.objects.all())
+        return [paisa for paisa in self._paisa_data if paisa.criteria == criteria]
+
     def get_sg_amount(self, obj):
         grant_amount = None
-        try:
-            paisa = PaisaData.objects.get(criteria='school_cat', factor=obj.cat)
-            grant_amount = paisa.grant_amount
-        except:
+        paisa = [p for p in self.get_paisa_data('school_cat') if p.factor == obj.cat]
+        if len(paisa) == 1:
+            grant_amount = paisa[0].grant_amount
+        else:
             print "Finance: School {} has no paisa data".format(obj.id)
         return grant_amount
 
@@ -270,7 +408,7 @@ class SchoolFinanceSerializer(KLPSerializer):
 
         grant_amount = None
         try:
-            paisa_criterions = PaisaData.objects.filter(criteria='classroom_count')
+            paisa_criterions = self.get_paisa_data('classroom_count')
             for paisa in paisa_criterions:
                 if paisa.operator == 'gt' and obj.dise_info.classroom_count > int(paisa.factor):
                     grant_amount = paisa.grant_amount
@@ -283,8 +421,10 @@ class SchoolFinanceSerializer(KLPSerializer):
     def get_tlm_amount(self, obj):
         grant_amount = None
         try:
-            paisa = PaisaData.objects.get(criteria='teacher_count')
-            grant_amount = obj.dise_info.teacher_count * paisa.grant_amount
+            paisa = self.get_paisa_data('teacher_count')
+            if len(paisa) != 1:
+                raise Exception('no paisa data')
+            grant_amount = obj.dise_info.teacher_count * paisa[0].grant_amount
         except Exception, e:
             print "Finance: School {} has no dise data".format(obj.id)
         return grant_amount
@@ -328,7 +468,7 @@ class AssessmentListSerializer(KLPSerializer):
         fields = ('assid', 'assessmentname', 'studentgroup', 'academicyear_name')
 
 
-class AssessmentInfoSerializer(KLPSerializer):
+class AssessmentInfoSerializer(BatchMixin, KLPSerializer):
     schoolname = serializers.CharField(source='school.name')
     studentgroup = serializers.CharField(source='studentgroup')
     assessmentname = serializers.CharField(source='assessment.name')
@@ -345,88 +485,17 @@ class AssessmentInfoSerializer(KLPSerializer):
                   'academicyear_name', 'singlescore', 'percentile',
                   'gradesinglescore', 'cohortsdetails', 'singlescoredetails')
 
+    def prepare(self, objects):
+        self.loader = InstitutionAssessmentLoader(objects)
+
     def get_cohorts_details(self, obj):
-        data = {}
-        cohortssum = InstitutionAssessmentCohorts.objects.filter(
-            school=obj.school, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).aggregate(Sum('cohortsnum'))
-        data['total'] = cohortssum['cohortsnum__sum']
-        cohortsgender = InstitutionAssessmentCohorts.objects.filter(
-            school=obj.school, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex').annotate(total=Sum('cohortsnum'))
-        data['gender'] = cohortsgender
-        cohortsmt = InstitutionAssessmentCohorts.objects.filter(
-            school=obj.school, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt').annotate(total=Sum('cohortsnum'))
-        data['mt'] = cohortsmt
-        return data
+        return self.loader.get_cohorts_details(obj)
 
     def get_singlescore_details(self, obj):
-        singlescore = {}
-        genderdata = InstitutionAssessmentSinglescoreGender.objects.filter(
-            school=obj.school, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex', 'singlescore',
-                                              'percentile', 'gradesinglescore')
-        singlescore['gender'] = genderdata
-
-        mtdata = InstitutionAssessmentSinglescoreMt.objects.filter(
-            school=obj.school, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt', 'singlescore', 'percentile',
-                                              'gradesinglescore')
-        singlescore['mt'] = mtdata
-
-        singlescore["boundary"] = []
-        admin1data = BoundaryAssessmentSinglescore.objects.filter(
-            boundary=obj.school.schooldetails.admin1, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name')[0]
-        singlescore["boundary"].append(admin1data)
-        genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-            boundary=obj.school.schooldetails.admin1, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore["boundary"][0]["gender"] = genderdata
-
-        mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-            boundary=obj.school.schooldetails.admin1, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore["boundary"][0]["mt"] = mtdata
-        singlescore["boundary"][0]["btype"] = "admin_1"
-
-        admin2data = BoundaryAssessmentSinglescore.objects.filter(
-            boundary=obj.school.schooldetails.admin2, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name', 'boundary')[0]
-        singlescore["boundary"].append(admin2data)
-
-        genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-            boundary=obj.school.schooldetails.admin2, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore["boundary"][1]["gender"] = genderdata
-
-        mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-            boundary=obj.school.schooldetails.admin2, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore["boundary"][1]["mt"] = mtdata
-        singlescore["boundary"][1]["btype"] = "admin_2"
-
-        admin3data = BoundaryAssessmentSinglescore.objects.filter(
-            boundary=obj.school.schooldetails.admin3, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name', 'boundary')[0]
-        singlescore["boundary"].append(admin3data)
-
-        genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-            boundary=obj.school.schooldetails.admin3, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore["boundary"][2]["gender"] = genderdata
-
-        mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-            boundary=obj.school.schooldetails.admin3, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-
-        singlescore["boundary"][2]["mt"] = mtdata
-        singlescore["boundary"][2]["btype"] = "admin_3"
-        return singlescore
-
-
-class BoundaryAssessmentInfoSerializer(KLPSerializer):
+        return self.loader.get_singlescore_details(obj)
+
+
+class BoundaryAssessmentInfoSerializer(BatchMixin, KLPSerializer):
     boundaryname = serializers.CharField(source='boundary.name')
     studentgroup = serializers.CharField(source='studentgroup')
     assessmentname = serializers.CharField(source='assessment.name')
@@ -442,107 +511,14 @@ class BoundaryAssessmentInfoSerializer(KLPSerializer):
         fields = ('boundaryname', 'assessmentname', 'studentgroup', 'academicyear_name', 'singlescore',
                   'percentile', 'gradesinglescore', 'cohortsdetails', 'singlescoredetails')
 
+    def prepare(self, objects):
+        self.loader = BoundaryAssessmentLoader(objects)
+
     def get_cohorts_details(self, obj):
-        data = {}
-        if obj.boundary.hierarchy.id == 11 or obj.boundary.hierarchy.id == 15:
-            cohortssum = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin3=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).aggregate(Sum('cohortsnum'))
-            cohortsgender = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin3=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex').annotate(total=Sum('cohortsnum'))
-            cohortsmt = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin3=obj.boundary,
-                studentgroup=obj.studentgroup, assessment=obj.assessment).values('mt').annotate(total=Sum('cohortsnum'))
-        elif obj.boundary.hierarchy.id == 10 or obj.boundary.hierarchy.id == 14:
-            cohortssum = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin2=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).aggregate(Sum('cohortsnum'))
-            cohortsgender = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin2=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex').annotate(total=Sum('cohortsnum'))
-            cohortsmt = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin2=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('mt').annotate(total=Sum('cohortsnum'))
-        elif obj.boundary.hierarchy.id == 9 or obj.boundary.hierarchy.id == 13:
-            cohortssum = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin1=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).aggregate(Sum('cohortsnum'))
-            cohortsgender = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin1=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex').annotate(total=Sum('cohortsnum'))
-            cohortsmt = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin1=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('mt').annotate(total=Sum('cohortsnum'))
-        data['total'] = cohortssum['cohortsnum__sum']
-        data['gender'] = cohortsgender
-        data['mt'] = cohortsmt
-        return data
+        return self.loader.get_cohorts_details(obj)
 
     def get_singlescore_details(self, obj):
-        singlescore = {}
-        genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-            boundary=obj.boundary, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore['gender'] = genderdata
-
-        mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-            boundary=obj.boundary, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore['mt'] = mtdata
-
-        singlescore["boundary"] = []
-        if obj.boundary.hierarchy.id == 11 or obj.boundary.hierarchy.id == 15:
-
-            admin1data = BoundaryAssessmentSinglescore.objects.filter(
-                boundary=obj.boundary.parent.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name', 'boundary')[0]
-            singlescore["boundary"].append(admin1data)
-
-            genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-                boundary=obj.boundary.parent.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][0]["gender"] = genderdata
-
-            mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-                boundary=obj.boundary.parent.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][0]["mt"] = mtdata
-            singlescore["boundary"][0]["btype"] = "admin_1"
-
-            admin2data = BoundaryAssessmentSinglescore.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name', 'boundary')[0]
-            singlescore["boundary"].append(admin2data)
-
-            genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][1]["gender"] = genderdata
-
-            mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][1]["mt"] = mtdata
-            singlescore["boundary"][1]["btype"] = "admin_2"
-
-        elif obj.boundary.hierarchy.id == 10 or obj.boundary.hierarchy.id == 14:
-            admin1data = BoundaryAssessmentSinglescore.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name', 'boundary')[0]
-            singlescore["boundary"].append(admin1data)
-            genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][0]["gender"] = genderdata
-
-            mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][0]["mt"] = mtdata
-            singlescore["boundary"][0]["btype"] = "admin_1"
-
-        return singlescore
+        return self.loader.get_singlescore_details(obj)
 
 
 class PartnerSerializer(KLPSerializer):
@@ -561,218 +537,40 @@ class ProgrammeListSerializer(KLPSerializer):
         fields = ('id', 'name', 'academicyear_name', 'partner',)
 
 
+class ProgrammeListValuesSerializer(ValuesSerializer):
+    """
+        Same output as ProgrammeListSerializer, from values_list() rows.
+    """
+    columns = (
+        ('id', 'id'),
+        ('name', 'name'),
+        ('academicyear_name', 'academic_year__name'),
+        ('partner.id', 'partner__id'),
+        ('partner.name', 'partner__name'),
+        ('partner.status', 'partner__status'),
+        ('partner.info', 'partner__info'),
+    )
+    nullable = ('partner',)
+
 
-class ProgrammeInfoSerializer(KLPSerializer):
-    studentgroup = serializers.CharField(source='studentgroup')
-    assessmentname = serializers.CharField(source='assessment.name')
-    academicyear_name = serializers.CharField(source='assessment.programme.academic_year.name')
-    singlescore = serializers.IntegerField(source='singlescore')
-    percentile = serializers.IntegerField(source='percentile')
-    gradesinglescore = serializers.CharField(source='gradesinglescore')
-    cohortsdetails = serializers.SerializerMethodField('get_cohorts_details')
-    singlescoredetails = serializers.SerializerMethodField('get_singlescore_details')
+
+class ProgrammeInfoSerializer(AssessmentInfoSerializer):
 
     class Meta:
         model = InstitutionAssessmentSinglescore
         fields = ('assessmentname', 'studentgroup', 'academicyear_name', 'singlescore', 'percentile',
                   'gradesinglescore', 'cohortsdetails', 'singlescoredetails')
 
-    def get_cohorts_details(self, obj):
-        data = {}
-        cohortssum = InstitutionAssessmentCohorts.objects.filter(
-            school=obj.school, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).aggregate(Sum('cohortsnum'))
-        data['total'] = cohortssum['cohortsnum__sum']
-        cohortsgender = InstitutionAssessmentCohorts.objects.filter(
-            school=obj.school, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex').annotate(total=Sum('cohortsnum'))
-        data['gender'] = cohortsgender
-        cohortsmt = InstitutionAssessmentCohorts.objects.filter(
-            school=obj.school, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt').annotate(total=Sum('cohortsnum'))
-        data['mt'] = cohortsmt
-        return data
 
-    def get_singlescore_details(self, obj):
-        singlescore = {}
-        genderdata = InstitutionAssessmentSinglescoreGender.objects.filter(
-            school=obj.school, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore['gender'] = genderdata
-
-        mtdata = InstitutionAssessmentSinglescoreMt.objects.filter(
-            school=obj.school, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore['mt'] = mtdata
-
-        singlescore["boundary"] = []
-        admin1data = BoundaryAssessmentSinglescore.objects.filter(
-            boundary=obj.school.schooldetails.admin1, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name', 'boundary')[0]
-        singlescore["boundary"].append(admin1data)
-        genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-            boundary=obj.school.schooldetails.admin1, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore["boundary"][0]["gender"] = genderdata
-
-        mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-            boundary=obj.school.schooldetails.admin1, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore["boundary"][0]["mt"] = mtdata
-        singlescore["boundary"][0]["btype"] = "admin_1"
-
-        admin2data = BoundaryAssessmentSinglescore.objects.filter(
-            boundary=obj.school.schooldetails.admin2, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name', 'boundary')[0]
-        singlescore["boundary"].append(admin2data)
-
-        genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-            boundary=obj.school.schooldetails.admin2, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore["boundary"][1]["gender"] = genderdata
-
-        mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-            boundary=obj.school.schooldetails.admin2, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore["boundary"][1]["mt"] = mtdata
-        singlescore["boundary"][1]["btype"] = "admin_2"
-
-        admin3data = BoundaryAssessmentSinglescore.objects.filter(
-            boundary=obj.school.schooldetails.admin3, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name', 'boundary')[0]
-        singlescore["boundary"].append(admin3data)
-
-        genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-            boundary=obj.school.schooldetails.admin3, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore["boundary"][2]["gender"] = genderdata
-
-        mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-            boundary=obj.school.schooldetails.admin3, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-
-        singlescore["boundary"][2]["mt"] = mtdata
-        singlescore["boundary"][2]["btype"] = "admin_3"
-
-        return singlescore
-
-
-class BoundaryProgrammeInfoSerializer(KLPSerializer):
-    studentgroup = serializers.CharField(source='studentgroup')
-    assessmentname = serializers.CharField(source='assessment.name')
-    academicyear_name = serializers.CharField(source='assessment.programme.academic_year.name')
-    singlescore = serializers.IntegerField(source='singlescore')
-    percentile = serializers.IntegerField(source='percentile')
-    gradesinglescore = serializers.CharField(source='gradesinglescore')
-    cohortsdetails = serializers.SerializerMethodField('get_cohorts_details')
-    singlescoredetails = serializers.SerializerMethodField('get_singlescore_details')
+class BoundaryProgrammeInfoSerializer(BoundaryAssessmentInfoSerializer):
 
     class Meta:
         model = BoundaryAssessmentSinglescore
         fields = ('assessmentname', 'studentgroup', 'academicyear_name', 'singlescore', 'percentile',
                   'gradesinglescore', 'cohortsdetails', 'singlescoredetails')
 
-    def get_cohorts_details(self, obj):
-        data = {}
-        if obj.boundary.hierarchy.id == 11 or obj.boundary.hierarchy.id == 15:
-            cohortssum = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin3=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).aggregate(Sum('cohortsnum'))
-            cohortsgender = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin3=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex').annotate(total=Sum('cohortsnum'))
-            cohortsmt = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin3=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('mt').annotate(total=Sum('cohortsnum'))
-        elif obj.boundary.hierarchy.id == 10 or obj.boundary.hierarchy.id == 14:
-            cohortssum = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin2=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).aggregate(Sum('cohortsnum'))
-            cohortsgender = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin2=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex').annotate(total=Sum('cohortsnum'))
-            cohortsmt = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin2=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('mt').annotate(total=Sum('cohortsnum'))
-        elif obj.boundary.hierarchy.id == 9 or obj.boundary.hierarchy.id == 13:
-            cohortssum = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin1=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).aggregate(Sum('cohortsnum'))
-            cohortsgender = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin1=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex').annotate(total=Sum('cohortsnum'))
-            cohortsmt = InstitutionAssessmentCohorts.objects.filter(
-                school__schooldetails__admin1=obj.boundary, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('mt').annotate(total=Sum('cohortsnum'))
-        data['total'] = cohortssum['cohortsnum__sum']
-        data['gender'] = cohortsgender
-        data['mt'] = cohortsmt
-        return data
 
-    def get_singlescore_details(self, obj):
-        singlescore = {}
-        genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-            boundary=obj.boundary, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore['gender'] = genderdata
-
-        mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-            boundary=obj.boundary, studentgroup=obj.studentgroup,
-            assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-        singlescore['mt'] = mtdata
-
-        singlescore["boundary"] = []
-        if obj.boundary.hierarchy.id == 11 or obj.boundary.hierarchy.id == 15:
-            admin1data = BoundaryAssessmentSinglescore.objects.filter(
-                boundary=obj.boundary.parent.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name', 'boundary')[0]
-            singlescore["boundary"].append(admin1data)
-            genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-                boundary=obj.boundary.parent.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][0]["gender"] = genderdata
-
-            mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-                boundary=obj.boundary.parent.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][0]["mt"] = mtdata
-            singlescore["boundary"][0]["btype"] = "admin_1"
-
-            admin2data = BoundaryAssessmentSinglescore.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name', 'boundary')[0]
-            singlescore["boundary"].append(admin2data)
-
-            genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][1]["gender"] = genderdata
-
-            mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][1]["mt"] = mtdata
-            singlescore["boundary"][1]["btype"] = "admin_2"
-
-        elif obj.boundary.hierarchy.id == 10 or obj.boundary.hierarchy.id == 14:
-            admin1data = BoundaryAssessmentSinglescore.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('singlescore', 'percentile', 'gradesinglescore', 'boundary__name', 'boundary')[0]
-            singlescore["boundary"].append(admin1data)
-            genderdata = BoundaryAssessmentSinglescoreGender.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('sex', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][0]["gender"] = genderdata
-
-            mtdata = BoundaryAssessmentSinglescoreMt.objects.filter(
-                boundary=obj.boundary.parent, studentgroup=obj.studentgroup,
-                assessment=obj.assessment).values('mt', 'singlescore', 'percentile', 'gradesinglescore')
-            singlescore["boundary"][0]["mt"] = mtdata
-            singlescore["boundary"][0]["btype"] = "admin_1"
-        return singlescore
-
-
-class ProgrammePercentileSerializer(KLPSerializer):
+class ProgrammePercentileSerializer(BatchMixin, KLPSerializer):
     assessmentname = serializers.CharField(source='assessment.name')
     academicyear_name = serializers.CharField(source='assessment.programme.academic_year.name')
     percentile = serializers.IntegerField(source='percentile')
@@ -782,30 +580,14 @@ class ProgrammePercentileSerializer(KLPSerializer):
         model = InstitutionAssessmentPercentile
         fields = ('assessmentname', 'academicyear_name', 'percentile', 'boundary')
 
-    def getboundarypercentiles(self, obj):
-        data = []
-        admin1data = BoundaryAssessmentPercentile.objects.filter(
-            boundary=obj.school.schooldetails.admin1,
-            assessment=obj.assessment).values('percentile', 'boundary__name', 'boundary')[0]
-        admin1data["btype"] = "admin_1"
-        data.append(admin1data)
-
-        admin2data = BoundaryAssessmentPercentile.objects.filter(
-            boundary=obj.school.schooldetails.admin2,
-            assessment=obj.assessment).values('percentile', 'boundary__name', 'boundary')[0]
-        admin2data["btype"] = "admin_2"
-        data.append(admin2data)
-
-        admin3data = BoundaryAssessmentPercentile.objects.filter(
-            boundary=obj.school.schooldetails.admin3,
-            assessment=obj.assessment).values('percentile', 'boundary__name', 'boundary')[0]
-        admin3data["btype"] = "admin_3"
-        data.append(admin3data)
+    def prepare(self, objects):
+        self.loader = InstitutionAssessmentLoader(objects)
 
-        return data
+    def getboundarypercentiles(self, obj):
+        return self.loader.get_boundary_percentiles(obj)
 
 
-class BoundaryProgrammePercentileSerializer(KLPSerializer):
+class BoundaryProgrammePercentileSerializer(BatchMixin, KLPSerializer):
     assessmentname = serializers.CharField(source='assessment.name')
     academicyear_name = serializers.CharField(source='assessment.programme.academic_year.name')
     percentile = serializers.IntegerField(source='percentile')
@@ -815,29 +597,11 @@ class BoundaryProgrammePercentileSerializer(KLPSerializer):
         model = BoundaryAssessmentPercentile
         fields = ('assessmentname', 'academicyear_name', 'percentile', 'boundary')
 
-    def getboundarypercentiles(self, obj):
-        data = []
-        if obj.boundary.hierarchy.id == 11 or obj.boundary.hierarchy.id == 15:
-            admin1data = BoundaryAssessmentPercentile.objects.filter(
-                boundary=obj.boundary.parent.parent,
-                assessment=obj.assessment).values('percentile', 'boundary__name', 'boundary')[0]
-            admin1data["btype"] = "admin_1"
-            data.append(admin1data)
-
-            admin2data = BoundaryAssessmentPercentile.objects.filter(
-                boundary=obj.boundary.parent,
-                assessment=obj.assessment).values('percentile', 'boundary__name', 'boundary')[0]
-            admin2data["btype"] = "admin_2"
-            data.append(admin2data)
-
-        elif obj.boundary.hierarchy.id == 10 or obj.boundary.hierarchy.id == 14:
-            admin1data = BoundaryAssessmentPercentile.objects.filter(
-                boundary=obj.boundary.parent,
-                assessment=obj.assessment).values('percentile', 'boundary__name', 'boundary')[0]
-            admin1data["btype"] = "admin_1"
-            data.append(admin1data)
+    def prepare(self, objects):
+        self.loader = BoundaryAssessmentLoader(objects)
 
-        return data
+    def getboundarypercentiles(self, obj):
+        return self.loader.get_boundary_percentiles(obj)
 
 
 class BoundaryInfoSerializer(KLPSerializer):
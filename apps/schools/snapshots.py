@@ -0,0 +1,230 @@
+import gzip
+import hashlib
+import json
+import os
+import urllib
+from cStringIO import StringIO
+from django.core.urlresolvers import resolve
+from django.test.client import RequestFactory
+from common.mixins import uncached_view
+from schools.models import (
+    Boundary, Assembly, Parliament, ElectedrepMaster,
+    BoundaryAssessmentSinglescore
+)
+
+API_ROOT = '/api/v1/'
+
+LANGUAGES = ('english', 'kannada')
+
+# the school_type variants of the boundary lists
+SCHOOL_TYPES = (None, 'primaryschools', 'preschools')
+
+BOUNDARY_REPORTS = (
+    'reports/summary/boundary/',
+    'reports/demographics/boundary/details/',
+    'reports/demographics/boundary/comparison/',
+    'reports/dise/boundary/',
+)
+
+ELECTEDREP_REPORTS = (
+    'reports/summary/electedrep/',
+    'reports/demographics/electedrep/details/',
+    'reports/demographics/electedrep/comparison/',
+    'reports/electedrep/',
+)
+
+
+def list_urls():
+    for path in ('boundary/admin1s', 'boundary/admin2s', 'boundary/admin3s'):
+        for school_type in SCHOOL_TYPES:
+            params = {'per_page': '0'}
+            if school_type:
+                params['school_type'] = school_type
+            yield path, params
+    yield 'boundary/assemblies', {'per_page': '0'}
+    yield 'boundary/parliaments', {'per_page': '0'}
+    yield 'programme/', {'per_page': '0'}
+
+
+def boundary_urls(boundary_id, admin_level, years, programmes):
+    yield 'boundary/admin/%d' % boundary_id, {}
+    if admin_level == 1:
+        yield 'boundary/admin1/%d/admin2' % boundary_id, {'per_page': '0'}
+        yield 'boundary/admin1/%d/admin3' % boundary_id, {'per_page': '0'}
+    elif admin_level == 2:
+        yield 'boundary/admin2/%d/admin3' % boundary_id, {'per_page': '0'}
+
+    yield 'aggregation/boundary/%d/library-level/' % boundary_id, {}
+    yield 'aggregation/boundary/%d/library-language/' % boundary_id, {}
+    for year in years:
+        yield 'aggregation/boundary/%d/schools/' % boundary_id, {'year': year}
+        for path in BOUNDARY_REPORTS:
+            for language in LANGUAGES:
+                yield path, {'id': str(boundary_id), 'language': language,
+                             'year': year}
+
+    param = 'admin_%d' % admin_level
+    for programme_id in programmes:
+        yield 'programme/%d/' % programme_id, {param: str(boundary_id)}
+        yield 'programme/percentile/%d/' % programme_id, {param: str(boundary_id)}
+
+
+def constituency_urls(years):
+    for assembly_id in Assembly.objects.values_list('id', flat=True):
+        yield 'boundary/assembly/%d' % assembly_id, {}
+        for year in years:
+            yield 'aggregation/assembly/%d/schools/' % assembly_id, {'year': year}
+
+    for parliament_id in Parliament.objects.values_list('id', flat=True):
+        yield 'boundary/parliament/%d' % parliament_id, {}
+        yield 'boundary/parliament/%d/assemblies' % parliament_id, {'per_page': '0'}
+        for year in years:
+            yield 'aggregation/parliament/%d/schools/' % parliament_id, {'year': year}
+
+    for electedrep_id in ElectedrepMaster.objects.values_list('id', flat=True):
+        for year in years:
+            for path in ELECTEDREP_REPORTS:
+                for language in LANGUAGES:
+                    yield path, {'id': str(electedrep_id), 'language': language,
+                                 'year': year}
+
+
+def with_ancestors(boundary_ids):
+    """
+        boundary_ids and the boundaries above them, whose aggregations
+        include theirs.
+    """
+    ids = set(boundary_ids)
+    for parent, grandparent in Boundary.objects.filter(
+            id__in=boundary_ids).values_list('parent', 'parent__parent'):
+        ids.update(i for i in (parent, grandparent) if i)
+    return ids
+
+
+def snapshot_urls(years, boundary_ids=None):
+    """
+        (path, params) of the responses making up the snapshot. With
+        boundary_ids, only those of the given boundaries and the boundaries
+        above them.
+    """
+    boundaries = Boundary.objects.filter(status=2)
+    if boundary_ids is None:
+        urls = list(list_urls()) + list(constituency_urls(years))
+    else:
+        urls = []
+        boundaries = boundaries.filter(id__in=with_ancestors(boundary_ids))
+
+    programmes = {}
+    for boundary_id, programme_id in BoundaryAssessmentSinglescore.objects\
+            .values_list('boundary', 'assessment__programme').distinct():
+        programmes.setdefault(boundary_id, set()).add(programme_id)
+
+    for boundary_id, hierarchy_id in boundaries.order_by('id')\
+            .values_list('id', 'hierarchy'):
+        admin_level = Boundary(hierarchy_id=hierarchy_id).get_admin_level()
+        if not admin_level:
+            continue
+        urls.extend(boundary_urls(
+            boundary_id, admin_level, years,
+            sorted(programmes.get(boundary_id, ()))))
+    return [(API_ROOT + path, params) for path, params in urls]
+
+
+def snapshot_key(path, params):
+    # params sorted, as the files are looked up by query string
+    query = urllib.urlencode(sorted(params.items()))
+    return path + '?' + query if query else path
+
+
+def snapshot_file(path, params):
+    """
+        Where the response to path with params is kept, relative to the
+        snapshot root: <path>/<query string>.json, or <path>/index.json
+    """
+    query = urllib.urlencode(sorted(params.items()))
+    return os.path.join(path.strip('/'), (query or 'index') + '.json')
+
+
+def gzipped(content):
+    buf = StringIO()
+    # mtime=0 so that the same content gives the same file
+    f = gzip.GzipFile(filename='', mode='wb', fileobj=buf, mtime=0)
+    f.write(content)
+    f.close()
+    return buf.getvalue()
+
+
+def write_file(filename, content):
+    directory = os.path.dirname(filename)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # made by another worker in the meantime
+            if not os.path.isdir(directory):
+                raise
+    tmp = '%s.%d.tmp' % (filename, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.rename(tmp, filename)
+
+
+def render_response(path, params):
+    """
+        The rendered response of the API to a GET of path with params.
+    """
+    match = resolve(path)
+    request = RequestFactory().get(path, params)
+    # without cache_page, which would serve responses from before the
+    # refresh
+    response = uncached_view(match.func)(
+        request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def render_snapshot(args):
+    """
+        Renders one response and writes it, and its gzipped copy, under
+        root unless its content is unchanged. Runs in the worker processes.
+        Returns (key, manifest entry), the entry being None if the response
+        was not a 200.
+    """
+    path, params, root, previous_md5 = args
+    key = snapshot_key(path, params)
+    try:
+        response = render_response(path, params)
+    except Exception, e:
+        print "Snapshot: %s failed: %s" % (key, e)
+        return key, None
+    if response.status_code != 200:
+        return key, None
+
+    content = response.content
+    md5 = hashlib.md5(content).hexdigest()
+    relpath = snapshot_file(path, params)
+    filename = os.path.join(root, relpath)
+    compressed = gzipped(content)
+    if md5 != previous_md5 or not os.path.exists(filename + '.gz'):
+        write_file(filename, content)
+        write_file(filename + '.gz', compressed)
+    return key, {
+        'path': relpath,
+        'md5': md5,
+        'size': len(content),
+        'gzip_size': len(compressed),
+    }
+
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, 'manifest.json')) as f:
+            return json.load(f)
+    except IOError:
+        return {'files': {}}
+
+
+def save_manifest(root, manifest):
+    write_file(os.path.join(root, 'manifest.json'),
+               json.dumps(manifest, indent=2, sort_keys=True))
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import (Answer, Question, Questiongroup, QuestiongroupQuestions,
-                     QuestionType, Source, Story, StoryImage, Survey)
+                     QuestionType, Source, Story, StoryFact, StoryImage, Survey)
 
 
 class AnswerInline(admin.StackedInline):
@@ -46,7 +46,10 @@ class StoryAdmin(admin.ModelAdmin):
         return queryset, use_distinct
 
     def mark_verified(self, request, queryset):
+        ids = list(queryset.values_list('id', flat=True))
         rows_updated = queryset.update(is_verified=True)
+        # update() sends no post_save to keep the story facts current
+        StoryFact.refresh(ids)
         if rows_updated == 1:
             story_string = 'story'
         else:
@@ -1,12 +1,13 @@
 import ast
+import gzip
 import random
-import calendar
+import hashlib
 import datetime
 import json
 
 from PIL import Image
 from base64 import b64decode
-from collections import Counter, OrderedDict
+from collections import OrderedDict, defaultdict
 from dateutil.parser import parse as date_parse
 
 from rest_framework import status
@@ -21,6 +22,8 @@ from rest_framework.exceptions import (
 )
 
 from django.conf import settings
+from django.http import HttpResponse
+from django.core.cache import cache
 from django.db.models import Q, Count
 from django.contrib.auth.models import Group
 from django.core.files.base import ContentFile
@@ -28,25 +31,29 @@ from django.core.files.base import ContentFile
 from users.models import User
 
 from schools.models import (
-    AssessmentsV2, Boundary, BoundaryType,
+    AssessmentsV2, Boundary,
     BoundaryUsers, School, SchoolDetails,
     StudentGroup, Student
 )
 
-from common.utils import Date
+from common.utils import Date, get_data_epoch
+from common.exceptions import APIError
 from common.mixins import CacheMixin
 from common.views import (
     KLPAPIView, KLPDetailAPIView,
     KLPListAPIView, KLPModelViewSet
 )
 
+from . import bundles, delta, volumes, summaries, sync
+from .columnar import stored_answer_counts
 from .gka import GKA
 from .gp_contest import GPContest
 
 from .models import (
     Question, Story, StoryImage,
-    Answer, Questiongroup, UserType,
-    Source, Survey, QuestiongroupQuestions
+    Answer, AnswerOption, Questiongroup, UserType,
+    Source, Survey, QuestiongroupQuestions, StoryFact,
+    QuestiongroupFingerprint
 )
 from .serializers import (
     SchoolQuestionsSerializer, StorySerializer, StorySyncSerializer,
@@ -87,21 +94,19 @@ class QuestiongroupsViewSet(KLPModelViewSet):
 
     def is_questiongroup_exists(self, survey, question_ids):
         questiongroups = survey.questiongroup_set.all()
-        for questiongroup in questiongroups:
-            questiongroup_question_ids = questiongroup.questions.all().values_list(
-                'id',
-                flat=True
-            )
-            if set(questiongroup_question_ids) == set(question_ids):
-                group_id = questiongroup.id
-                version = questiongroup.version
-                message = "Questiongroup already exists. Group ID: " + \
-                    str(group_id) + \
-                    " and Version: " + \
-                    str(version)
-                raise APIException(message)
-        else:
-            return False
+        # rehashes the groups changed since they were last hashed
+        QuestiongroupFingerprint.current(questiongroups)
+        existing = questiongroups.filter(
+            fingerprint__questions_hash=QuestiongroupFingerprint.hash_questions(
+                question_ids)
+        ).values_list('id', 'version')[:1]
+        for group_id, version in existing:
+            message = "Questiongroup already exists. Group ID: " + \
+                str(group_id) + \
+                " and Version: " + \
+                str(version)
+            raise APIException(message)
+        return False
 
     def is_questions_exist(self, question_ids):
         return Question.objects.filter(id__in=question_ids).count() == len(question_ids)
@@ -147,6 +152,35 @@ class QuestiongroupsViewSet(KLPModelViewSet):
             raise APIException(serializer.errors)
 
 
+class QuestiongroupFingerprintsView(KLPAPIView):
+    """
+    Expects a POST request with the questiongroups a device holds and
+    their fingerprints as JSON, {"fingerprints": {"<group id>": "<hash>"}}.
+    Returns the groups whose fingerprint differs, new ones included, with
+    their questions and current fingerprint, and the ids of the groups
+    held that no longer exist.
+    """
+    def post(self, request, format=None):
+        try:
+            held = json.loads(request.body).get('fingerprints', {})
+            held = dict((int(group_id), fingerprint)
+                        for group_id, fingerprint in held.items())
+        except (ValueError, AttributeError):
+            raise ParseError('Invalid JSON data')
+
+        hashes = QuestiongroupFingerprint.current()
+        changed = [group_id for group_id, content_hash in hashes.items()
+                   if held.get(group_id) != content_hash]
+        documents = QuestiongroupFingerprint.documents(changed)
+        for group_id, document in documents.items():
+            document['fingerprint'] = hashes[group_id]
+        return Response({
+            'questiongroups': [documents[group_id]
+                               for group_id in sorted(documents)],
+            'removed': sorted(set(held) - set(hashes)),
+        })
+
+
 class QuestionsViewSet(KLPModelViewSet):
     serializer_class = QuestionFullSerializer
     filter_class = QuestionFilter
@@ -187,63 +221,87 @@ class StoriesSyncView(KLPAPIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def post(self, request, format=None):
+        """
+        Saves the stories with StoriesSync. Besides the ids of the saved
+        stories under 'success' and of the failed ones under 'failed', each
+        story's outcome is given under 'status'.
+        """
         response = {
             'success': dict(),
             'failed': [],
+            'status': dict(),
             'error': None
         }
         try:
             stories = json.loads(request.body)
-            print stories
-        except ValueError as e:
-            print e
+        except ValueError:
             response['error'] = 'Invalid JSON data'
+            return Response(response)
 
-        if response['error'] is None:
-            for story in stories.get('stories', []):
-                timestamp = int(story.get('created_at'))/1000
-                sysid = None
-
-                try:
-                    sysid = int(story.get('sysid'))
-                except ValueError:
-                    sysid = None
-
-                try:
-                    if story.get('respondent_type') not in dict(UserType.USER_TYPE_CHOICES).keys():
-                        raise Exception("Invalid respondent type")
-                    user_type = UserType.objects.get(name__iexact=story.get('respondent_type'))
-                    new_story, created = Story.objects.get_or_create(
-                        user=request.user,
-                        school_id=story.get('school_id'),
-                        group_id=story.get('group_id'),
-                        user_type=user_type,
-                        date_of_visit=datetime.datetime.fromtimestamp(timestamp)
-                    )
-
-                    if created:
-                        new_story.sysid = sysid
-                        new_story.is_verified = True
-                        new_story.telephone = request.user.mobile_no
-                        new_story.name = request.user.get_full_name()
-                        new_story.email = request.user.email
-                        new_story.save()
-
-                    for answer in story.get('answers', []):
-                        new_answer, created = Answer.objects.get_or_create(
-                            text=answer.get('text'),
-                            story=new_story,
-                            question=Question.objects.get(pk=answer.get('question_id'))
-                        )
-                    response['success'][story.get('_id')] = new_story.id
-                except Exception as e:
-                    print "Error saving stories and answers:", e
-                    response['failed'].append(story.get('_id'))
-                    # price traceback
-                    import traceback; traceback.print_exc();
+        items = stories.get('stories', []) if isinstance(stories, dict) \
+            else None
+        if not isinstance(items, list):
+            response['error'] = 'Invalid JSON data'
+            return Response(response)
+
+        response['status'] = sync.StoriesSync(request.user, items).run()
+        for item_id, outcome in response['status'].items():
+            if outcome['status'] == sync.FAILED:
+                response['failed'].append(item_id)
+            else:
+                response['success'][item_id] = outcome['story_id']
         return Response(response)
 
 
+class MobileBundleListView(KLPAPIView):
+    """
+    The versions of the district bundles the mobile app can download.
+    """
+    def get(self, request):
+        return Response(dict(
+            (district_id, {
+                'version': entry['version'],
+                'gzip_size': entry['gzip_size'],
+                'generated_at': entry['generated_at'],
+                'url': reverse('api_mobile_bundle', request=request,
+                               kwargs={'district_id': district_id}),
+            }) for district_id, entry in bundles.built_bundles().items()
+        ))
+
+
+class MobileBundleView(KLPAPIView):
+    """
+    The offline data bundle of a district, built by build_mobile_bundles.
+    Its version is the ETag; sent back as If-None-Match it gets a 304
+    while the bundle is current. Served gzipped to clients accepting it.
+    """
+    def get(self, request, district_id):
+        bundle = bundles.get_bundle(int(district_id))
+        if bundle is None:
+            raise APIError('Bundle not found', 404)
+
+        etag = '"%s"' % bundle['version']
+        matches = [tag.strip() for tag in
+                   request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]
+        if etag in matches or '*' in matches:
+            response = HttpResponse(status=304)
+        elif 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            with open(bundle['filename'], 'rb') as f:
+                response = HttpResponse(f.read(),
+                                        content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            f = gzip.open(bundle['filename'], 'rb')
+            try:
+                response = HttpResponse(f.read(),
+                                        content_type='application/json')
+            finally:
+                f.close()
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
 class StoryInfoView(KLPAPIView):
     def get(self, request):
         return Response({
@@ -271,6 +329,9 @@ class StoryVolumeView(KLPAPIView, CacheMixin):
     to -- YYYY-MM-DD till when the data should be filtered.
     school_type -- Type of School [Primary School/PreSchool].
     response_type - What volume to calculate [call_volume/gka]
+    granularity - Size of the volume buckets [day/week/month/year]. Volumes
+                  are per year and month for month, and by the first day
+                  of the bucket otherwise.
     """
 
     def get(self, request):
@@ -289,6 +350,11 @@ class StoryVolumeView(KLPAPIView, CacheMixin):
             'school_type', 'Primary School')
         response_type = self.request.QUERY_PARAMS.get(
             'response_type', 'call_volume')
+        granularity = self.request.QUERY_PARAMS.get('granularity', 'month')
+
+        if granularity not in volumes.GRANULARITIES:
+            raise ParseError("Invalid granularity passed, pass from the "
+                             + str(list(volumes.GRANULARITIES)))
 
         date = Date()
         if start_date:
@@ -308,118 +374,78 @@ class StoryVolumeView(KLPAPIView, CacheMixin):
         response_json = {}
         response_json['user_groups'] = {}
 
-        school_type = BoundaryType.objects.get(name=school_type)
-        stories_qset = Story.objects.select_related(
-            'school', 'user'
-        ).filter(
-            school__admin3__type=school_type
-        )
-        assessments_qset = AssessmentsV2.objects.all()
-
-        if survey:
-            stories_qset = stories_qset.filter(
-                group__survey__name=survey)
+        if response_type == 'call_volume':
+            filters = {
+                'survey': survey,
+                'source': source,
+                'versions': map(int, versions) if versions else None,
+                'school_type': school_type,
+                'admin1': admin1_id,
+                'admin2': admin2_id,
+                'admin3': admin3_id,
+                'school': school_id,
+                'mp': mp_id,
+                'mla': mla_id,
+            }
+            buckets = volumes.story_volumes(
+                filters, granularity, start_date, end_date)
+            user_groups = volumes.user_group_volumes(
+                filters, start_date, end_date)
+            for group in Group.objects.values_list('name', flat=True):
+                response_json['user_groups'][group] = user_groups.get(group, 0)
+        else:
+            assessments_qset = self.get_assessments(
+                admin1_id, admin2_id, admin3_id, school_id,
+                start_date, end_date)
+            buckets = volumes.bucket_counts(
+                assessments_qset, 'assessed_ts', granularity, Count('id'))
+
+        if granularity == 'month':
+            response_json['volumes'] = volumes.per_month(buckets)
+        else:
+            response_json['volumes'] = OrderedDict(
+                (bucket.isoformat(), count) for bucket, count in buckets)
 
-        if source:
-            stories_qset = stories_qset.filter(
-                group__source__name=source)
+        return Response(response_json)
 
-        if versions:
-            versions = map(int, versions)
-            stories_qset = stories_qset.filter(
-                group__version__in=versions)
+    def get_assessments(self, admin1_id, admin2_id, admin3_id, school_id,
+                        start_date, end_date):
+        assessments_qset = AssessmentsV2.objects.all()
 
         if admin1_id:
-            stories_qset = stories_qset.filter(
-                school__schooldetails__admin1__id=admin1_id)
             boundary = Boundary.objects.get(id=admin1_id)
             assessments_qset = assessments_qset.filter(
                 student_uid__district=boundary.name
             )
 
         if admin2_id:
-            stories_qset = stories_qset.filter(
-                school__schooldetails__admin2__id=admin2_id)
             boundary = Boundary.objects.get(id=admin2_id)
             assessments_qset = assessments_qset.filter(
                 student_uid__block=boundary.name
             )
 
         if admin3_id:
-            stories_qset = stories_qset.filter(
-                school__schooldetails__admin3__id=admin3_id)
             boundary = Boundary.objects.get(id=admin3_id)
             assessments_qset = assessments_qset.filter(
                 student_uid__cluster=boundary.name
             )
 
         if school_id:
-            stories_qset = stories_qset.filter(
-                school=school_id)
             assessments_qset = assessments_qset.filter(
                 student_uid__school_code=school_id
             )
 
-        if mp_id:
-            stories_qset = stories_qset.filter(
-                school__electedrep__mp_const__id=mp_id)
-
-        if mla_id:
-            stories_qset = stories_qset.filter(
-                school__electedrep__mla_const__id=mla_id)
-
         if start_date:
-            stories_qset = stories_qset.filter(
-                date_of_visit__gte=start_date)
             assessments_qset = assessments_qset.filter(
                 assessed_ts__gte=start_date,
             )
 
         if end_date:
-            stories_qset = stories_qset.filter(
-                date_of_visit__lte=end_date)
             assessments_qset = assessments_qset.filter(
                 assessed_ts__lte=end_date,
             )
 
-        if response_type == 'call_volume':
-            dates = stories_qset.values_list('date_of_visit', flat=True).order_by()
-            groups = Group.objects.all()
-            for group in groups:
-                response_json['user_groups'][group.name] = stories_qset.filter(
-                    user__in=group.user_set.all()
-                ).count()
-        else:
-            dates = assessments_qset.values_list('assessed_ts', flat=True)
-            response_json['user_groups'] = {}
-
-        response_json['volumes'] = self.get_call_volume(dates)
-
-        return Response(response_json)
-
-    def get_call_volume(self, dates):
-        months = "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split()
-        json = {}
-        for date in dates:
-            if date.year in json:
-                json[date.year].append(date.month)
-            else:
-                json[date.year] = []
-                json[date.year].append(date.month)
-
-        per_month_json = {}
-        for year in json:
-            per_month_json[year] = dict(Counter(
-                [calendar.month_abbr[date] for date in json[year]])
-            )
-
-        ordered_per_month_json = {}
-        for year in per_month_json:
-            ordered_per_month_json[year] = OrderedDict()
-            for month in months:
-                ordered_per_month_json[year][month] = per_month_json[year].get(month, 0)
-
-        return ordered_per_month_json
+        return assessments_qset
 
 
 class StoryDetailView(KLPAPIView, CacheMixin):
@@ -437,7 +463,7 @@ class StoryDetailView(KLPAPIView, CacheMixin):
     mp_id -- ID of the MP constituency.
     mla_id -- ID of the MLA constituency.
     from -- YYYY-MM-DD from when the data should be filtered.
-    to -- YYYY-MM-DD till when the data should be filtered.
+    to -- YYYY-MM-DD till when the data should be filtered, that day included.
     school_type -- Type of School [Primary School/PreSchool].
     """
 
@@ -528,7 +554,9 @@ class StoryDetailView(KLPAPIView, CacheMixin):
             stories = stories.filter(date_of_visit__gte=start_date)
 
         if end_date:
-            stories = stories.filter(date_of_visit__lte=end_date)
+            # the whole day, as the answer columns count it
+            stories = stories.filter(
+                date_of_visit__lt=end_date + datetime.timedelta(days=1))
 
         response_json = {}
         
@@ -540,60 +568,125 @@ class StoryDetailView(KLPAPIView, CacheMixin):
             gp_contest = GPContest()
             response_json = gp_contest.generate_report(stories)
         # Sources and filters
-        elif source:
-            response_json[source] = get_que_and_ans(
-                stories, source, school_type, versions)
         else:
-            sources = Source.objects.all().values_list('name', flat=True)
-            for source in sources:
+            counts = stored_answer_counts({
+                'survey': survey,
+                'source': source,
+                'versions': versions,
+                'school_type': school_type,
+                'admin1': admin1_id,
+                'admin2': admin2_id,
+                'admin3': admin3_id,
+                'school': school_id,
+                'mp': mp_id,
+                'mla': mla_id,
+            }, start_date, end_date)
+            if source:
                 response_json[source] = get_que_and_ans(
-                    stories, source, school_type, versions)
+                    stories, source, school_type, versions, counts)
+            else:
+                sources = Source.objects.all().values_list('name', flat=True)
+                response_json = get_que_and_ans_by_source(
+                    stories, list(sources), school_type, versions,
+                    counts=counts)
 
         return Response(response_json)
 
 
-def get_que_and_ans(stories, source, school_type, versions):
-    response_list = []
+def get_que_and_ans_by_source(stories, sources, school_type, versions,
+                              featured=True, counts=None):
+    """
+    Answer counts of the questions of each source, for stories, as
+    {source: [question, ...]}. With sources None, questions of all sources
+    are listed once under None.
+
+    Takes four queries whatever the number of sources and questions: one
+    for the questions and their sources, one for their answer options, and
+    the answer counts grouped by question and code, then by question and
+    text for the answers not coded yet or by a code with no option. The
+    last three are skipped when the counts, as {question id: {text:
+    count}}, are given.
+    """
+    questions = QuestiongroupQuestions.objects.all()
 
-    questions = Question.objects.filter(
-        is_featured=True).select_related(
-            'question_type', 'school_type'
-        )
+    if featured:
+        questions = questions.filter(question__is_featured=True)
 
-    if source:
-        questions = questions.filter(
-            questiongroup__source__name=source)
+    if sources is not None:
+        questions = questions.filter(questiongroup__source__name__in=sources)
 
     if versions:
-        questions = questions.filter(
-            questiongroup__version__in=versions)
+        questions = questions.filter(questiongroup__version__in=versions)
 
     if school_type:
         questions = questions.filter(
-            school_type__name=school_type)
-
-
-    for question in questions.distinct('id'):
-        j = {}
-        j['question'] = {}
-        j['question']['key'] = question.key
-        j['question']['text'] = question.text
-        j['question']['display_text'] = question.display_text
-        j['answers'] = {}
-        j['answers']['question_type'] = question.question_type.name
+            question__school_type__name=school_type)
+
+    questions = questions.values_list(
+        'questiongroup__source__name', 'question', 'question__key',
+        'question__text', 'question__display_text',
+        'question__question_type__name'
+    ).order_by('question').distinct()
+
+    response = dict((source, []) for source in sources or [None])
+    listed = set()
+    for source, question_id, key, text, display_text, question_type in questions:
+        if sources is None:
+            source = None
+        if (source, question_id) in listed:
+            continue
+        listed.add((source, question_id))
+        response[source].append({
+            'id': question_id,
+            'question': {
+                'key': key,
+                'text': text,
+                'display_text': display_text,
+            },
+            'answers': {
+                'question_type': question_type,
+                'options': {},
+            },
+        })
 
-        answer_counts = question.answer_set.filter(
-            story__in=stories
-        ).values('text').annotate(answer_count=Count('text'))
+    question_ids = set(question_id for source, question_id in listed)
+    options = defaultdict(dict)
+    if counts is not None:
+        options.update(counts)
+    elif question_ids:
+        answers = Answer.objects.filter(
+            story__in=stories, question__in=question_ids)
+        texts = dict(
+            ((question_id, code), text) for question_id, code, text in
+            AnswerOption.objects.filter(question__in=question_ids)
+            .values_list('question', 'code', 'text')
+        )
+        uncoded = Q(code=None)
+        for count in answers.exclude(code=None).values('question', 'code')\
+                .annotate(answer_count=Count('id')).order_by():
+            text = texts.get((count['question'], count['code']))
+            if text is None:
+                uncoded |= Q(question=count['question'], code=count['code'])
+                continue
+            options[count['question']][text] = count['answer_count']
+        # answers not coded yet, or whose code has no option
+        for count in answers.filter(uncoded).values('question', 'text')\
+                .annotate(answer_count=Count('id')).order_by():
+            text_counts = options[count['question']]
+            text_counts[count['text']] = \
+                text_counts.get(count['text'], 0) + count['answer_count']
 
-        options = {}
-        for count in answer_counts:
-            options[count['text']] = count['answer_count']
-        j['answers']['options'] = options
+    for questions in response.values():
+        for question in questions:
+            question['answers']['options'] = dict(options[question.pop('id')])
+    return response
 
-        response_list.append(j)
 
-    return response_list
+def get_que_and_ans(stories, source, school_type, versions, counts=None):
+    return get_que_and_ans_by_source(
+        stories, [source] if source else None, school_type, versions,
+        counts=counts
+    )[source or None]
 
 
 class StoryMetaView(KLPAPIView, CacheMixin):
@@ -642,105 +735,96 @@ class StoryMetaView(KLPAPIView, CacheMixin):
             if not sane:
                 raise APIException("Please enter `to` in the format YYYY-MM-DD")
             else:
-                end_date = date.get_datetime(end_date) 
+                end_date = date.get_datetime(end_date)
         school_qset = School.objects.filter(
             admin3__type__name=school_type, status=2)
-        stories_qset = Story.objects.filter(
-            school__admin3__type__name=school_type)
 
         if admin1_id:
             school_qset = school_qset.filter(
                 schooldetails__admin1__id=admin1_id)
-            stories_qset = stories_qset.filter(
-                school__schooldetails__admin1__id=admin1_id)
 
         if admin2_id:
             school_qset = school_qset.filter(
                 schooldetails__admin2__id=admin2_id)
-            stories_qset = stories_qset.filter(
-                school__schooldetails__admin2__id=admin2_id)
 
         if admin3_id:
             school_qset = school_qset.filter(
                 schooldetails__admin3__id=admin3_id)
-            stories_qset = stories_qset.filter(
-                school__schooldetails__admin3__id=admin3_id)
 
         if school_id:
             school_qset = school_qset.filter(id=school_id)
-            stories_qset = stories_qset.filter(
-                school=school_id)
 
         if mp_id:
             school_qset = school_qset.filter(
-                electedrep__mp_const__id=mp_id)
-            stories_qset = stories_qset.filter(
-                school__electedrep__mp_const__id=mp_id)
+                electedrep__parliament__id=mp_id)
 
         if mla_id:
             school_qset = school_qset.filter(
-                electedrep__mla_const__id=mla_id)
-            stories_qset = stories_qset.filter(
-                school__electedrep__mla_const__id=mla_id)
-
-        if start_date:
-            #school_qset = school_qset.filter(
-            #    story__date_of_visit__gte=start_date)
-            stories_qset = stories_qset.filter(
-                date_of_visit__gte=start_date)
-
-        if end_date:
-            # school_qset = school_qset.filter(
-            #     story__date_of_visit__lte=end_date)
-            stories_qset = stories_qset.filter(
-                date_of_visit__lte=end_date)
+                electedrep__assembly__id=mla_id)
+
+        filters = {
+            'school_type': school_type,
+            'admin1': admin1_id,
+            'admin2': admin2_id,
+            'admin3': admin3_id,
+            'school': school_id,
+            'mp': mp_id,
+            'mla': mla_id,
+        }
+        counts = summaries.story_counts(filters, start_date, end_date)
+        schools, total_schools = summaries.school_counts(
+            filters, start_date, end_date)
 
         response_json = {}
 
         response_json['total'] = {}
         response_json['total']['schools'] = school_qset.count()
-        response_json['total']['stories'] = stories_qset.count()
-        response_json['total']['schools_with_stories'] = stories_qset.distinct('school').count()
+        response_json['total']['stories'] = sum(
+            count for (name, metric), count in counts.items()
+            if metric == 'stories')
+        response_json['total']['schools_with_stories'] = total_schools
+
+        # the rest is counted over the stories of the survey, and of the
+        # versions of the source
+        versions = map(int, versions) if source and versions else None
+        if survey or versions:
+            filters['survey'] = survey
+            filters['versions'] = versions
+            counts = summaries.story_counts(filters, start_date, end_date)
+            schools, total_schools = summaries.school_counts(
+                filters, start_date, end_date)
 
-        if survey:
-            stories_qset = stories_qset.filter(
-                group__survey__name=survey
-            )
-            
         if source:
-            stories_qset = self.source_filter(
-                source,
-                stories_qset
-            )
-
-            if versions:
-                versions = map(int, versions)
-                stories_qset = stories_qset.filter(
-                    group__version__in=versions
-                )
-
-            response_json[source] = self.get_json(
-                source,
-                stories_qset,
-            )
+            sources = [source]
         else:
-            sources = Source.objects.all().values_list('name', flat=True)
-            for source in sources:
-                stories = self.source_filter(
-                    source,
-                    stories_qset
-                )
-                response_json[source] = self.get_json(
-                    source,
-                    stories,
-                )
+            sources = list(Source.objects.values_list('name', flat=True))
+
+        for name in sources:
+            response_json[name] = self.get_json(
+                name, counts, schools.get(name, {}))
 
-        response_json['respondents'] = self.get_respondents(stories_qset)
-        response_json['users'] = self.get_users(stories_qset)
-        response_json['top_summary'] = self.get_total_summary(school_qset, admin1_id)
+        response_json['respondents'] = self.get_respondents(counts, sources)
+        response_json['users'] = self.get_users(counts, sources)
+        response_json['top_summary'] = self.get_top_summary(
+            school_qset, admin1_id)
 
         return Response(response_json)
 
+    def get_top_summary(self, school_qset, admin1_id=None):
+        # changes with imports only, so it is kept until the next one
+        if not settings.CACHE_ENABLED:
+            return self.get_total_summary(school_qset, admin1_id)
+        key = 'stories-top-summary:%s:%s' % (
+            get_data_epoch(),
+            hashlib.md5(('%s:%s' % (school_qset.query, admin1_id)).encode(
+                'utf-8')).hexdigest()
+        )
+        summary = cache.get(key)
+        if summary is None:
+            summary = self.get_total_summary(school_qset, admin1_id)
+            cache.set(key, summary, settings.CACHE_TIMEOUT)
+        return summary
+
     def get_total_summary(self, school_qset, admin1_id=None, admin2_id=None, admin3_id=None):
         gka_school_q = school_qset.filter(programmes__name='Ganitha Kanika Andolana')
         gka_student_group_q = StudentGroup.objects.filter(school__in=gka_school_q).distinct('id')
@@ -767,61 +851,44 @@ class StoryMetaView(KLPAPIView, CacheMixin):
             'education_volunteers': edu_volunteers.count()
         }
 
-    def get_users(self, stories_qset):
+    def get_users(self, counts, sources):
         users = {}
-        groups = Group.objects.all()
-        for group in groups:
-            group_users = group.user_set.all()
-            users[group.name] = stories_qset.filter(user__in=group_users).count()
+        for group in Group.objects.values_list('name', flat=True):
+            users[group] = sum(
+                counts.get((source, 'users:' + group), 0) for source in sources)
 
         return users
-    
-    def get_respondents(self, stories_qset):
+
+    def get_respondents(self, counts, sources):
         respondents = {}
 
-        respondent_types = UserType.objects.all()
-        
-        for respondent in respondent_types:
-            respondents[respondent.get_name_display()] = stories_qset.filter(
-                user_type=respondent).count()
+        names = dict(UserType.USER_TYPE_CHOICES)
+        for respondent in UserType.objects.values_list('name', flat=True):
+            respondents[names.get(respondent, respondent)] = sum(
+                counts.get((source, 'respondents:' + respondent), 0)
+                for source in sources)
 
         return respondents
 
-    def source_filter(self, source, stories_qset):
-        stories_qset = stories_qset.filter(
-            group__source__name=source)
-
-        return stories_qset
-
-    def get_json(self, source, stories_qset):
+    def get_json(self, source, counts, schools):
         json = {}
-        json['stories'] = stories_qset.count()
-        json['schools'] = stories_qset.distinct('school').count()
-        if stories_qset:
-            json['last_story'] = stories_qset.latest('date_of_visit').date_of_visit
-        else:
-            json['last_story'] = None
+        json['stories'] = counts.get((source, 'stories'), 0)
+        json['schools'] = schools.get('schools', 0)
+        json['last_story'] = schools.get('last_story')
         if source == "web":
-            json['verified_stories'] = stories_qset.filter(
-                is_verified=True,
-            ).count()
+            json['verified_stories'] = counts.get(
+                (source, 'verified_stories'), 0)
         if source == "sms":
-            gka_districts_queryset = Story.objects.filter(
-                group__source__name="sms"
-            ).order_by(
-            ).distinct(
-                'school__admin3__parent__parent'
+            gka_districts_queryset = StoryFact.objects.filter(
+                source__name="sms", admin1__isnull=False
             ).values(
-                'school__admin3__parent__parent__id',
-                'school__admin3__parent__parent__name'
-            )
-            old_id_key = 'school__admin3__parent__parent__id'
-            old_name_key = 'school__admin3__parent__parent__name'
+                'admin1', 'admin1__name'
+            ).distinct().order_by('admin1')
 
             json['gka_districts'] = [
                 {
-                    'id': item[old_id_key],
-                    'name': item[old_name_key]
+                    'id': item['admin1'],
+                    'name': item['admin1__name']
                 }
                 for item in gka_districts_queryset
             ]
@@ -845,8 +912,15 @@ class StoriesView(KLPListAPIView):
     answers     [yes, no] if answers should be returned
     verified    [yes, no] if only verified or not-verified stories should be
                 returned, if not mentioned, returns all
+    cursor      page by cursor instead of page number, empty for the first page
+    fields      comma separated fields to return
+    omit        comma separated fields to leave out
+    since       list only the stories changed since this token, empty for
+                all of them, see stories.delta; the response has the token
+                to send next time
     """
     bbox_filter_field = "school__instcoord__coord"
+    cursor_ordering = ('-date_of_visit', '-id')
     authentication_classes = (authentication.TokenAuthentication,
                               authentication.SessionAuthentication,)
 
@@ -870,15 +944,6 @@ class StoriesView(KLPListAPIView):
         if school_id:
             qset = qset.filter(school__id=school_id)
 
-        if self.request.GET.get('answers', 'no') == 'yes':
-            qset = qset.prefetch_related(
-                'answer_set', 'answer_set__question',
-                'answer_set__question__question_type',
-                'answer_set__question__school_type',
-                'answer_set__question__questiongroupquestions_set',
-                'answer_set__question__questiongroupquestions_set__questiongroup__source',
-            )
-
         verified = self.request.GET.get('verified', '')
         if verified:
             if verified == 'yes':
@@ -936,8 +1001,24 @@ class StoriesView(KLPListAPIView):
         if admin3_id:
             qset = qset.filter(school__schooldetails__admin3__id=admin3_id)
 
-        qset = qset.prefetch_related('storyimage_set').select_related('school', 'user_type')
-        return qset
+        # only join and prefetch what the requested fields read
+        return self.get_serializer_class().with_related(qset, self.request)
+
+    def list(self, request, *args, **kwargs):
+        if 'since' not in request.GET:
+            return super(StoriesView, self).list(request, *args, **kwargs)
+
+        try:
+            page_size = int(request.GET.get('per_page') or delta.PAGE_SIZE)
+        except ValueError:
+            page_size = 0
+        if page_size < 1:
+            raise ParseError("per_page must be a positive integer.")
+        return Response(delta.changes(
+            self.filter_queryset(self.get_queryset()),
+            request.GET.get('since'),
+            min(page_size, delta.PAGE_SIZE)
+        ))
 
 
 class ShareYourStoryView(KLPAPIView):
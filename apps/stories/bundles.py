@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import translation
+
+from common.utils import get_data_epoch
+from schools.models import Boundary
+from schools.snapshots import (
+    API_ROOT, snapshot_key, render_response, gzipped, write_file,
+    load_manifest, save_manifest
+)
+
+from .models import Question, Questiongroup, QuestiongroupFingerprint
+
+# bumped when what a bundle holds changes, so that all are rebuilt
+BUNDLE_FORMAT = 1
+
+
+def district_ids():
+    return [
+        boundary_id for boundary_id, hierarchy_id in
+        Boundary.objects.filter(status=2).order_by('id')
+        .values_list('id', 'hierarchy')
+        if Boundary(hierarchy_id=hierarchy_id).get_admin_level() == 1
+    ]
+
+
+def bundle_urls(district_id):
+    """
+    (path, params) of the responses the app otherwise fetches for a
+    district: the district and its blocks and clusters, its schools, and
+    the questiongroups and questions, with the Kannada question texts.
+    """
+    return [(API_ROOT + path, params) for path, params in (
+        ('boundary/admin/%d' % district_id, {}),
+        ('boundary/admin1/%d/admin2' % district_id, {'per_page': '0'}),
+        ('boundary/admin1/%d/admin3' % district_id, {'per_page': '0'}),
+        ('schools/list/', {'admin1': str(district_id), 'per_page': '0'}),
+        ('questiongroups/', {'per_page': '0'}),
+        ('questions/', {'per_page': '0'}),
+    )]
+
+
+def questions_digest():
+    """
+    md5 of the questions as the app gets them, with their Kannada texts,
+    so that editing a text, an option or a translation changes it.
+    """
+    digest = hashlib.md5()
+    with translation.override('kn'):
+        for row in Question.objects.order_by('id').values_list(
+                'id', 'text', 'display_text', 'options', 'key', 'qid',
+                'question_type__name', 'school_type'):
+            digest.update(json.dumps(
+                list(row) + [translation.ugettext(row[1])]))
+    return digest.hexdigest()
+
+
+def bundle_inputs():
+    """
+    What the bundles are built from, as a digest that changes with it:
+    the data epoch, bumped when schools and boundaries are imported, the
+    questiongroups with the content hashes of their fingerprints, and the
+    questions.
+    """
+    groups = Questiongroup.objects.aggregate(
+        count=Count('id'), changed=Max('change_seq'))
+    return hashlib.md5(json.dumps([
+        BUNDLE_FORMAT, get_data_epoch(), groups['count'], groups['changed'],
+        sorted(QuestiongroupFingerprint.current().items()),
+        questions_digest(),
+    ])).hexdigest()
+
+
+def bundle_file(district_id):
+    return 'district-%d.json.gz' % district_id
+
+
+def build_bundle(district_id):
+    """
+    The bundle of district_id as json, its responses keyed by url.
+    """
+    responses = {}
+    for path, params in bundle_urls(district_id):
+        response = render_response(path, params)
+        if response.status_code != 200:
+            raise ValueError("%s returned %d" % (
+                snapshot_key(path, params), response.status_code))
+        responses[snapshot_key(path, params)] = json.loads(response.content)
+    return json.dumps({
+        'format': BUNDLE_FORMAT,
+        'district': district_id,
+        'responses': responses,
+    }, sort_keys=True)
+
+
+def build_bundles(root, district_ids, force=False):
+    """
+    Builds the bundles of district_ids under root, skipping those whose
+    inputs are unchanged unless force. A bundle whose content comes out
+    the same keeps its version, so devices holding it download nothing.
+    Returns the districts whose bundle changed.
+    """
+    manifest = load_manifest(root)
+    manifest.setdefault('bundles', {})
+    inputs = bundle_inputs()
+
+    changed = []
+    for district_id in district_ids:
+        key = str(district_id)
+        entry = manifest['bundles'].get(key)
+        path = os.path.join(root, bundle_file(district_id))
+        if not force and entry and entry['inputs'] == inputs and \
+                os.path.exists(path):
+            continue
+
+        content = build_bundle(district_id)
+        version = hashlib.md5(content).hexdigest()
+        if entry is None or entry['version'] != version or \
+                not os.path.exists(path):
+            compressed = gzipped(content)
+            write_file(path, compressed)
+            entry = {
+                'path': bundle_file(district_id),
+                'version': version,
+                'size': len(content),
+                'gzip_size': len(compressed),
+                'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+            changed.append(district_id)
+        entry['inputs'] = inputs
+        manifest['bundles'][key] = entry
+
+    manifest.pop('files', None)
+    save_manifest(root, manifest)
+    return changed
+
+
+def built_bundles():
+    """
+    {district id: manifest entry} of the bundles built.
+    """
+    return load_manifest(settings.MOBILE_BUNDLE_DIR).get('bundles', {})
+
+
+def get_bundle(district_id):
+    """
+    The manifest entry of the bundle of district_id, with its file's
+    full path, or None if it was not built.
+    """
+    entry = built_bundles().get(str(district_id))
+    if entry is None:
+        return None
+    return dict(entry, filename=os.path.join(
+        settings.MOBILE_BUNDLE_DIR, entry['path']))
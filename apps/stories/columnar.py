@@ -0,0 +1,273 @@
+import array
+import datetime
+import json
+import os
+import shutil
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from common.utils import DataEpochCache
+from schools.models import BoundaryType
+
+from .models import Source, Survey
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# the columns, and the answer or story fact columns they are read from
+COLUMNS = (
+    ('story', 'a.story_id'),
+    ('school', 'f.school_id'),
+    ('admin1', 'f.admin1_id'),
+    ('admin2', 'f.admin2_id'),
+    ('admin3', 'f.admin3_id'),
+    ('school_type', 'f.school_type_id'),
+    ('assembly', 'f.assembly_id'),
+    ('parliament', 'f.parliament_id'),
+    ('source', 'f.source_id'),
+    ('group', 'f.group_id'),
+    ('survey', 'f.survey_id'),
+    ('version', 'f.version'),
+    ('user_type', 'f.user_type_id'),
+    # days since EPOCH_DAY
+    ('day', "f.date_of_visit::date - date '1970-01-01'"),
+    ('question', 'a.question_id'),
+)
+
+EPOCH_DAY = datetime.date(1970, 1, 1)
+
+# what NULLs are stored as
+MISSING = -1
+
+ANSWERS_QUERY = """
+    SELECT %s, a.text
+    FROM stories_answer a
+    JOIN stories_storyfact f ON f.story_id = a.story_id
+    ORDER BY a.story_id
+"""
+
+# the story filters (stories.volumes.FILTERS keys) as columns, and the
+# model whose ids the names given for them stand for
+FILTER_COLUMNS = {
+    'survey': ('survey', Survey),
+    'source': ('source', Source),
+    'versions': ('version', None),
+    'school_type': ('school_type', BoundaryType),
+    'admin1': ('admin1', None),
+    'admin2': ('admin2', None),
+    'admin3': ('admin3', None),
+    'school': ('school', None),
+    'mp': ('parliament', None),
+    'mla': ('assembly', None),
+}
+
+
+def to_day_number(value):
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return (value - EPOCH_DAY).days
+
+
+def fetch_columns(batch_size=100000):
+    """
+    Reads the answers of the stories with facts, in story order. Returns
+    ({column: array of int32}, answers), the 'answer' column holding codes
+    into answers, the list of (question, text) pairs.
+    """
+    columns = dict((name, array.array('i')) for name, expression in COLUMNS)
+    columns['answer'] = array.array('i')
+    codes = {}
+
+    cursor = connection.cursor()
+    cursor.execute(ANSWERS_QUERY % ', '.join(
+        expression for name, expression in COLUMNS))
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            for (name, expression), value in zip(COLUMNS, row):
+                columns[name].append(MISSING if value is None else value)
+            # the question and the text
+            key = (row[-2], row[-1])
+            columns['answer'].append(codes.setdefault(key, len(codes)))
+
+    return columns, sorted(codes, key=codes.get)
+
+
+def save_columns(directory, columns, answers):
+    """
+    Writes one file of native int32 per column, and answers.json, into a
+    new directory swapped in for directory once complete.
+    """
+    directory = directory.rstrip('/')
+    new = directory + '.new'
+    old = directory + '.old'
+    for path in (new, old):
+        if os.path.exists(path):
+            shutil.rmtree(path)
+    os.makedirs(new)
+
+    for name, values in columns.items():
+        with open(os.path.join(new, name + '.i32'), 'wb') as f:
+            values.tofile(f)
+    with open(os.path.join(new, 'answers.json'), 'w') as f:
+        json.dump({
+            'columns': sorted(columns),
+            'size': len(columns['answer']),
+            'answers': answers,
+            'built_at': time.time(),
+        }, f)
+
+    if os.path.exists(directory):
+        os.rename(directory, old)
+    os.rename(new, directory)
+    if os.path.exists(old):
+        shutil.rmtree(old)
+
+
+class AnswerColumns(object):
+    """
+    Story answers as numpy columns, one entry per answer, with vectorized
+    filtering and counting. Answers are coded by (question, text) so that
+    counting them is a bincount.
+    """
+
+    def __init__(self, columns, answers, built_at=None):
+        self.columns = columns
+        self.answers = [tuple(answer) for answer in answers]
+        self.size = len(columns['answer'])
+        # when the answers were read, None for columns made in process
+        self.built_at = built_at
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Maps the columns saved in directory into memory.
+        """
+        with open(os.path.join(directory, 'answers.json')) as f:
+            meta = json.load(f)
+        columns = {}
+        for name in meta['columns']:
+            if meta['size']:
+                columns[name] = numpy.memmap(
+                    os.path.join(directory, name + '.i32'),
+                    dtype=numpy.intc, mode='r')
+            else:
+                columns[name] = numpy.zeros(0, dtype=numpy.intc)
+        return cls(columns, meta['answers'], meta.get('built_at'))
+
+    def is_stale(self, max_age):
+        """
+        Whether the answers were read more than max_age seconds ago, and
+        so miss the stories saved since.
+        """
+        return self.built_at is not None and \
+            time.time() - self.built_at > max_age
+
+    def mask(self, filters=None, start_date=None, end_date=None):
+        """
+        The answers matching filters, {column: value or list of values},
+        and visited from start_date to end_date, both days included, as a
+        boolean array.
+        """
+        mask = numpy.ones(self.size, dtype=bool)
+        for name, value in (filters or {}).items():
+            if value is None:
+                continue
+            column = self.columns[name]
+            if isinstance(value, (list, tuple, set)):
+                mask &= numpy.in1d(
+                    column, numpy.array(list(value), dtype=column.dtype))
+            else:
+                mask &= column == int(value)
+        if start_date is not None:
+            mask &= self.columns['day'] >= to_day_number(start_date)
+        if end_date is not None:
+            mask &= self.columns['day'] <= to_day_number(end_date)
+        return mask
+
+    def answer_counts(self, mask, questions=None):
+        """
+        {question: {text: count}} of the answers in mask, for questions or
+        all of them.
+        """
+        if questions is not None:
+            mask = mask & numpy.in1d(
+                self.columns['question'],
+                numpy.array(list(questions), dtype=numpy.intc))
+        counts = numpy.bincount(
+            self.columns['answer'][mask], minlength=len(self.answers))
+        options = defaultdict(dict)
+        for code in numpy.flatnonzero(counts):
+            question, text = self.answers[code]
+            options[question][text] = int(counts[code])
+        return options
+
+    def story_count(self, mask):
+        return numpy.unique(self.columns['story'][mask]).size
+
+    def group_counts(self, mask, name):
+        """
+        Number of answers in mask per value of column name.
+        """
+        values, counts = numpy.unique(
+            self.columns[name][mask], return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+    def resolve(self, filters):
+        """
+        Turns story filters, as taken by stories.volumes, into column
+        filters, looking up the ids of the names given.
+        """
+        columns = {}
+        for name, value in filters.items():
+            if not value:
+                continue
+            column, model = FILTER_COLUMNS[name]
+            if model is not None:
+                value = list(model.objects.filter(
+                    name=value).values_list('id', flat=True))
+            columns[column] = value
+        return columns
+
+
+class StoredAnswerColumns(DataEpochCache):
+    """
+    The answer columns build_answer_columns saved, mapped in the worker
+    process and again when the data epoch changes. None without numpy or
+    STORY_ANSWER_COLUMNS_DIR, or before the first build.
+    """
+
+    def build(self):
+        directory = settings.STORY_ANSWER_COLUMNS_DIR
+        if numpy is None or not directory or \
+                not os.path.exists(os.path.join(directory, 'answers.json')):
+            return None
+        return AnswerColumns.load(directory)
+
+
+answer_columns = StoredAnswerColumns()
+
+
+def stored_answer_counts(filters, start_date=None, end_date=None,
+                         questions=None):
+    """
+    {question: {text: count}} of the answers to questions, or all of them,
+    of the stories matching filters (stories.volumes.FILTERS keys) from
+    start_date to end_date, both days included, from the stored columns.
+    None when they are not built, numpy is missing, or they are older
+    than STORY_ANSWER_COLUMNS_MAX_AGE: they miss the stories saved since
+    the last build_answer_columns.
+    """
+    columns = answer_columns.get()
+    if columns is None or \
+            columns.is_stale(settings.STORY_ANSWER_COLUMNS_MAX_AGE):
+        return None
+    mask = columns.mask(columns.resolve(filters), start_date, end_date)
+    return columns.answer_counts(mask, questions)
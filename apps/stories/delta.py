@@ -0,0 +1,146 @@
+from collections import defaultdict
+
+from django.db import connection
+from rest_framework.exceptions import ParseError
+
+from common.pagination import encode_cursor, decode_cursor, keyset_filter
+
+from .models import Answer, Questiongroup, QuestiongroupQuestions, SyncDeletion
+
+# rows per page when the device asks for none
+PAGE_SIZE = 1000
+
+ORDERING = ('change_seq', 'id')
+
+# (field name sent, lookup)
+STORY_FIELDS = (
+    ('id', 'id'),
+    ('date_of_visit', 'date_of_visit'),
+    ('school', 'school'),
+    ('group', 'group'),
+    ('user_type', 'user_type__name'),
+    ('user', 'user'),
+)
+
+QUESTIONGROUP_FIELDS = (
+    ('id', 'id'),
+    ('source', 'source__name'),
+    ('survey', 'survey'),
+    ('version', 'version'),
+    ('status', 'status'),
+    ('start_date', 'start_date'),
+    ('end_date', 'end_date'),
+)
+
+
+def watermark():
+    """
+    The oldest transaction still running: every change made by an older
+    one is committed, so a delta up to it misses none.
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+    return cursor.fetchone()[0]
+
+
+def parse_token(token):
+    """
+    (position, floor, start) of a since token. Empty for a first, full
+    sync. A token at the end of a listing is [seq]; one in the middle is
+    [seq, id, floor, start], the position reached, the watermark taken
+    and the seq started from when the listing began.
+    """
+    if not token:
+        return (0, 0), None, None
+    values = decode_cursor(token)
+    if not isinstance(values, list) or len(values) not in (1, 4) or \
+            not all(isinstance(value, (int, long)) for value in values):
+        raise ParseError("Invalid since token.")
+    if len(values) == 1:
+        return (values[0], 0), None, values[0]
+    return tuple(values[:2]), values[2], values[3]
+
+
+def story_rows(stories):
+    """
+    The stories as lists of STORY_FIELDS values, with their answers as
+    {question id: text} last, in two queries.
+    """
+    rows = [list(row) for row in stories.values_list(
+        *[lookup for name, lookup in STORY_FIELDS])]
+    answers = defaultdict(dict)
+    for story_id, question_id, text in Answer.objects.filter(
+            story__in=[row[0] for row in rows]).values_list(
+                'story', 'question', 'text'):
+        answers[story_id][question_id] = text
+    for row in rows:
+        row.append(answers[row[0]])
+    return rows
+
+
+def questiongroup_rows(questiongroups):
+    rows = [list(row) for row in questiongroups.values_list(
+        *[lookup for name, lookup in QUESTIONGROUP_FIELDS])]
+    questions = defaultdict(list)
+    for group_id, question_id in QuestiongroupQuestions.objects.filter(
+            questiongroup__in=[row[0] for row in rows]).order_by(
+                'sequence', 'question').values_list(
+                    'questiongroup', 'question'):
+        questions[group_id].append(question_id)
+    for row in rows:
+        row.append(questions[row[0]])
+    return rows
+
+
+def changes(stories, token=None, page_size=PAGE_SIZE):
+    """
+    The stories among stories changed since token, a page of them at a
+    time in change order, and a new token to ask for the next. The first
+    page of each sync also has the questiongroups changed and, after the
+    first sync, the stories and questiongroups deleted.
+
+    Rows are lists of the field names given once. Changes are listed up
+    to the watermark taken when a sync begins, so a few rows changed while
+    it runs may be sent twice, but none are missed.
+    """
+    position, floor, start = parse_token(token)
+    first_page = floor is None
+    if first_page:
+        floor = watermark()
+
+    page = list(stories.order_by(*ORDERING).filter(
+        keyset_filter(ORDERING, position)
+    ).values_list(*ORDERING)[:page_size + 1])
+    more = len(page) > page_size
+    page = page[:page_size]
+
+    response = {
+        'more': more,
+        'stories': {
+            'fields': [name for name, lookup in STORY_FIELDS] + ['answers'],
+            'rows': story_rows(stories.model.objects.filter(
+                id__in=[story_id for seq, story_id in page]).order_by(
+                    *ORDERING)),
+        },
+    }
+    if more:
+        seq, story_id = page[-1]
+        response['token'] = encode_cursor([seq, story_id, floor, start or 0])
+    else:
+        response['token'] = encode_cursor([floor])
+
+    if first_page:
+        questiongroups = Questiongroup.objects.filter(
+            change_seq__gte=start or 0)
+        response['questiongroups'] = {
+            'fields': [name for name, lookup in QUESTIONGROUP_FIELDS] +
+            ['questions'],
+            'rows': questiongroup_rows(questiongroups.order_by('id')),
+        }
+        deleted = defaultdict(list)
+        if start is not None:
+            for model, object_id in SyncDeletion.objects.filter(
+                    change_seq__gte=start).values_list('model', 'object_id'):
+                deleted[model].append(object_id)
+        response['deleted'] = dict(deleted)
+    return response
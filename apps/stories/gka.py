@@ -1,3 +1,5 @@
+import datetime
+
 from django.db.models import Q
 from django.db.models import Count
 from django.contrib.auth.models import Group
@@ -9,6 +11,7 @@ from schools.models import (
     Boundary,
     BoundaryHierarchy
 )
+from .columnar import stored_answer_counts
 from .models import Story, Survey
 
 GKA_DISTRICTS = [445, 416, 424, 417, 419, 418]
@@ -53,6 +56,8 @@ class GKA(object):
     }
     
     def __init__(self, start_date, end_date):
+        self.start_date = start_date
+        self.end_date = end_date
         self.stories = Story.objects.all()
         self.assessments = AssessmentsV2.objects.all()
         if start_date:
@@ -63,8 +68,9 @@ class GKA(object):
                 assessed_ts__gte=start_date,
             )
         if end_date:
+            # the whole day, as the answer columns count it
             self.stories = self.stories.filter(
-                date_of_visit__lte=end_date,
+                date_of_visit__lt=end_date + datetime.timedelta(days=1),
             )
             self.assessments = self.assessments.filter(
                 assessed_ts__lte=end_date,
@@ -189,7 +195,17 @@ class GKA(object):
             ).order_by('questiongroupquestions__sequence')[:20])
 
         competencies = {}
+        counts = None
+        level = boundary.get_admin_level()
+        if level:
+            counts = stored_answer_counts(
+                {'survey': survey.name, 'admin%d' % level: boundary.id},
+                self.start_date, self.end_date,
+                [question.id for question in questions])
         for question in questions:
+            if counts is not None:
+                competencies[question.text] = counts.get(question.id, {})
+                continue
             list_of_answers = question.answer_set.filter(
                 story__in=stories
             ).values('text').annotate(answer_count=Count('text'))
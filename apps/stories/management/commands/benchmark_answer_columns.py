@@ -0,0 +1,135 @@
+import datetime
+import time
+from collections import Counter, defaultdict
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from stories.columnar import AnswerColumns, numpy, to_day_number
+
+QUESTIONS = 60
+TEXTS = ('Yes', 'No', 'Don\'t know', '1', '2', '3')
+
+FIRST_DAY = datetime.date(2014, 6, 1)
+LAST_DAY = datetime.date(2017, 5, 31)
+
+# (name, column filters, from, to)
+QUERIES = (
+    ('all answers', {}, None, None),
+    ('one source', {'source': 2}, None, None),
+    ('one district in a year', {'admin1': 7},
+        datetime.date(2015, 6, 1), datetime.date(2016, 5, 31)),
+    ('two sources in a block', {'source': [1, 3], 'admin2': 42}, None, None),
+)
+
+# the columns the Python counts look at, in row order
+ROW_COLUMNS = ('source', 'admin1', 'admin2', 'day', 'answer')
+
+
+class Command(BaseCommand):
+    help = """Times answer counts from the answer columns against counting
+            the same answers row by row in Python, on a synthetic dataset.
+
+            python manage.py benchmark_answer_columns [--answers=1000000] [--repeat=3]
+
+            Prints the best time of --repeat runs for each query and
+            whether both give the same counts. Needs numpy.
+            """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--answers', type='int', default=1000000,
+                    help='Number of synthetic answers'),
+        make_option('--repeat', type='int', default=3,
+                    help='Number of runs to take the best of'),
+        make_option('--seed', type='int', default=0,
+                    help='Seed of the synthetic dataset'),
+    )
+
+    def handle(self, *args, **options):
+        if numpy is None:
+            raise CommandError('The answer columns need numpy')
+
+        start = time.time()
+        columns, answers = self.synthetic(options['answers'], options['seed'])
+        engine = AnswerColumns(columns, answers)
+        rows = zip(*[columns[name].tolist() for name in ROW_COLUMNS])
+        print "%d answers of %d stories made in %.1fs" % (
+            engine.size, engine.story_count(engine.mask()), time.time() - start)
+
+        for name, filters, first, last in QUERIES:
+            columns_time, columns_counts = self.time(
+                options['repeat'],
+                lambda: engine.answer_counts(engine.mask(filters, first, last)))
+            python_time, python_counts = self.time(
+                options['repeat'],
+                lambda: self.count_rows(rows, answers, filters, first, last))
+            print "%s: columns %.3fs, python %.3fs (%.1fx), %s" % (
+                name, columns_time, python_time,
+                python_time / columns_time if columns_time else 0,
+                'same counts' if dict(columns_counts) == python_counts
+                else 'COUNTS DIFFER'
+            )
+
+    def synthetic(self, size, seed):
+        """
+        size answers of about ten answers per story, each story at one of
+        40000 schools on a day in three years.
+        """
+        random = numpy.random.RandomState(seed)
+        stories = max(size // 10, 1)
+        story = numpy.sort(random.randint(0, stories, size))
+
+        school = random.randint(0, 40000, stories)[story]
+        source = random.randint(1, 6, stories)[story]
+        day = random.randint(to_day_number(FIRST_DAY),
+                             to_day_number(LAST_DAY) + 1, stories)[story]
+        question = random.randint(1, QUESTIONS + 1, size)
+        option = random.randint(0, len(TEXTS), size)
+
+        columns = {
+            'story': story,
+            'school': school,
+            'admin3': school // 10,
+            'admin2': school // 200,
+            'admin1': school // 1300,
+            'school_type': 1 + school % 2,
+            'source': source,
+            'group': source,
+            'day': day,
+            'question': question,
+            'answer': (question - 1) * len(TEXTS) + option,
+        }
+        answers = [(q, text) for q in range(1, QUESTIONS + 1) for text in TEXTS]
+        return dict((name, values.astype(numpy.intc))
+                    for name, values in columns.items()), answers
+
+    def count_rows(self, rows, answers, filters, first, last):
+        checks = []
+        for name, value in filters.items():
+            values = set(value) if isinstance(value, list) else set([value])
+            checks.append((ROW_COLUMNS.index(name), values))
+        first = to_day_number(first) if first else None
+        last = to_day_number(last) if last else None
+
+        codes = Counter()
+        for row in rows:
+            if first is not None and row[3] < first:
+                continue
+            if last is not None and row[3] > last:
+                continue
+            if all(row[i] in values for i, values in checks):
+                codes[row[4]] += 1
+
+        options = defaultdict(dict)
+        for code, count in codes.items():
+            question, text = answers[code]
+            options[question][text] = count
+        return dict(options)
+
+    def time(self, repeat, count):
+        best = None
+        for i in range(repeat):
+            start = time.time()
+            result = count()
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best, result
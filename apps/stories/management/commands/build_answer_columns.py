@@ -0,0 +1,36 @@
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from common.utils import bump_data_epoch
+from stories.columnar import fetch_columns, save_columns
+
+
+class Command(BaseCommand):
+    help = """Saves the story answers as columns for StoryDetailView to
+            count answers in process (stories.columnar, which needs numpy).
+            Run after rebuild_story_facts; the web processes map the new
+            columns once the data epoch is bumped at the end.
+
+            python manage.py build_answer_columns [--dir=/path/to/columns]
+
+            Does nothing unless STORY_ANSWER_COLUMNS_DIR is set or --dir
+            is given.
+            """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--dir', dest='directory',
+                    default=settings.STORY_ANSWER_COLUMNS_DIR,
+                    help='Where to save the columns'),
+    )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not directory:
+            print "STORY_ANSWER_COLUMNS_DIR is not set, nothing to build"
+            return
+
+        columns, answers = fetch_columns()
+        save_columns(directory, columns, answers)
+        print "%d answers, %d distinct, saved in %s" % (
+            len(columns['answer']), len(answers), directory)
+        bump_data_epoch()
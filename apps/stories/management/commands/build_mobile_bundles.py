@@ -0,0 +1,37 @@
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from stories.bundles import build_bundles, district_ids
+
+
+class Command(BaseCommand):
+    help = """Builds the gzipped per district data bundles the mobile app
+            downloads on install and re-sync instead of paging through the
+            boundary, school and questiongroup lists, and their manifest.
+
+            python manage.py build_mobile_bundles [--root=<dir>]
+                [--districts=1,2] [--force]
+
+            Bundles are only rebuilt when the data epoch, questiongroups or
+            questions changed since they were built, unless --force. Run
+            after imports, once the data epoch is bumped.
+            """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--root', default=settings.MOBILE_BUNDLE_DIR,
+                    help='Directory to write the bundles to'),
+        make_option('--districts',
+                    help='Comma separated ids of the districts to build'),
+        make_option('--force', action='store_true', default=False,
+                    help='Rebuild bundles whose inputs did not change'),
+    )
+
+    def handle(self, *args, **options):
+        if options['districts']:
+            ids = [int(i) for i in options['districts'].split(',')]
+        else:
+            ids = district_ids()
+
+        changed = build_bundles(options['root'], ids, options['force'])
+        print "%d of %d district bundles changed in %s" % (
+            len(changed), len(ids), options['root'])
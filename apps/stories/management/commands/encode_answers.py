@@ -0,0 +1,82 @@
+from optparse import make_option
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+from stories.models import Answer, AnswerOption, Question
+
+# codes for the answers no option has yet, the most given first
+NEW_OPTIONS = """
+    INSERT INTO stories_answeroption (question_id, text, code)
+    SELECT question_id, text, code FROM (
+        SELECT t.question_id, t.text,
+            coalesce(o.last, 0) + row_number() OVER (
+                PARTITION BY t.question_id ORDER BY t.answers DESC, t.text
+            ) AS code
+        FROM (
+            SELECT a.question_id, a.text, count(*) AS answers
+            FROM stories_answer a
+            WHERE NOT EXISTS (
+                SELECT 1 FROM stories_answeroption o
+                WHERE o.question_id = a.question_id AND o.text = a.text
+            )
+            GROUP BY a.question_id, a.text
+        ) t
+        LEFT JOIN (
+            SELECT question_id, max(code) AS last
+            FROM stories_answeroption GROUP BY question_id
+        ) o ON o.question_id = t.question_id
+    ) new
+    WHERE code <= %s
+"""
+
+ENCODE = """
+    UPDATE stories_answer a SET code = o.code
+    FROM stories_answeroption o
+    WHERE o.question_id = a.question_id AND o.text = a.text
+    AND a.id >= %s AND a.id < %s
+    AND a.code IS DISTINCT FROM o.code
+"""
+
+
+class Command(BaseCommand):
+    help = """Fills the answer options of every question and sets the code of
+            the existing answers from them. Answers saved since the code
+            column was added are coded as they are written; run this once
+            after migrating, and after bulk loads done in SQL.
+
+            python manage.py encode_answers [--batch-size=50000]
+            """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', dest='batch_size', type='int',
+                    default=50000,
+                    help='Number of answer ids updated at a time'),
+    )
+
+    def handle(self, *args, **options):
+        # the options questions list keep their order
+        for question in Question.objects.filter(
+                id__in=Answer.objects.values('question')):
+            AnswerOption.seed(question)
+
+        cursor = connection.cursor()
+        with transaction.atomic():
+            cursor.execute(NEW_OPTIONS, [AnswerOption.MAX_CODE])
+        print "%d answer options added" % cursor.rowcount
+
+        first = Answer.objects.order_by('id').values_list('id', flat=True)[:1]
+        last = Answer.objects.order_by('-id').values_list('id', flat=True)[:1]
+        if not first:
+            return
+
+        total = 0
+        batch_size = options['batch_size']
+        for start in range(first[0], last[0] + 1, batch_size):
+            with transaction.atomic():
+                cursor.execute(ENCODE, [start, start + batch_size])
+                total += cursor.rowcount
+            print "%d/%d answer ids" % (
+                min(start + batch_size, last[0] + 1) - first[0],
+                last[0] + 1 - first[0])
+
+        print "%d answers coded, %d left without a code" % (
+            total, Answer.objects.filter(code=None).count())
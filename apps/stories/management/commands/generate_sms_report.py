@@ -12,6 +12,8 @@ from stories.models import (
     Question, Questiongroup, QuestionType, 
     QuestiongroupQuestions, Source, UserType,
     Story, Answer)
+from stories.api_views import get_que_and_ans_by_source
+from stories.columnar import stored_answer_counts
 
 from optparse import make_option
 from collections import OrderedDict
@@ -374,39 +376,12 @@ Usage:
         #print response_json
         return response_json
     
-    def get_que_and_ans(self, stories, source, school_type):
-        response_list = []
-        questions = Question.objects.all().select_related('question_type')
-
-        if source:
-            questions = questions.filter(
-                questiongroup__source__name=source)
-
-        if school_type:
-            questions = questions.filter(
-                school_type__name=school_type)
-
-        #print questions.count()
-        for question in questions.distinct('id'):
-            j = {}
-            j['question'] = {}
-            j['question']['key'] = question.key
-            j['question']['text'] = question.text
-            j['question']['display_text'] = question.display_text
-            j['answers'] = {}
-            j['answers']['question_type'] = question.question_type.name
-
-            answer_counts = question.answer_set.filter(
-                story__in=stories
-            ).values('text').annotate(answer_count=Count('text'))
-
-            options = {}
-            for count in answer_counts:
-                options[count['text']] = count['answer_count']
-            j['answers']['options'] = options
-            response_list.append(j)
-
-        return response_list
+    def get_que_and_ans(self, stories, source, school_type, counts=None):
+        # all the questions of the source, not only the featured ones
+        return get_que_and_ans_by_source(
+            stories, [source] if source else None, school_type, None,
+            featured=False, counts=counts
+        )[source or None]
 
 
     def get_story_details(self, boundary_id, boundary_type, start_date, end_date):
@@ -441,6 +416,15 @@ Usage:
             stories = stories.filter(date_of_visit__gte=start_date)
 
         if end_date:
-            stories = stories.filter(date_of_visit__lte=end_date)
-        response_json = self.get_que_and_ans(stories, source, school_type)
+            # the whole day, as the answer columns count it
+            stories = stories.filter(
+                date_of_visit__lt=end_date + timedelta(days=1))
+        counts = stored_answer_counts({
+            'source': source,
+            'school_type': school_type,
+            'admin1': admin1_id,
+            'admin2': admin2_id,
+        }, start_date, end_date)
+        response_json = self.get_que_and_ans(
+            stories, source, school_type, counts)
         return response_json
@@ -1,5 +1,6 @@
+from django.db import transaction
 from django.core.management.base import BaseCommand
-from stories.models import Story
+from stories.models import Story, StoryFact
 
 
 class Command(BaseCommand):
@@ -8,7 +9,11 @@ class Command(BaseCommand):
     
     ./manage.py mark_sys_verified"""
 
+    @transaction.atomic
     def handle(self, *args, **options):
         stories_qset = Story.objects.exclude(group__source__name='web')
+        ids = list(stories_qset.values_list('id', flat=True))
         updated = stories_qset.update(is_verified=True)
+        # update() sends no post_save to keep the story facts current
+        StoryFact.refresh(ids)
         print "%d Stories Updated" % updated
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from stories.models import Questiongroup, QuestiongroupFingerprint
+
+
+class Command(BaseCommand):
+    help = """Rehashes every questiongroup for the fingerprint checks of the
+            mobile app. Saves keep the fingerprints current; run this after
+            the Kannada translations or questions change outside of the
+            application, e.g. on deploy or after edits in SQL.
+
+            python manage.py rebuild_questiongroup_fingerprints
+            """
+
+    def handle(self, *args, **options):
+        fingerprints = QuestiongroupFingerprint.refresh(
+            Questiongroup.objects.values_list('id', flat=True))
+        print "%d questiongroup fingerprints written" % len(fingerprints)
@@ -0,0 +1,46 @@
+from optparse import make_option
+from django.db import transaction
+from django.core.management.base import BaseCommand
+from stories import summaries
+from stories.models import Story, StoryFact, StoryDailyVolume
+
+
+class Command(BaseCommand):
+    help = """Rebuilds the story fact table the story dashboards count
+            from, and the daily volumes and summaries rolled up from it. Stories
+            keep both current when saved; run this after imports, once the
+            materialized views are refreshed, as schools may have moved
+            boundaries or constituencies.
+
+            python manage.py rebuild_story_facts [--stories=1,2] [--batch-size=5000]
+            """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--stories',
+                    help='Comma separated ids of the stories to rebuild'),
+        make_option('--batch-size', dest='batch_size', type='int', default=5000,
+                    help='Number of stories rebuilt at a time'),
+    )
+
+    def handle(self, *args, **options):
+        if options['stories']:
+            ids = sorted(int(i) for i in options['stories'].split(','))
+        else:
+            ids = sorted(Story.objects.values_list('id', flat=True))
+
+        # with all the stories, the volumes and summaries are rolled up once
+        # at the end
+        rollup = bool(options['stories'])
+        total = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(ids), batch_size):
+            with transaction.atomic():
+                total += StoryFact.refresh(ids[start:start + batch_size],
+                                           rollup=rollup)
+            print "%d/%d stories" % (min(start + batch_size, len(ids)), len(ids))
+
+        if not rollup:
+            with transaction.atomic():
+                StoryDailyVolume.rebuild()
+                summaries.rebuild()
+        print "%d story facts written" % total
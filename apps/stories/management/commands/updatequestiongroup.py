@@ -3,7 +3,7 @@ import datetime
 from django.db import transaction
 from django.core.management.base import BaseCommand
 
-from stories.models import Questiongroup, Story
+from stories.models import Questiongroup, Story, StoryFact
 
 class Command(BaseCommand):
     args = ""
@@ -40,7 +40,10 @@ class Command(BaseCommand):
             date_of_visit__lt=earliest_allowed_date
         )
         new_date = datetime.datetime.strptime('2014-06-01', '%Y-%m-%d')
+        ids = list(v2_ancient_stories.values_list('id', flat=True))
         v2_ancient_stories.update(date_of_visit=new_date)
+        # update() sends no post_save to keep the story facts current
+        StoryFact.refresh(ids)
 
         q_groups = Questiongroup.objects.all()
         for q in q_groups:
@@ -1,7 +1,7 @@
 from django.db import transaction
 from django.core.management.base import BaseCommand
 
-from stories.models import UserType, Story
+from stories.models import UserType, Story, StoryFact
 
 class Command(BaseCommand):
     args = ""
@@ -15,6 +15,9 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         volunteer = UserType.objects.get_or_create(name=UserType.VOLUNTEER)[0]
         akshara_staff = UserType.objects.get_or_create(name=UserType.AKSHARA_STAFF)[0]
+        ids = list(Story.objects.filter(
+            group__source__name__in=['web', 'ivrs']
+        ).values_list('id', flat=True))
         count = Story.objects.filter(
             group__source__name='web'
         ).update(user_type=volunteer)
@@ -23,6 +26,8 @@ class Command(BaseCommand):
             group__source__name='ivrs'
         ).update(user_type=akshara_staff)
         print str(count) + " IVRS records updated"
+        # update() sends no post_save to keep the story facts current
+        StoryFact.refresh(ids)
         Story.objects.filter(
             school__admin3__type__name='PreSchool', group__source__name="community"
         ).delete()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0023_schoolprofile'),
+        ('stories', '0022_auto_20170427_2321'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoryFact',
+            fields=[
+                ('story', models.OneToOneField(related_name='fact', primary_key=True, serialize=False, to='stories.Story')),
+                ('version', models.IntegerField(null=True, blank=True)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('date_of_visit', models.DateTimeField(db_index=True)),
+                ('month', models.DateField()),
+                ('admin1', models.ForeignKey(related_name='+', blank=True, to='schools.Boundary', null=True)),
+                ('admin2', models.ForeignKey(related_name='+', blank=True, to='schools.Boundary', null=True)),
+                ('admin3', models.ForeignKey(related_name='+', blank=True, to='schools.Boundary', null=True)),
+                ('assembly', models.ForeignKey(related_name='+', blank=True, to='schools.Assembly', null=True)),
+                ('group', models.ForeignKey(related_name='+', to='stories.Questiongroup')),
+                ('parliament', models.ForeignKey(related_name='+', blank=True, to='schools.Parliament', null=True)),
+                ('school', models.ForeignKey(related_name='+', to='schools.School')),
+                ('school_type', models.ForeignKey(related_name='+', blank=True, to='schools.BoundaryType', null=True)),
+                ('source', models.ForeignKey(related_name='+', to='stories.Source')),
+                ('survey', models.ForeignKey(related_name='+', blank=True, to='stories.Survey', null=True)),
+                ('user_type', models.ForeignKey(related_name='+', blank=True, to='stories.UserType', null=True)),
+            ],
+            options={
+                'db_table': 'stories_storyfact',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterIndexTogether(
+            name='storyfact',
+            index_together=set([('admin3', 'month'), ('admin1', 'month'), ('source', 'month'), ('admin2', 'month')]),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0023_schoolprofile'),
+        ('stories', '0023_storyfact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoryDailyVolume',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('day', models.DateField()),
+                ('version', models.IntegerField(null=True, blank=True)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('count', models.IntegerField()),
+                ('admin1', models.ForeignKey(related_name='+', blank=True, to='schools.Boundary', null=True)),
+                ('admin2', models.ForeignKey(related_name='+', blank=True, to='schools.Boundary', null=True)),
+                ('admin3', models.ForeignKey(related_name='+', blank=True, to='schools.Boundary', null=True)),
+                ('assembly', models.ForeignKey(related_name='+', blank=True, to='schools.Assembly', null=True)),
+                ('group', models.ForeignKey(related_name='+', to='stories.Questiongroup')),
+                ('parliament', models.ForeignKey(related_name='+', blank=True, to='schools.Parliament', null=True)),
+                ('school_type', models.ForeignKey(related_name='+', blank=True, to='schools.BoundaryType', null=True)),
+                ('source', models.ForeignKey(related_name='+', to='stories.Source')),
+                ('survey', models.ForeignKey(related_name='+', blank=True, to='stories.Survey', null=True)),
+                ('user_type', models.ForeignKey(related_name='+', blank=True, to='stories.UserType', null=True)),
+            ],
+            options={
+                'db_table': 'stories_storydailyvolume',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterIndexTogether(
+            name='storydailyvolume',
+            index_together=set([('admin3', 'day'), ('admin1', 'day'), ('source', 'day'), ('admin2', 'day')]),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0023_schoolprofile'),
+        ('stories', '0024_storydailyvolume'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorySummary',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('period', models.CharField(max_length=5, choices=[('month', 'Month'), ('day', 'Day')])),
+                ('start', models.DateField()),
+                ('metric', models.CharField(max_length=150)),
+                ('count', models.IntegerField()),
+                ('boundary', models.ForeignKey(related_name='+', blank=True, to='schools.Boundary', null=True)),
+                ('school_type', models.ForeignKey(related_name='+', blank=True, to='schools.BoundaryType', null=True)),
+                ('source', models.ForeignKey(related_name='+', to='stories.Source')),
+            ],
+            options={
+                'db_table': 'stories_storysummary',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterIndexTogether(
+            name='storysummary',
+            index_together=set([('boundary', 'school_type', 'period', 'start')]),
+        ),
+        migrations.CreateModel(
+            name='StorySummaryStale',
+            fields=[
+                ('day', models.DateField(serialize=False, primary_key=True)),
+            ],
+            options={
+                'db_table': 'stories_storysummarystale',
+            },
+            bases=(models.Model,),
+        ),
+    ]
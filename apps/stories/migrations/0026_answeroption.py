@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0025_storysummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerOption',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('text', models.TextField()),
+                ('code', models.SmallIntegerField()),
+                ('question', models.ForeignKey(related_name='answer_options', to='stories.Question')),
+            ],
+            options={
+                'db_table': 'stories_answeroption',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='answeroption',
+            unique_together=set([('question', 'text'), ('question', 'code')]),
+        ),
+        migrations.RunSQL(
+            'ALTER TABLE stories_answer ADD COLUMN code smallint NULL',
+            'ALTER TABLE stories_answer DROP COLUMN code'
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX stories_answer_question_id_code ON stories_answer (question_id, code)',
+            'DROP INDEX stories_answer_question_id_code'
+        ),
+        # its leading column serves the lookups by question alone
+        migrations.RunSQL(
+            'DROP INDEX IF EXISTS stories_answer_question_id',
+            'CREATE INDEX stories_answer_question_id ON stories_answer (question_id)'
+        ),
+    ]
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0026_answeroption'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+            preserve_default=True,
+        ),
+        migrations.AlterIndexTogether(
+            name='story',
+            index_together=set([('change_seq', 'id')]),
+        ),
+        migrations.RunSQL(
+            'ALTER TABLE stories_questiongroup ADD COLUMN change_seq bigint NOT NULL DEFAULT 0'
+        ),
+        migrations.CreateModel(
+            name='SyncDeletion',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('change_seq', models.BigIntegerField(db_index=True)),
+            ],
+            options={
+                'db_table': 'stories_syncdeletion',
+            },
+            bases=(models.Model,),
+        ),
+        # the changed row takes the id of the transaction changing it
+        migrations.RunSQL("""
+            CREATE FUNCTION stories_set_change_seq() RETURNS trigger AS $$
+            BEGIN
+                NEW.change_seq := txid_current();
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        """),
+        migrations.RunSQL(
+            'CREATE TRIGGER stories_story_change_seq BEFORE INSERT OR UPDATE ON stories_story '
+            'FOR EACH ROW EXECUTE PROCEDURE stories_set_change_seq()'
+        ),
+        migrations.RunSQL(
+            'CREATE TRIGGER stories_questiongroup_change_seq BEFORE INSERT OR UPDATE ON stories_questiongroup '
+            'FOR EACH ROW EXECUTE PROCEDURE stories_set_change_seq()'
+        ),
+        # answers change their story, questions their questiongroup, once
+        # per transaction; only what a device syncs changes the story, not
+        # e.g. recoding the answers
+        migrations.RunSQL("""
+            CREATE FUNCTION stories_answer_changed() RETURNS trigger AS $$
+            BEGIN
+                UPDATE stories_story SET change_seq = txid_current()
+                WHERE id = CASE WHEN TG_OP = 'DELETE' THEN OLD.story_id ELSE NEW.story_id END
+                AND change_seq <> txid_current();
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """),
+        migrations.RunSQL(
+            'CREATE TRIGGER stories_answer_changed '
+            'AFTER INSERT OR DELETE OR UPDATE OF story_id, question_id, text ON stories_answer '
+            'FOR EACH ROW EXECUTE PROCEDURE stories_answer_changed()'
+        ),
+        migrations.RunSQL("""
+            CREATE FUNCTION stories_questiongroup_questions_changed() RETURNS trigger AS $$
+            BEGIN
+                UPDATE stories_questiongroup SET change_seq = txid_current()
+                WHERE id = CASE WHEN TG_OP = 'DELETE' THEN OLD.questiongroup_id ELSE NEW.questiongroup_id END
+                AND change_seq <> txid_current();
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """),
+        migrations.RunSQL(
+            'CREATE TRIGGER stories_questiongroup_questions_changed AFTER INSERT OR UPDATE OR DELETE '
+            'ON stories_questiongroup_questions '
+            'FOR EACH ROW EXECUTE PROCEDURE stories_questiongroup_questions_changed()'
+        ),
+        migrations.RunSQL("""
+            CREATE FUNCTION stories_sync_deleted() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO stories_syncdeletion (model, object_id, change_seq)
+                VALUES (TG_ARGV[0], OLD.id, txid_current());
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """),
+        migrations.RunSQL(
+            "CREATE TRIGGER stories_story_deleted AFTER DELETE ON stories_story "
+            "FOR EACH ROW EXECUTE PROCEDURE stories_sync_deleted('story')"
+        ),
+        migrations.RunSQL(
+            "CREATE TRIGGER stories_questiongroup_deleted AFTER DELETE ON stories_questiongroup "
+            "FOR EACH ROW EXECUTE PROCEDURE stories_sync_deleted('questiongroup')"
+        ),
+    ]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0027_change_seq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestiongroupFingerprint',
+            fields=[
+                ('questiongroup', models.OneToOneField(related_name='fingerprint', primary_key=True, serialize=False, to='stories.Questiongroup')),
+                ('content_hash', models.CharField(max_length=32)),
+                ('questions_hash', models.CharField(max_length=32, db_index=True)),
+                ('change_seq', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'stories_questiongroupfingerprint',
+            },
+            bases=(models.Model,),
+        ),
+    ]
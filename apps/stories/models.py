@@ -1,12 +1,17 @@
 from __future__ import unicode_literals
 
+import ast
+import json
+import hashlib
+
 from django.conf import settings
-from django.utils import timezone
+from django.utils import timezone, translation
 from django.dispatch import receiver
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, Max
 from django.contrib.gis.db import models
 from django.contrib.sites.models import Site
-from django.db.models.signals import post_save
+from django.db import connection, transaction, IntegrityError
+from django.db.models.signals import pre_save, post_save, post_delete
 
 from common.utils import send_templated_mail
 from common.models import BaseModel, GeoBaseModel, TimestampedBaseModel
@@ -16,6 +21,8 @@ class Answer(models.Model):
     text = models.TextField()
     story = models.ForeignKey('Story')
     question = models.ForeignKey('Question')
+    # the AnswerOption code of text, set whenever the answer is saved
+    code = models.SmallIntegerField(blank=True, null=True)
 
     def __unicode__(self):
         return ' - '.join([self.story.name, self.question.text, self.text])
@@ -25,6 +32,88 @@ class Answer(models.Model):
         db_table = 'stories_answer'
 
 
+class AnswerOption(models.Model):
+    """
+    The answers given to a question, each with a small code unique within
+    the question, so that answers can be stored and counted by code rather
+    than by text. The options a question lists come first, in its order;
+    other answers get the next free code the first time they are seen.
+    """
+    question = models.ForeignKey('Question', related_name='answer_options')
+    text = models.TextField()
+    code = models.SmallIntegerField()
+
+    # codes above are not given out, free text answers past it stay uncoded
+    MAX_CODE = 32767
+
+    # {(question id, text): code} of the committed options seen by this
+    # process, codes never change once given
+    codes = {}
+
+    class Meta:
+        db_table = 'stories_answeroption'
+        unique_together = (('question', 'text'), ('question', 'code'))
+
+    def __unicode__(self):
+        return "%s: %s = %s" % (self.question_id, self.code, self.text)
+
+    @classmethod
+    def listed(cls, question):
+        """
+        The options question lists, in order.
+        """
+        try:
+            options = ast.literal_eval(question.options or '[]')
+        except (ValueError, SyntaxError):
+            return []
+        if isinstance(options, basestring):
+            options = [options]
+        return [unicode(option) for option in options]
+
+    @classmethod
+    def seed(cls, question):
+        """
+        Gives codes to the options question lists that have none yet.
+        """
+        for text in cls.listed(question):
+            cls.encode(question.id, text, seed=False)
+
+    @classmethod
+    def encode(cls, question_id, text, seed=True):
+        """
+        The code of text among the answers to question_id, given it if new.
+        With seed, the question's listed options get theirs first. None
+        once the question has no free codes left.
+
+        Codes are only cached outside transactions: one read or given
+        inside may be rolled back, and its code given to another text.
+        """
+        key = (question_id, text)
+        if key in cls.codes:
+            return cls.codes[key]
+
+        options = cls.objects.filter(question=question_id)
+        if seed and not options.exists():
+            cls.seed(Question.objects.get(pk=question_id))
+
+        while True:
+            code = options.filter(text=text).values_list('code', flat=True)
+            if code:
+                if not connection.in_atomic_block:
+                    cls.codes[key] = code[0]
+                return code[0]
+            last = options.aggregate(last=Max('code'))['last'] or 0
+            if last >= cls.MAX_CODE:
+                return None
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        question_id=question_id, text=text, code=last + 1)
+            except IntegrityError:
+                # the text or the code was taken by another writer, look again
+                continue
+
+
 class Question(models.Model):
     text = models.TextField()
     data_type = models.IntegerField()
@@ -80,6 +169,8 @@ class Questiongroup(TimestampedBaseModel):
         blank=True,
         null=True
     )
+    # set by a trigger, see Story.change_seq
+    change_seq = models.BigIntegerField(default=0, editable=False)
     questions = models.ManyToManyField(
         'Question',
         through='QuestiongroupQuestions'
@@ -196,10 +287,16 @@ class Story(TimestampedBaseModel):
     comments = models.CharField(max_length=2000, blank=True)
     sysid = models.IntegerField(blank=True, null=True)
 
+    # the id of the last transaction that changed the story or its answers,
+    # set by database triggers so that bulk and SQL writes count too; what
+    # stories.delta lists changes by
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
     class Meta:
         db_table = 'stories_story'
         verbose_name_plural = 'Stories'
         ordering = ['-date_of_visit']
+        index_together = (('change_seq', 'id'),)
 
     def get_geometry(self):
         return self.school.get_geometry() or None
@@ -208,6 +305,139 @@ class Story(TimestampedBaseModel):
         return "%s: %s at %s" % (self.email, self.school.name, self.created_at,)
 
 
+class QuestiongroupFingerprint(models.Model):
+    """
+    Hashes of what a questiongroup is, so that devices can find out which
+    of the groups they hold changed by sending their hashes, and so that a
+    group with the same questions can be found in one query.
+
+    content_hash covers the group, its questions in order with their
+    options and Kannada texts: it is the md5 of the document devices get.
+    questions_hash only covers the set of question ids. Kept current on
+    saves, and on use for groups whose change_seq moved since.
+    """
+    questiongroup = models.OneToOneField(
+        'Questiongroup', primary_key=True, related_name='fingerprint')
+    content_hash = models.CharField(max_length=32)
+    questions_hash = models.CharField(max_length=32, db_index=True)
+    # the questiongroup's change_seq when hashed
+    change_seq = models.BigIntegerField()
+
+    class Meta:
+        db_table = 'stories_questiongroupfingerprint'
+
+    def __unicode__(self):
+        return "%s: %s" % (self.questiongroup_id, self.content_hash)
+
+    @classmethod
+    def documents(cls, group_ids):
+        """
+        {group id: document} of group_ids, in two queries, the questions
+        listed in order with their text in Kannada as text_kn.
+        """
+        documents = {}
+        for row in Questiongroup.objects.filter(id__in=group_ids).values(
+                'id', 'version', 'status', 'source__name', 'survey',
+                'school_type', 'start_date', 'end_date'):
+            row['source'] = row.pop('source__name')
+            for field in ('start_date', 'end_date'):
+                if row[field] is not None:
+                    row[field] = row[field].isoformat()
+            row['questions'] = []
+            documents[row['id']] = row
+
+        with translation.override('kn'):
+            for row in QuestiongroupQuestions.objects.filter(
+                    questiongroup__in=group_ids).order_by(
+                        'questiongroup', 'sequence', 'question').values(
+                    'questiongroup', 'sequence', 'question',
+                    'question__key', 'question__text',
+                    'question__display_text', 'question__options',
+                    'question__question_type__name'):
+                documents[row['questiongroup']]['questions'].append({
+                    'id': row['question'],
+                    'sequence': row['sequence'],
+                    'key': row['question__key'],
+                    'text': row['question__text'],
+                    'text_kn': translation.ugettext(row['question__text']),
+                    'display_text': row['question__display_text'],
+                    'options': row['question__options'],
+                    'question_type': row['question__question_type__name'],
+                })
+        return documents
+
+    @classmethod
+    def hash_questions(cls, question_ids):
+        return hashlib.md5(json.dumps(sorted(set(question_ids)))).hexdigest()
+
+    @classmethod
+    def refresh(cls, group_ids):
+        """
+        Rehashes group_ids, those of groups that no longer exist are
+        removed. Returns {group id: fingerprint}.
+        """
+        group_ids = list(group_ids)
+        if not group_ids:
+            return {}
+        change_seqs = dict(Questiongroup.objects.filter(
+            id__in=group_ids).values_list('id', 'change_seq'))
+
+        fingerprints = {}
+        for group_id, document in cls.documents(group_ids).items():
+            fingerprints[group_id] = cls(
+                questiongroup_id=group_id,
+                content_hash=hashlib.md5(
+                    json.dumps(document, sort_keys=True)).hexdigest(),
+                questions_hash=cls.hash_questions(
+                    question['id'] for question in document['questions']),
+                change_seq=change_seqs[group_id],
+            )
+        cls.objects.filter(questiongroup__in=group_ids).delete()
+        cls.objects.bulk_create(fingerprints.values())
+        return fingerprints
+
+    @classmethod
+    def current(cls, questiongroups=None):
+        """
+        {group id: content hash} of questiongroups, or all of them, in one
+        query, rehashing first those changed since they were hashed.
+        """
+        if questiongroups is None:
+            questiongroups = Questiongroup.objects.all()
+        hashes = {}
+        stale = []
+        for group_id, change_seq, hashed_seq, content_hash in \
+                questiongroups.values_list(
+                    'id', 'change_seq', 'fingerprint__change_seq',
+                    'fingerprint__content_hash').order_by():
+            if hashed_seq != change_seq:
+                stale.append(group_id)
+            else:
+                hashes[group_id] = content_hash
+        for group_id, fingerprint in cls.refresh(stale).items():
+            hashes[group_id] = fingerprint.content_hash
+        return hashes
+
+
+class SyncDeletion(models.Model):
+    """
+    A story or questiongroup deleted, recorded by a trigger so that delta
+    syncs can tell devices to drop it.
+    """
+    STORY = 'story'
+    QUESTIONGROUP = 'questiongroup'
+
+    model = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    change_seq = models.BigIntegerField(db_index=True)
+
+    class Meta:
+        db_table = 'stories_syncdeletion'
+
+    def __unicode__(self):
+        return "%s %s" % (self.model, self.object_id)
+
+
 @receiver(post_save, sender=Story)
 def story_updated(sender, instance=None, created=False, **kwargs):
     if not created:
@@ -230,6 +460,304 @@ def story_updated(sender, instance=None, created=False, **kwargs):
     )
 
 
+class StoryFact(models.Model):
+    """
+    One row per story with what the dashboards filter and group stories by,
+    resolved from its school, questiongroup and the school's boundaries and
+    constituencies, so that story counts need no joins.
+
+    Kept current when stories are saved; writers changing stories with
+    update(), which sends no signals, refresh the facts themselves.
+    rebuild_story_facts rebuilds it after the schools or boundaries change.
+    """
+    story = models.OneToOneField('Story', primary_key=True, related_name='fact')
+    school = models.ForeignKey('schools.School', related_name='+')
+    admin1 = models.ForeignKey('schools.Boundary', blank=True, null=True,
+                               related_name='+')
+    admin2 = models.ForeignKey('schools.Boundary', blank=True, null=True,
+                               related_name='+')
+    admin3 = models.ForeignKey('schools.Boundary', blank=True, null=True,
+                               related_name='+')
+    school_type = models.ForeignKey('schools.BoundaryType', blank=True,
+                                    null=True, related_name='+')
+    assembly = models.ForeignKey('schools.Assembly', blank=True, null=True,
+                                 related_name='+')
+    parliament = models.ForeignKey('schools.Parliament', blank=True, null=True,
+                                   related_name='+')
+    source = models.ForeignKey('Source', related_name='+')
+    group = models.ForeignKey('Questiongroup', related_name='+')
+    survey = models.ForeignKey('Survey', blank=True, null=True,
+                               related_name='+')
+    version = models.IntegerField(blank=True, null=True)
+    user_type = models.ForeignKey('UserType', blank=True, null=True,
+                                  related_name='+')
+    is_verified = models.BooleanField(default=False)
+    date_of_visit = models.DateTimeField(db_index=True)
+    # first day of the month of the visit
+    month = models.DateField()
+
+    # the columns and the Story lookups they are filled from
+    LOOKUPS = (
+        ('story_id', 'id'),
+        ('school_id', 'school'),
+        ('admin1_id', 'school__schooldetails__admin1'),
+        ('admin2_id', 'school__schooldetails__admin2'),
+        ('admin3_id', 'school__schooldetails__admin3'),
+        ('school_type_id', 'school__admin3__type'),
+        ('assembly_id', 'school__electedrep__assembly'),
+        ('parliament_id', 'school__electedrep__parliament'),
+        ('source_id', 'group__source'),
+        ('group_id', 'group'),
+        ('survey_id', 'group__survey'),
+        ('version', 'group__version'),
+        ('user_type_id', 'user_type'),
+        ('is_verified', 'is_verified'),
+        ('date_of_visit', 'date_of_visit'),
+    )
+
+    class Meta:
+        db_table = 'stories_storyfact'
+        index_together = (
+            ('source', 'month'),
+            ('admin1', 'month'),
+            ('admin2', 'month'),
+            ('admin3', 'month'),
+        )
+
+    def __unicode__(self):
+        return "%s: %s" % (self.story_id, self.month)
+
+    @classmethod
+    def refresh(cls, story_ids, rollup=True):
+        """
+        Rebuilds the facts of story_ids, in three queries. Those of stories
+        that no longer exist are removed. With rollup, the daily volumes of
+        the days the stories were or are now on are rebuilt too. Returns the
+        number of facts written.
+        """
+        story_ids = list(story_ids)
+        if not story_ids:
+            return 0
+
+        days = set()
+        if rollup:
+            days.update(date.date() for date in cls.objects.filter(
+                story__in=story_ids).values_list('date_of_visit', flat=True))
+
+        columns = [column for column, lookup in cls.LOOKUPS]
+        facts = []
+        for row in Story.objects.filter(id__in=story_ids).values_list(
+                *[lookup for column, lookup in cls.LOOKUPS]):
+            fact = cls(**dict(zip(columns, row)))
+            fact.month = fact.date_of_visit.date().replace(day=1)
+            days.add(fact.date_of_visit.date())
+            facts.append(fact)
+
+        cls.objects.filter(story__in=story_ids).delete()
+        cls.objects.bulk_create(facts)
+        if rollup:
+            StoryDailyVolume.rebuild(days)
+            StorySummaryStale.mark(days)
+        return len(facts)
+
+
+class StoryDailyVolume(models.Model):
+    """
+    Number of stories per day and combination of the story fact columns
+    the dashboards filter by, school aside, so that volumes over any
+    window are a sum over a few rows per day.
+
+    Rebuilt from the facts for the days whose stories change.
+    """
+    day = models.DateField()
+    school_type = models.ForeignKey('schools.BoundaryType', blank=True,
+                                    null=True, related_name='+')
+    admin1 = models.ForeignKey('schools.Boundary', blank=True, null=True,
+                               related_name='+')
+    admin2 = models.ForeignKey('schools.Boundary', blank=True, null=True,
+                               related_name='+')
+    admin3 = models.ForeignKey('schools.Boundary', blank=True, null=True,
+                               related_name='+')
+    assembly = models.ForeignKey('schools.Assembly', blank=True, null=True,
+                                 related_name='+')
+    parliament = models.ForeignKey('schools.Parliament', blank=True, null=True,
+                                   related_name='+')
+    source = models.ForeignKey('Source', related_name='+')
+    group = models.ForeignKey('Questiongroup', related_name='+')
+    survey = models.ForeignKey('Survey', blank=True, null=True,
+                               related_name='+')
+    version = models.IntegerField(blank=True, null=True)
+    user_type = models.ForeignKey('UserType', blank=True, null=True,
+                                  related_name='+')
+    is_verified = models.BooleanField(default=False)
+    count = models.IntegerField()
+
+    COLUMNS = (
+        'school_type_id', 'admin1_id', 'admin2_id', 'admin3_id',
+        'assembly_id', 'parliament_id', 'source_id', 'group_id', 'survey_id',
+        'version', 'user_type_id', 'is_verified',
+    )
+
+    class Meta:
+        db_table = 'stories_storydailyvolume'
+        index_together = (
+            ('source', 'day'),
+            ('admin1', 'day'),
+            ('admin2', 'day'),
+            ('admin3', 'day'),
+        )
+
+    def __unicode__(self):
+        return "%s: %s" % (self.day, self.count)
+
+    # first key of the advisory locks taken per day, the day is the second
+    LOCK_KEY = 5590
+
+    @classmethod
+    def rebuild(cls, days=None):
+        """
+        Rebuilds the volumes of days from the story facts, or all of them
+        without days. Rebuilds of the same day wait for each other until
+        the transaction ends, so that one does not delete the rows of the
+        other before it commits and the day is counted twice.
+        """
+        if days is not None:
+            days = sorted(days)
+            if not days:
+                return
+            # the range lets the date_of_visit index narrow the scan
+            where = """
+                WHERE date_of_visit >= %(first)s
+                AND date_of_visit < %(last)s::date + 1
+                AND date_of_visit::date IN %(days)s
+            """
+            params = {'first': days[0], 'last': days[-1], 'days': tuple(days)}
+            delete = "DELETE FROM stories_storydailyvolume WHERE day IN %(days)s"
+        else:
+            where = ""
+            params = {}
+            delete = "DELETE FROM stories_storydailyvolume"
+
+        columns = ', '.join(cls.COLUMNS)
+        with transaction.atomic():
+            cursor = connection.cursor()
+            if days is not None:
+                # in order, so that two rebuilds cannot deadlock
+                for day in days:
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)",
+                                   [cls.LOCK_KEY, day.toordinal()])
+            else:
+                cursor.execute("LOCK TABLE stories_storydailyvolume "
+                               "IN EXCLUSIVE MODE")
+            cursor.execute(delete, params)
+            cursor.execute("""
+                INSERT INTO stories_storydailyvolume (day, %s, count)
+                SELECT date_of_visit::date, %s, count(*)
+                FROM stories_storyfact
+                %s
+                GROUP BY date_of_visit::date, %s
+            """ % (columns, columns, where, columns), params)
+
+
+class StorySummary(models.Model):
+    """
+    Story counts per boundary (none for the whole state), school type,
+    source and month or day, by metric: 'stories', 'verified_stories',
+    'respondents:<user type>' and 'users:<user group>'. Counts over a
+    date range add up the whole months in it and the days at its edges.
+
+    Built from the story facts by stories.summaries; the days whose
+    stories changed wait in StorySummaryStale until rebuilt.
+    """
+    MONTH = 'month'
+    DAY = 'day'
+
+    PERIOD_CHOICES = (
+        (MONTH, 'Month'),
+        (DAY, 'Day'),
+    )
+
+    boundary = models.ForeignKey('schools.Boundary', blank=True, null=True,
+                                 related_name='+')
+    school_type = models.ForeignKey('schools.BoundaryType', blank=True,
+                                    null=True, related_name='+')
+    source = models.ForeignKey('Source', related_name='+')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    start = models.DateField()
+    metric = models.CharField(max_length=150)
+    count = models.IntegerField()
+
+    class Meta:
+        db_table = 'stories_storysummary'
+        index_together = (
+            ('boundary', 'school_type', 'period', 'start'),
+        )
+
+    def __unicode__(self):
+        return "%s %s %s: %s" % (self.period, self.start, self.metric,
+                                 self.count)
+
+
+class StorySummaryStale(models.Model):
+    day = models.DateField(primary_key=True)
+
+    class Meta:
+        db_table = 'stories_storysummarystale'
+
+    def __unicode__(self):
+        return unicode(self.day)
+
+    @classmethod
+    def mark(cls, days):
+        days = set(days) - set(
+            cls.objects.filter(day__in=days).values_list('day', flat=True))
+        for day in sorted(days):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(day=day)
+            except IntegrityError:
+                # marked by another writer in the meantime
+                pass
+
+
+@receiver(pre_save, sender=Answer)
+def answer_encoded(sender, instance=None, raw=False, **kwargs):
+    if raw:
+        return
+    instance.code = AnswerOption.encode(instance.question_id, instance.text)
+
+
+@receiver(post_save, sender=Questiongroup)
+def questiongroup_fingerprint_updated(sender, instance=None, raw=False,
+                                      **kwargs):
+    if raw:
+        return
+    QuestiongroupFingerprint.refresh([instance.id])
+
+
+@receiver(post_save, sender=Question)
+def question_fingerprint_updated(sender, instance=None, raw=False, **kwargs):
+    # edits to questions do not move their groups' change_seq
+    if raw:
+        return
+    QuestiongroupFingerprint.refresh(QuestiongroupQuestions.objects.filter(
+        question=instance.id).values_list('questiongroup', flat=True))
+
+
+@receiver(post_save, sender=Story)
+def story_fact_updated(sender, instance=None, raw=False, **kwargs):
+    if raw:
+        return
+    StoryFact.refresh([instance.id])
+
+
+@receiver(post_delete, sender=Story)
+def story_fact_deleted(sender, instance=None, **kwargs):
+    # the fact went with the story
+    StoryDailyVolume.rebuild([instance.date_of_visit.date()])
+    StorySummaryStale.mark([instance.date_of_visit.date()])
+
+
 class StoryImage(models.Model):
     story = models.ForeignKey('Story')
     image = models.ImageField(upload_to='sys_images')
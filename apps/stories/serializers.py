@@ -211,6 +211,12 @@ class StorySerializer(KLPSerializer):
     school_name = serializers.CharField(source='school.name')
     school_url = serializers.CharField(source='school.get_absolute_url')
 
+    field_lookups = {
+        'school_name': {'select_related': ('school',)},
+        'school_url': {'select_related': ('school',)},
+        'images': {'prefetch_related': ('storyimage_set',)},
+    }
+
     class Meta:
         model = Story
         fields = (
@@ -225,6 +231,16 @@ class StoryWithAnswersSerializer(KLPSerializer):
     answers = AnswerSerializer(many=True, source='answer_set')
     user_type = UserTypeSerializer()
 
+    field_lookups = {
+        'images': {'prefetch_related': ('storyimage_set',)},
+        'answers': {'prefetch_related': (
+            'answer_set__question__question_type',
+            'answer_set__question__school_type',
+            'answer_set__question__questiongroupquestions_set__questiongroup__source',
+        )},
+        'user_type': {'select_related': ('user_type',)},
+    }
+
     class Meta:
         model = Story
         fields = (
@@ -240,6 +256,11 @@ class StorySyncSerializer(KLPSerializer):
     answers = serializers.SerializerMethodField('get_answers')
     user_type = serializers.CharField(source='user_type.name')
 
+    field_lookups = {
+        'answers': {'prefetch_related': ('answer_set',)},
+        'user_type': {'select_related': ('user_type',)},
+    }
+
     class Meta:
         model = Story
         fields = (
@@ -0,0 +1,229 @@
+import datetime
+import operator
+from itertools import chain
+
+from django.db import transaction
+from django.db.models import Count, Sum, Max, Q
+
+from .models import StoryFact, StorySummary, StorySummaryStale
+from .volumes import filter_facts
+
+MONTH = StorySummary.MONTH
+DAY = StorySummary.DAY
+
+# the boundary levels summarised, None being the whole state
+LEVELS = (None, 'admin1', 'admin2', 'admin3')
+
+# (metric, fact lookup giving the metric's variants, fact filters)
+METRICS = (
+    ('stories', None, {}),
+    ('verified_stories', None, {'is_verified': True}),
+    ('respondents', 'user_type__name', {}),
+    ('users', 'story__user__groups__name', {}),
+)
+
+# the filters the summaries can answer, the others need the facts
+SUMMARY_FILTERS = ('school_type', 'admin1', 'admin2', 'admin3')
+
+
+def month_after(day):
+    return (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def to_day(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def metric_name(metric, lookup, row):
+    if lookup is None:
+        return metric
+    if row[lookup] is None:
+        return None
+    return '%s:%s' % (metric, row[lookup])
+
+
+def summary_rows(facts, period):
+    """
+    The summaries of facts for each month or day, as unsaved StorySummary.
+    """
+    facts = facts.extra(
+        select={'start': 'date_trunc(%s, "stories_storyfact"."date_of_visit")::date'},
+        select_params=(period,))
+    for level in LEVELS:
+        for metric, lookup, filters in METRICS:
+            fields = ['start', 'school_type', 'source'] + [
+                field for field in (level, lookup) if field]
+            rows = facts.filter(**filters).values(*fields)\
+                .annotate(total=Count('story')).order_by()
+            for row in rows:
+                name = metric_name(metric, lookup, row)
+                # facts without the boundary would count for the state
+                if name is None or (level and row[level] is None):
+                    continue
+                yield StorySummary(
+                    boundary_id=row[level] if level else None,
+                    school_type_id=row['school_type'],
+                    source_id=row['source'],
+                    period=period,
+                    start=row['start'],
+                    metric=name,
+                    count=row['total'],
+                )
+
+
+def facts_within(spans):
+    """
+    The facts visited within any of spans, (first day, day after) pairs.
+    """
+    if not spans:
+        return StoryFact.objects.none()
+    return StoryFact.objects.filter(reduce(operator.or_, [
+        Q(date_of_visit__gte=first, date_of_visit__lt=after)
+        for first, after in spans
+    ]))
+
+
+def rebuild(days=None):
+    """
+    Rebuilds the summaries of days and of the months they are in, or all
+    of them without days.
+    """
+    if days is None:
+        StorySummary.objects.all().delete()
+        StorySummaryStale.objects.all().delete()
+        facts = StoryFact.objects.all()
+        rows = chain(summary_rows(facts, MONTH), summary_rows(facts, DAY))
+    else:
+        days = set(days)
+        months = set(day.replace(day=1) for day in days)
+        StorySummary.objects.filter(
+            Q(period=DAY, start__in=days) | Q(period=MONTH, start__in=months)
+        ).delete()
+        rows = chain(
+            summary_rows(facts_within(
+                [(month, month_after(month)) for month in months]), MONTH),
+            summary_rows(facts_within(
+                [(day, day + datetime.timedelta(days=1)) for day in days]), DAY),
+        )
+    StorySummary.objects.bulk_create(list(rows), batch_size=1000)
+
+
+def update_stale():
+    """
+    Rebuilds the summaries of the days marked stale since the last time.
+    """
+    with transaction.atomic():
+        days = list(StorySummaryStale.objects.select_for_update()
+                    .values_list('day', flat=True))
+        if days:
+            rebuild(days)
+            StorySummaryStale.objects.filter(day__in=days).delete()
+
+
+def summary_spans(start_date=None, end_date=None):
+    """
+    Splits the days from start_date to end_date, both included and either
+    open, into the whole months and the days at the edges. Returns
+    (months, days): months a (first month, month after) pair or None,
+    days a list of (first day, day after) pairs. None bounds are open.
+    """
+    first = start_date
+    if start_date is not None and start_date.day != 1:
+        first = month_after(start_date)
+    after = last = None
+    if end_date is not None:
+        after = end_date + datetime.timedelta(days=1)
+        last = after.replace(day=1)
+
+    if first is not None and last is not None and first >= last:
+        return None, [(start_date, after)]
+
+    days = []
+    if start_date is not None and start_date < first:
+        days.append((start_date, first))
+    if end_date is not None and last < after:
+        days.append((last, after))
+    return (first, last), days
+
+
+def summary_periods(start_date=None, end_date=None):
+    months, days = summary_spans(start_date, end_date)
+    periods = [Q(period=DAY, start__gte=first, start__lt=after)
+               for first, after in days]
+    if months is not None:
+        first, after = months
+        q = Q(period=MONTH)
+        if first is not None:
+            q &= Q(start__gte=first)
+        if after is not None:
+            q &= Q(start__lt=after)
+        periods.append(q)
+    return reduce(operator.or_, periods)
+
+
+def summary_counts(school_type, boundary_id=None, start_date=None,
+                   end_date=None):
+    """
+    {(source, metric): count} of the stories of school_type in boundary_id
+    from start_date to end_date, from the summaries.
+    """
+    update_stale()
+    summaries = StorySummary.objects.filter(
+        summary_periods(start_date, end_date),
+        school_type__name=school_type, boundary=boundary_id)
+    return dict(
+        ((row['source__name'], row['metric']), row['total'])
+        for row in summaries.values('source__name', 'metric')
+        .annotate(total=Sum('count')).order_by()
+    )
+
+
+def live_counts(facts):
+    """
+    The same counts as summary_counts, counted from facts.
+    """
+    counts = {}
+    for metric, lookup, filters in METRICS:
+        fields = ['source__name'] + ([lookup] if lookup else [])
+        for row in facts.filter(**filters).values(*fields)\
+                .annotate(total=Count('story')).order_by():
+            name = metric_name(metric, lookup, row)
+            if name is not None:
+                counts[(row['source__name'], name)] = row['total']
+    return counts
+
+
+def story_counts(filters, start_date=None, end_date=None):
+    """
+    {(source, metric): count} of the stories matching filters
+    (stories.volumes.FILTERS keys) from start_date to end_date, both days
+    included. From the summaries when filtering by school type and at
+    most one boundary, from the facts otherwise.
+    """
+    used = [name for name, value in filters.items() if value]
+    boundaries = [name for name in used if name.startswith('admin')]
+    if set(used) <= set(SUMMARY_FILTERS) and len(boundaries) <= 1 and \
+            filters.get('school_type'):
+        return summary_counts(
+            filters['school_type'],
+            filters[boundaries[0]] if boundaries else None,
+            to_day(start_date), to_day(end_date))
+    return live_counts(filter_facts(filters, start_date, end_date))
+
+
+def school_counts(filters, start_date=None, end_date=None):
+    """
+    Number of schools with stories and the date of the last story, per
+    source and over all of them, in two queries: distinct counts do not add
+    up over months.
+    """
+    facts = filter_facts(filters, start_date, end_date)
+    sources = dict(
+        (row['source__name'], row) for row in facts.values('source__name')
+        .annotate(schools=Count('school', distinct=True),
+                  last_story=Max('date_of_visit')).order_by()
+    )
+    total = facts.aggregate(schools=Count('school', distinct=True))['schools']
+    return sources, total
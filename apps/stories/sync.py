@@ -0,0 +1,244 @@
+import datetime
+import logging
+
+from django.db import transaction
+
+from schools.models import School
+
+from .models import (
+    Answer, AnswerOption, Question, Questiongroup, Story, StoryFact, UserType
+)
+
+logger = logging.getLogger(__name__)
+
+CREATED = 'created'
+EXISTS = 'exists'
+FAILED = 'failed'
+
+# failures named in the log line of a sync, the others are only counted
+LOGGED_FAILURES = 10
+
+
+class InvalidStory(Exception):
+    pass
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def story_key(school_id, group_id, user_type_id, date_of_visit):
+    """
+    What tells a story of a user apart when the device gave it no sysid.
+    """
+    return (school_id, group_id, user_type_id, date_of_visit)
+
+
+class StoriesSync(object):
+    """
+    Saves the stories a device syncs, as the mobile app sends them, in a
+    fixed number of queries whatever their number. Stories the user already
+    synced, matched by sysid or else by school, questiongroup, respondent
+    and time of visit, are not created again; only their missing answers
+    are added, so a sync can be retried as a whole.
+    """
+
+    def __init__(self, user, items):
+        self.user = user
+        self.items = items
+        # {item _id: {'status': ..., 'story_id' or 'error': ...}}
+        self.statuses = {}
+
+    def run(self):
+        stories = self.validate()
+        codes = self.encode(stories)
+        with transaction.atomic():
+            existing = self.existing(stories)
+            new = [story for story in stories if story['key'] not in existing]
+            self.create(new)
+            saved = self.existing(stories)
+            self.add_answers(stories, saved, codes)
+            # bulk_create sends no signals to keep the story facts current
+            StoryFact.refresh(set(saved[story['key']].id for story in new))
+
+        for story in stories:
+            self.statuses[story['_id']] = {
+                'status': EXISTS if story['key'] in existing else CREATED,
+                'story_id': saved[story['key']].id,
+            }
+        self.log()
+        return self.statuses
+
+    def fail(self, item_id, error):
+        self.statuses[item_id] = {'status': FAILED, 'error': error}
+
+    def validate(self):
+        """
+        The items that can be saved, with their ids resolved, in a query
+        per model referred to. The others are marked failed.
+        """
+        items = [item for item in self.items if isinstance(item, dict)]
+        school_ids = set(School.objects.filter(
+            id__in=set(to_int(item.get('school_id')) for item in items)
+        ).values_list('id', flat=True))
+        group_ids = set(Questiongroup.objects.filter(
+            id__in=set(to_int(item.get('group_id')) for item in items)
+        ).values_list('id', flat=True))
+        user_types = dict(
+            (name.upper(), user_type_id) for user_type_id, name in
+            UserType.objects.values_list('id', 'name')
+        )
+        question_ids = set(Question.objects.filter(id__in=set(
+            to_int(answer.get('question_id')) for item in items
+            for answer in item.get('answers') or [] if isinstance(answer, dict)
+        )).values_list('id', flat=True))
+
+        stories = []
+        for item in items:
+            try:
+                stories.append(self.resolve(
+                    item, school_ids, group_ids, user_types, question_ids))
+            except InvalidStory as e:
+                self.fail(item.get('_id'), unicode(e))
+        return stories
+
+    def resolve(self, item, school_ids, group_ids, user_types, question_ids):
+        timestamp = to_int(item.get('created_at'))
+        if timestamp is None:
+            raise InvalidStory('Invalid created_at')
+        if item.get('respondent_type') not in dict(UserType.USER_TYPE_CHOICES):
+            raise InvalidStory('Invalid respondent type')
+        if item['respondent_type'] not in user_types:
+            raise InvalidStory('Unknown respondent type')
+        school_id = to_int(item.get('school_id'))
+        if school_id not in school_ids:
+            raise InvalidStory('Unknown school')
+        group_id = to_int(item.get('group_id'))
+        if group_id not in group_ids:
+            raise InvalidStory('Unknown questiongroup')
+
+        answers = []
+        for answer in item.get('answers') or []:
+            if not isinstance(answer, dict):
+                raise InvalidStory('Invalid answer')
+            question_id = to_int(answer.get('question_id'))
+            if question_id not in question_ids:
+                raise InvalidStory('Unknown question')
+            if answer.get('text') is None:
+                raise InvalidStory('Answer without text')
+            answers.append((question_id, unicode(answer['text'])))
+
+        date_of_visit = datetime.datetime.fromtimestamp(timestamp / 1000)
+        user_type_id = user_types[item['respondent_type']]
+        return {
+            '_id': item.get('_id'),
+            'sysid': to_int(item.get('sysid')),
+            'school_id': school_id,
+            'group_id': group_id,
+            'user_type_id': user_type_id,
+            'date_of_visit': date_of_visit,
+            'key': story_key(school_id, group_id, user_type_id, date_of_visit),
+            'answers': answers,
+        }
+
+    def existing(self, stories):
+        """
+        {story key: Story} of the user's stories matching stories, by sysid
+        and school or by key, in one query.
+        """
+        if not stories:
+            return {}
+        matches = Story.objects.filter(
+            user=self.user,
+            date_of_visit__in=set(story['date_of_visit'] for story in stories)
+        ).only('id', 'sysid', 'school', 'group', 'user_type', 'date_of_visit')
+        sysids = set(story['sysid'] for story in stories) - set([None])
+        if sysids:
+            matches = matches | Story.objects.filter(
+                user=self.user, sysid__in=sysids
+            ).only('id', 'sysid', 'school', 'group', 'user_type',
+                   'date_of_visit')
+
+        by_sysid = {}
+        by_key = {}
+        for match in matches:
+            # sysids are only unique on a device, the school is checked too
+            if match.sysid is not None:
+                by_sysid.setdefault((match.sysid, match.school_id), match)
+            by_key.setdefault(story_key(
+                match.school_id, match.group_id, match.user_type_id,
+                match.date_of_visit), match)
+
+        existing = {}
+        for story in stories:
+            match = by_sysid.get((story['sysid'], story['school_id'])) or \
+                by_key.get(story['key'])
+            if match is not None:
+                existing[story['key']] = match
+        return existing
+
+    def create(self, stories):
+        created = {}
+        for story in stories:
+            # the same story twice in one sync is created once
+            created.setdefault(story['key'], Story(
+                user=self.user,
+                school_id=story['school_id'],
+                group_id=story['group_id'],
+                user_type_id=story['user_type_id'],
+                date_of_visit=story['date_of_visit'],
+                sysid=story['sysid'],
+                is_verified=True,
+                telephone=self.user.mobile_no,
+                name=self.user.get_full_name(),
+                email=self.user.email,
+            ))
+        Story.objects.bulk_create(created.values(), batch_size=500)
+
+    def encode(self, stories):
+        """
+        {(question id, text): code} of the answers of stories. Run before
+        the stories are saved, so that new codes are committed, and cached,
+        even if saving them fails.
+        """
+        return dict(
+            (answer, AnswerOption.encode(*answer)) for answer in
+            set(answer for story in stories for answer in story['answers'])
+        )
+
+    def add_answers(self, stories, saved, codes):
+        """
+        Creates the answers of stories their saved story lacks, in two
+        queries. Answers are coded here as bulk_create sends no signals.
+        """
+        story_ids = set(saved[story['key']].id for story in stories)
+        have = set(Answer.objects.filter(story__in=story_ids).values_list(
+            'story', 'question', 'text'))
+
+        answers = []
+        for story in stories:
+            story_id = saved[story['key']].id
+            for question_id, text in story['answers']:
+                if (story_id, question_id, text) in have:
+                    continue
+                have.add((story_id, question_id, text))
+                answers.append(Answer(
+                    story_id=story_id, question_id=question_id, text=text,
+                    code=codes[(question_id, text)]))
+        Answer.objects.bulk_create(answers, batch_size=1000)
+
+    def log(self):
+        counts = dict((status, 0) for status in (CREATED, EXISTS, FAILED))
+        failures = []
+        for item_id, status in sorted(self.statuses.items()):
+            counts[status['status']] += 1
+            if status['status'] == FAILED and len(failures) < LOGGED_FAILURES:
+                failures.append('%s: %s' % (item_id, status['error']))
+        logger.info(
+            'stories sync user=%s items=%d created=%d exists=%d failed=%d%s',
+            self.user.id, len(self.items), counts[CREATED], counts[EXISTS],
+            counts[FAILED],
+            ' failures=[%s]' % '; '.join(failures) if failures else '')
@@ -0,0 +1,104 @@
+import calendar
+import datetime
+from collections import OrderedDict
+
+from django.db.models import Count, Sum
+
+from .models import StoryFact, StoryDailyVolume
+
+GRANULARITIES = ('day', 'week', 'month', 'year')
+
+# the story filters, as lookups on both the facts and the daily volumes
+FILTERS = {
+    'survey': 'survey__name',
+    'source': 'source__name',
+    'versions': 'version__in',
+    'school_type': 'school_type__name',
+    'admin1': 'admin1',
+    'admin2': 'admin2',
+    'admin3': 'admin3',
+    'mp': 'parliament',
+    'mla': 'assembly',
+}
+
+# the filters only the facts can answer
+FACT_FILTERS = {
+    'school': 'school',
+}
+
+
+def bucket_counts(queryset, column, granularity, count):
+    """
+    Counts queryset by date_trunc(granularity, column) in one query.
+    Returns [(first day of the bucket, count)] in date order, leaving out
+    the rows without a date.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError("granularity should be one of %s" % ', '.join(GRANULARITIES))
+    bucket = 'date_trunc(%%s, "%s"."%s"::timestamp)::date' % (
+        queryset.model._meta.db_table, column)
+    rows = queryset.extra(
+        select={'bucket': bucket}, select_params=(granularity,)
+    ).values('bucket').annotate(count=count).order_by('bucket')
+    return [(row['bucket'], row['count']) for row in rows
+            if row['bucket'] is not None]
+
+
+def filter_facts(filters, start_date=None, end_date=None):
+    lookups = dict(FILTERS, **FACT_FILTERS)
+    facts = StoryFact.objects.filter(**dict(
+        (lookups[name], value) for name, value in filters.items() if value))
+    if start_date:
+        facts = facts.filter(date_of_visit__gte=start_date)
+    if end_date:
+        facts = facts.filter(
+            date_of_visit__lt=end_date + datetime.timedelta(days=1))
+    return facts
+
+
+def story_volumes(filters, granularity='month', start_date=None,
+                  end_date=None):
+    """
+    Number of stories per bucket of granularity, as [(bucket, count)], for
+    the stories matching filters ({FILTERS key: value}) visited from
+    start_date to end_date, both days included.
+
+    Summed from the daily volumes, unless filtering by school.
+    """
+    if any(filters.get(name) for name in FACT_FILTERS):
+        return bucket_counts(filter_facts(filters, start_date, end_date),
+                             'date_of_visit', granularity, Count('story'))
+
+    volumes = StoryDailyVolume.objects.filter(**dict(
+        (FILTERS[name], value) for name, value in filters.items() if value))
+    if start_date:
+        volumes = volumes.filter(day__gte=start_date)
+    if end_date:
+        volumes = volumes.filter(day__lte=end_date)
+    return bucket_counts(volumes, 'day', granularity, Sum('count'))
+
+
+def user_group_volumes(filters, start_date=None, end_date=None):
+    """
+    Number of stories by users of each user group, in one query.
+    """
+    facts = filter_facts(filters, start_date, end_date)
+    return dict(
+        (row['story__user__groups__name'], row['count'])
+        for row in facts.values('story__user__groups__name')
+        .annotate(count=Count('story')).order_by()
+        if row['story__user__groups__name'] is not None
+    )
+
+
+def per_month(buckets):
+    """
+    Monthly buckets as {year: {'Jan': count, ... 'Dec': count}}.
+    """
+    volumes = {}
+    for bucket, count in buckets:
+        if bucket.year not in volumes:
+            volumes[bucket.year] = OrderedDict(
+                (calendar.month_abbr[month], 0) for month in range(1, 13))
+        volumes[bucket.year][calendar.month_abbr[bucket.month]] += count
+    return volumes
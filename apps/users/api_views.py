@@ -248,11 +248,13 @@ class VolunteerActivitiesView(generics.ListCreateAPIView, KLPListAPIView):
     school -- school where activity is (id)
     users -- filter by user associated with activity (id)
     bbox -- bbox filter
+    cursor -- page by cursor instead of page number, empty for the first page
     """
     serializer_class = VolunteerActivitySerializer
     permission_classes = (VolunteerActivitiesPermission,)
     filter_class = VolunteerActivityFilter
     bbox_filter_field = ('school__instcoord__coord',)
+    cursor_ordering = ('date', 'id')
 
     def get_queryset(self):
         return VolunteerActivity.objects.all()
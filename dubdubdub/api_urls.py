@@ -15,7 +15,8 @@ from schools.api_views import (
     AssessmentsList, AssessmentInfo, ProgrammesList, ProgrammeInfo, ProgrammePercentile,
     BoundaryLibLevelAggView, BoundaryLibLangAggView, BoundarySchoolAggView,
     AssemblySchoolAggView, ParliamentSchoolAggView, PincodeSchoolAggView,
-    MeetingReportListView
+    BoundaryTeacherCountView, MeetingReportListView, SchoolsBulkInfo,
+    SchoolProfileView
 )
 
 from users.api_views import (
@@ -34,7 +35,8 @@ from users.api_views import (
 from stories.api_views import (
     StoryQuestionsView, StoriesView, StoryInfoView, SourceListView,
     ShareYourStoryView, StoryMetaView, StoryDetailView, StoryVolumeView,
-    SurveysViewSet, QuestiongroupsViewSet, QuestionsViewSet, StoriesSyncView
+    SurveysViewSet, QuestiongroupsViewSet, QuestionsViewSet, StoriesSyncView,
+    MobileBundleListView, MobileBundleView, QuestiongroupFingerprintsView
 )
 
 from django.views.decorators.csrf import csrf_exempt
@@ -64,6 +66,7 @@ urlpatterns = patterns(
 
     url(r'^schools/list/$', SchoolsList.as_view(), name='api_schools_list'),
     url(r'^schools/info/$', SchoolsInfo.as_view(), name='api_schools_info'),
+    url(r'^schools/bulk/$', SchoolsBulkInfo.as_view(), name='api_schools_bulk'),
     url(
         r'^schools/meeting-reports/$',
         MeetingReportListView.as_view(),
@@ -85,6 +88,8 @@ urlpatterns = patterns(
         SchoolLibrary.as_view(), name='api_school_library'),
     url(r'^schools/school/(?P<pk>[0-9]+)/nutrition$',
         SchoolNutrition.as_view(), name='api_school_nutrition'),
+    url(r'^schools/school/(?P<pk>[0-9]+)/profile$',
+        SchoolProfileView.as_view(), name='api_school_profile'),
 
     url(r'^boundary/assemblies$',
         AssemblyList.as_view(), name="api_assembly_list"),
@@ -140,6 +145,10 @@ urlpatterns = patterns(
 
     # Mobile app related urls
     url(r'^sync$', csrf_exempt(StoriesSyncView.as_view()), name='api_stories_sync'),
+    url(r'^bundles/$', MobileBundleListView.as_view(),
+        name='api_mobile_bundles'),
+    url(r'^bundles/district/(?P<district_id>[0-9]+)/$',
+        MobileBundleView.as_view(), name='api_mobile_bundle'),
 
     # SYS urls
     url(r'^stories/(?P<pk>[0-9]+)$', ShareYourStoryView.as_view(),
@@ -161,6 +170,10 @@ urlpatterns = patterns(
         QuestiongroupsViewSet.as_view({'get' : 'list'}),
         name="api_questiongroups"
     ),
+    url(r'^questiongroups/fingerprints/$',
+        csrf_exempt(QuestiongroupFingerprintsView.as_view()),
+        name="api_questiongroups_fingerprints"
+    ),
     url(r'^questions/$',
         QuestionsViewSet.as_view({'get' : 'list'}),
         name="api_questions"
@@ -305,6 +318,8 @@ urlpatterns = patterns(
         BoundaryLibLevelAggView.as_view(), name='api_aggregation_boundary_liblevel'),
     url(r'^aggregation/boundary/(?P<id>[0-9]+)/library-language/$',
         BoundaryLibLangAggView.as_view(), name='api_aggregation_boundary_liblang'),
+    url(r'^aggregation/boundary/teachers/$',
+        BoundaryTeacherCountView.as_view(), name='api_aggregation_boundary_teachers'),
 
     # Assessment urls
     url(r'^partners/$', PartnerList.as_view(), name='api_partner_list'),
@@ -18,6 +18,9 @@ DATABASES = {
         'PASSWORD': '',
         'HOST': '',
         'PORT': '',
+        # kept open between requests, and by the /merge and report query
+        # pool threads between their tasks
+        'CONN_MAX_AGE': 60,
     }
 }
 
@@ -237,6 +240,10 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        'stories.sync': {
+            'level': 'INFO',
+            'handlers': ['console'],
+        },
         # Uncomment following to turn on sql logging
         'django.db.backends': {
             'level': 'DEBUG',
@@ -258,6 +265,34 @@ CACHE_TIMEOUT = 60 * 60 * 24
 # Should cache be used or not? A: Yes
 CACHE_ENABLED = True
 
+# Bumped whenever the data is refreshed (see common.utils.bump_data_epoch).
+# In-process indexes rebuild themselves when it changes.
+DATA_EPOCH_FILE = '/tmp/dubdubdub_data_epoch'
+
+# /merge runs its endpoints on a pool of this many threads, giving up on
+# any of them after MERGE_TIMEOUT seconds.
+MERGE_WORKERS = 8
+MERGE_TIMEOUT = 10
+
+# Threads, and so db connections, running the independent queries of a
+# report together (common.queries.QueryBatch). 0 runs them one by one.
+# Each process holds up to one persistent connection per request thread,
+# plus MERGE_WORKERS and REPORT_QUERY_WORKERS: 13 for a single threaded
+# worker. Keep processes x that under the server's max_connections.
+REPORT_QUERY_WORKERS = 4
+
+# Where build_answer_columns writes the story answers as columns for the
+# in-process answer counts (stories.columnar, needs numpy). None counts
+# answers in the database.
+STORY_ANSWER_COLUMNS_DIR = None
+# Seconds after a build past which answers are counted in the database
+# again, as the columns miss the stories saved since.
+STORY_ANSWER_COLUMNS_MAX_AGE = 60 * 60 * 24
+
+# Where build_mobile_bundles writes the per district data bundles the
+# mobile app downloads for offline use (stories.bundles).
+MOBILE_BUNDLE_DIR = os.path.join(PROJECT_ROOT, 'bundles')
+
 # REST Framework config options:
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
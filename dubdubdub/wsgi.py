@@ -49,3 +49,13 @@ except Exception:
         traceback.print_exc()
         os.kill(os.getpid(), signal.SIGINT)
         time.sleep(2)
+
+# Load the in-process indexes at worker start instead of on the first
+# request that needs them.
+try:
+    from schools.search import typeahead
+    from schools.facets import school_facets
+    typeahead.get()
+    school_facets.get()
+except Exception, e:
+    print e
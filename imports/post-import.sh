@@ -1,4 +1,10 @@
 # TODO: accept -d param and use that instead of hard coding db name
 sudo -u postgres psql -d dubdubdub -f sql/refresh_materialized_views.sql
+python manage.py rebuild_omnisearch
 ./sql/assessment-aggregation/run_markpercentile.sh -d dubdubdub
-./sql/assessment-aggregation/run_gradepercentile.sh -d dubdubdub
\ No newline at end of file
+./sql/assessment-aggregation/run_gradepercentile.sh -d dubdubdub
+python manage.py rebuild_school_profiles
+python manage.py rebuild_story_facts
+python manage.py encode_answers
+python manage.py build_answer_columns
+python manage.py build_mobile_bundles
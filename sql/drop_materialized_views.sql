@@ -1,3 +1,4 @@
+DROP MATERIALIZED VIEW mvw_teacher_school_year;
 DROP MATERIALIZED VIEW mvw_boundary_primary;
 DROP MATERIALIZED VIEW mvw_institution_aggregations;
 DROP MATERIALIZED VIEW mvw_school_details;
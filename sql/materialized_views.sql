@@ -378,3 +378,23 @@ SELECT sg.sid AS schid,
   WHERE stu.id = stusg.stuid AND stusg.clid = sg.id AND stu.status = 2 AND acyear.id = stusg.ayid
   GROUP BY sg.sid, btrim(sg.name::text), acyear.id;
 
+
+-- One row per teacher, school and academic year the teacher has a class
+-- in, with the school's boundaries, so that teacher counts need no joins.
+DROP MATERIALIZED VIEW IF EXISTS mvw_teacher_school_year CASCADE;
+CREATE MATERIALIZED VIEW mvw_teacher_school_year AS
+SELECT format('T%sS%sA%s', tc.teacherid, sg.sid, tc.ayid) as id,
+    tc.teacherid as teacher_id,
+    sg.sid as school_id,
+    tc.ayid as academic_year_id,
+    sd.district_id as admin1_id,
+    sd.block_or_project_id as admin2_id,
+    sd.cluster_or_circle_id as admin3_id
+    FROM tb_teacher_class tc, tb_class sg, mvw_school_details sd
+    WHERE tc.clid = sg.id AND sd.id = sg.sid
+    GROUP BY tc.teacherid, sg.sid, tc.ayid, sd.district_id,
+        sd.block_or_project_id, sd.cluster_or_circle_id;
+CREATE INDEX ON mvw_teacher_school_year (academic_year_id, school_id);
+CREATE INDEX ON mvw_teacher_school_year (admin1_id, academic_year_id);
+CREATE INDEX ON mvw_teacher_school_year (admin2_id, academic_year_id);
+CREATE INDEX ON mvw_teacher_school_year (admin3_id, academic_year_id);
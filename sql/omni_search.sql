@@ -0,0 +1,41 @@
+-- Denormalized search table behind the omni search endpoint.
+-- Rebuild with `python manage.py rebuild_omnisearch` after imports.
+-- Needs mvw_school_details, mvw_inst_coord and mvw_boundary_coord.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+DROP MATERIALIZED VIEW IF EXISTS mvw_omni_search CASCADE;
+CREATE MATERIALIZED VIEW mvw_omni_search AS
+SELECT CASE tbt.name WHEN 'PreSchool' THEN 'pre_schools'
+           ELSE 'primary_schools' END AS entity_type,
+       tbs.id AS entity_id,
+       tbs.name AS name,
+       lower(concat_ws(' ', tbs.name, tbs.id, tbs.dise_code)) AS search_text
+FROM tb_school tbs
+JOIN mvw_school_details sd ON sd.id = tbs.id
+JOIN tb_boundary_type tbt ON tbt.id = sd.stype
+JOIN mvw_inst_coord ic ON ic.instid = tbs.id
+WHERE tbs.status = 2
+    AND tbt.name IN ('PreSchool', 'Primary School')
+    AND ic.coord IS NOT NULL
+UNION ALL
+SELECT 'boundaries', tb.id, tb.name, lower(tb.name)
+FROM tb_boundary tb
+JOIN mvw_boundary_coord bc ON bc.id_bndry = tb.id
+WHERE tb.status = 2
+    AND bc.coord IS NOT NULL
+UNION ALL
+SELECT 'assemblies', mva.id, mva.ac_name, lower(mva.ac_name)
+FROM mvw_assembly mva
+WHERE mva.the_geom IS NOT NULL
+UNION ALL
+SELECT 'parliaments', mvp.id, mvp.pc_name, lower(mvp.pc_name)
+FROM mvw_parliament mvp
+WHERE mvp.the_geom IS NOT NULL
+UNION ALL
+SELECT 'pincodes', postal.pin_id, postal.pincode, lower(postal.pincode)
+FROM mvw_postal postal
+WHERE postal.the_geom IS NOT NULL;
+
+CREATE UNIQUE INDEX udx_omni_search ON mvw_omni_search (entity_type, entity_id);
+CREATE INDEX idx_omni_search_trgm ON mvw_omni_search USING gin (search_text gin_trgm_ops);
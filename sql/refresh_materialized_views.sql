@@ -21,6 +21,7 @@ REFRESH MATERIALIZED VIEW mvw_dise_display_master;
 REFRESH MATERIALIZED VIEW mvw_paisa_data;
 REFRESH MATERIALIZED VIEW mvw_school_eval;
 REFRESH MATERIALIZED VIEW mvw_anginfra_agg;
+REFRESH MATERIALIZED VIEW mvw_teacher_school_year;
 
 
 ---------------------------------
@@ -1,8 +1,13 @@
 from django.test import TestCase
 from django.test import Client
+from django.test.utils import override_settings
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
 import unittest
 import json
 import csv
+import time
 
 
 class BoundaryApiTestCase(TestCase):
@@ -48,3 +53,103 @@ class BoundaryApiTestCase(TestCase):
                         "has no property called name")
         self.assertTrue('type' in sample_district['properties'],
                         "has no property called type")
+
+    def test_report_aggregations_parallel(self):
+        from schools.models import Boundary, AcademicYear
+        from schools.api_views.aggregations import BaseSchoolAggView
+        academic_year = AcademicYear.objects.get(
+            name=settings.DEFAULT_ACADEMIC_YEAR)
+        schools = Boundary.objects.get(id=8773).schools()
+        with override_settings(REPORT_QUERY_WORKERS=0):
+            serial = BaseSchoolAggView().get_aggregations(schools, academic_year)
+        parallel = BaseSchoolAggView().get_aggregations(schools, academic_year)
+        self.assertEqual(serial, parallel)
+        self.assertTrue(parallel['num_schools'] > 0)
+
+    def test_teacher_counts(self):
+        from schools.models import (
+            Boundary, AcademicYear, School, TeacherSchoolYear)
+        academic_year = AcademicYear.objects.get(
+            name=settings.DEFAULT_ACADEMIC_YEAR)
+        boundary = Boundary.objects.get(id=8773)
+        counts = TeacherSchoolYear.counts([boundary.id], [academic_year.id])
+
+        # count straight from the class tables, not the materialized view
+        school_ids = tuple(School.objects.filter(
+            Q(schooldetails__admin1=boundary) |
+            Q(schooldetails__admin2=boundary) |
+            Q(schooldetails__admin3=boundary)
+        ).values_list('id', flat=True))
+        self.assertTrue(school_ids)
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT count(DISTINCT tc.teacherid)
+            FROM tb_teacher_class tc JOIN tb_class sg ON tc.clid = sg.id
+            WHERE sg.sid IN %s AND tc.ayid = %s
+        """, [school_ids, academic_year.id])
+        self.assertEqual(
+            counts.get((boundary.id, academic_year.id), 0),
+            cursor.fetchone()[0])
+
+        response = self.client.get(
+            "/api/v1/aggregation/boundary/teachers/?boundaries=8773&years=%s"
+            % settings.DEFAULT_ACADEMIC_YEAR)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(
+            data['8773'][settings.DEFAULT_ACADEMIC_YEAR],
+            counts.get((boundary.id, academic_year.id), 0))
+
+        response = self.client.get(
+            "/api/v1/aggregation/boundary/teachers/?boundaries=abc")
+        self.assertEqual(response.status_code, 400)
+
+
+class QueryBatchTestCase(unittest.TestCase):
+
+    def sleep(self, seconds, value):
+        time.sleep(seconds)
+        return value
+
+    def get_batch(self):
+        from common.queries import QueryBatch
+        batch = QueryBatch()
+        for i in range(4):
+            batch.call(i, self.sleep, 0.2, i * i)
+        return batch
+
+    def test_parallel_matches_serial(self):
+        start = time.time()
+        serial = self.get_batch().run(parallel=False)
+        serial_time = time.time() - start
+
+        start = time.time()
+        parallel = self.get_batch().run(parallel=True)
+        parallel_time = time.time() - start
+
+        self.assertEqual(serial, {0: 0, 1: 1, 2: 4, 3: 9})
+        self.assertEqual(parallel, serial)
+        # 4 queries on the 4 pool threads take about as long as one
+        self.assertTrue(parallel_time < serial_time / 2,
+                        "serial %.2fs, parallel %.2fs" % (serial_time, parallel_time))
+
+    def test_nested_batches_run_serially(self):
+        from common.queries import QueryBatch
+
+        def inner():
+            batch = self.get_batch()
+            return batch.run()
+
+        batch = QueryBatch()
+        batch.call('a', inner)
+        batch.call('b', inner)
+        results = batch.run(parallel=True)
+        self.assertEqual(results['a'], {0: 0, 1: 1, 2: 4, 3: 9})
+        self.assertEqual(results['a'], results['b'])
+
+    def test_errors_are_raised(self):
+        from common.queries import QueryBatch
+        batch = QueryBatch()
+        batch.call('ok', self.sleep, 0, 1)
+        batch.call('fails', int, 'x')
+        self.assertRaises(ValueError, batch.run, True)
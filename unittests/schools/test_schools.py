@@ -1,10 +1,14 @@
 # from django.utils import unittest
 from django.test import TestCase
 from django.test import Client
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.conf import settings
 import unittest
 import json
 import csv
+import time
 
 
 class SchoolsApiTestCase(TestCase):
@@ -33,6 +37,21 @@ class SchoolsApiTestCase(TestCase):
             "Omni search returned %s" % response.status_code
         )
 
+    def test_omni_search_results(self):
+        query_url = '/api/v1/search?text=%s' % self.school_info_id
+        response = self.client.get(query_url)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        for key in ['pre_schools', 'primary_schools', 'boundaries',
+                    'assemblies', 'parliaments', 'pincodes']:
+            self.assertIn(key, data, "Omni search missing %s" % key)
+        self.assertTrue(len(data['pre_schools']) <= 3)
+        self.assertTrue(len(data['primary_schools']) <= 3)
+        self.assertTrue(len(data['boundaries']) <= 10)
+
+        response = self.client.get('/api/v1/search?text=%25_')
+        self.assertEqual(response.status_code, 200)
+
     def test_api_schools_list_geometry(self):
 
         base_url = "/api/v1/schools/list?"
@@ -65,6 +84,49 @@ class SchoolsApiTestCase(TestCase):
         self.assertTrue(base_count > query_count,
                         "Total results less than results within bbox")
 
+    def test_api_schools_list_cursor(self):
+        base_url = "/api/v1/schools/list?school_type=primaryschools"
+        response = self.client.get(base_url + "&cursor=")
+        self.assertEqual(response.status_code, 200)
+        page1 = json.loads(response.content)
+        self.assertEqual(len(page1['features']), 50)
+        self.assertTrue(page1['next'], "has a next page")
+
+        offset_page1 = json.loads(self.client.get(base_url).content)
+        self.assertEqual(
+            [school['id'] for school in page1['features']],
+            [school['id'] for school in offset_page1['features']],
+            "first cursor page is the first offset page"
+        )
+        self.assertEqual(page1['count'], offset_page1['count'])
+
+        page2 = json.loads(self.client.get(page1['next']).content)
+        ids1 = [school['id'] for school in page1['features']]
+        ids2 = [school['id'] for school in page2['features']]
+        self.assertTrue(max(ids1) < min(ids2), "page 2 follows page 1")
+
+        response = self.client.get(base_url + "&cursor=notacursor")
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_schools_list_facets(self):
+        base_url = "/api/v1/schools/list?school_type=primaryschools"
+        response = self.client.get(base_url + "&facets=yes")
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content)
+        self.assertTrue('facets' in results, "has no facets")
+        self.assertEqual(
+            sum(results['facets']['school_type'].values()), results['count'],
+            "school type facet counts add up to the total"
+        )
+
+        admin1 = results['facets']['admin1'].keys()[0]
+        response = self.client.get(base_url + "&admin1=%s" % admin1)
+        self.assertEqual(
+            json.loads(response.content)['count'],
+            results['facets']['admin1'][admin1],
+            "facet count matches the filtered count"
+        )
+
     '''
     def test_api_schools_list_csv(self):
         response = self.client.get("/api/v1/schools/list?format=csv")
@@ -134,6 +196,38 @@ class SchoolsApiTestCase(TestCase):
         self.assertEqual(response.status_code, 404,
                          "school info status code is 404")
 
+    def test_api_school_info_fields(self):
+        query_url = self.schools_base_url + self.school_info_id + "/"
+        with CaptureQueriesContext(connection) as full:
+            response = self.client.get(query_url)
+        self.assertEqual(response.status_code, 200)
+
+        with CaptureQueriesContext(connection) as sparse:
+            response = self.client.get(query_url, {'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(sorted(data.keys()), ['id', 'name'])
+        self.assertTrue(len(sparse) < len(full),
+                        "fewer queries when only id and name are asked for")
+
+        response = self.client.get(query_url, {'omit': 'images,ward'})
+        data = json.loads(response.content)
+        self.assertFalse('images' in data)
+        self.assertFalse('ward' in data)
+        self.assertTrue('name' in data)
+
+    def test_api_schools_info_fields(self):
+        with CaptureQueriesContext(connection) as full:
+            self.client.get('/api/v1/schools/info')
+        with CaptureQueriesContext(connection) as sparse:
+            response = self.client.get('/api/v1/schools/info', {
+                'fields': 'id,name'
+            })
+        data = json.loads(response.content)
+        for feature in data['features']:
+            self.assertEqual(sorted(feature.keys()), ['id', 'name'])
+        self.assertTrue(len(sparse) < len(full))
+
     def test_api_school_info_geometry(self):
         # schools_base_url = "/api/v1/schools/school/"
         query_url = ''.join([
@@ -252,3 +346,307 @@ class SchoolsApiTestCase(TestCase):
 
     def test_api_school_infra_geometry(self):
         pass
+
+    def test_values_serializers_match(self):
+        from schools.models import School, Boundary, Assembly, Programme
+        from schools import serializers
+
+        lists = (
+            (School.objects.filter(status=2).order_by('id'),
+             serializers.SchoolListSerializer,
+             serializers.SchoolListValuesSerializer),
+            (Boundary.objects.all_active().order_by('id'),
+             serializers.BoundarySerializer,
+             serializers.BoundaryValuesSerializer),
+            (Boundary.objects.all_active().order_by('id'),
+             serializers.BoundaryWithParentSerializer,
+             serializers.BoundaryWithParentValuesSerializer),
+            (Assembly.objects.order_by('id'),
+             serializers.AssemblySerializer,
+             serializers.AssemblyValuesSerializer),
+            (Programme.objects.order_by('id'),
+             serializers.ProgrammeListSerializer,
+             serializers.ProgrammeListValuesSerializer),
+        )
+        for queryset, serializer_class, values_serializer_class in lists:
+            expected = serializer_class(queryset[:200], many=True).data
+            rows = values_serializer_class.values_list(queryset)[:200]
+            self.assertEqual(
+                values_serializer_class(rows, many=True).data, expected,
+                "%s gives the same output as %s" % (
+                    values_serializer_class.__name__, serializer_class.__name__)
+            )
+
+    def test_api_schools_list_values(self):
+        response = self.client.get('/api/v1/schools/list', {'fields': 'id,type'})
+        data = json.loads(response.content)
+        for feature in data['features']:
+            self.assertEqual(sorted(feature.keys()), ['id', 'type'])
+
+    def test_api_programme_info_queries(self):
+        from schools.models import InstitutionAssessmentSinglescore
+        rows = InstitutionAssessmentSinglescore.objects.values_list(
+            'school', 'assessment__programme')[:1]
+        if not rows:
+            return
+        school_id, programme_id = rows[0]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/v1/programme/%s/' % programme_id, {'school': school_id})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertTrue(len(data['features']) > 0)
+        for feature in data['features']:
+            self.assertTrue('cohortsdetails' in feature)
+            self.assertEqual(len(feature['singlescoredetails']['boundary']), 3)
+        # one query per table for the whole page
+        self.assertTrue(len(queries) <= 10,
+                        "programme info took %d queries" % len(queries))
+
+    def test_api_schools_bulk(self):
+        ids = [self.school_finance_id, self.school_infra_id]
+        response = self.client.get('/api/v1/schools/bulk/', {
+            'ids': ','.join(ids),
+            'sections': 'finance,infra'
+        })
+        self.assertEqual(response.status_code, 200, "schools bulk status code is 200")
+        data = json.loads(response.content)
+        for school_id in ids:
+            self.assertEqual(sorted(data[school_id].keys()), ['finance', 'infra'])
+
+        # same data as the single school endpoint
+        single = json.loads(self.client.get(
+            self.schools_base_url + self.school_infra_id + "/infrastructure"
+        ).content)
+        self.assertEqual(data[self.school_infra_id]['infra'], single)
+
+        response = self.client.get('/api/v1/schools/bulk/', {
+            'ids': self.school_infra_id,
+            'sections': 'unknown'
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+    def test_api_school_profile(self):
+        response = self.client.get(
+            self.schools_base_url + self.school_infra_id + "/profile")
+        self.assertEqual(response.status_code, 200, "school profile status code is 200")
+        data = json.loads(response.content)
+        self.assertEqual(sorted(data.keys()), [
+            'demographics', 'finance', 'info', 'infra', 'library',
+            'nutrition', 'programmes'
+        ])
+
+        # same data as the single school endpoint
+        single = json.loads(self.client.get(
+            self.schools_base_url + self.school_infra_id + "/infrastructure"
+        ).content)
+        self.assertEqual(data['infra'], single)
+
+        response = self.client.get(
+            self.schools_base_url + self.school_infra_id + "/profile",
+            {'academic_year': '1900-1901'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_api_merge(self):
+        infra = "/schools/school/" + self.school_infra_id + "/infrastructure"
+        finance = "/schools/school/" + self.school_finance_id + "/finance"
+        response = self.client.get('/api/v1/merge', {
+            'endpoints': [infra, finance, '/no/such/endpoint']
+        })
+        self.assertEqual(response.status_code, 200, "merge status code is 200")
+        data = json.loads(response.content)
+        self.assertEqual(data[infra]['id'], int(self.school_infra_id))
+        self.assertEqual(data[finance]['id'], int(self.school_finance_id))
+        self.assertEqual(data['errors']['/no/such/endpoint']['status'], 404)
+
+        # same again, from the cache when it is enabled
+        response = self.client.get('/api/v1/merge', {'endpoints': [infra]})
+        self.assertEqual(json.loads(response.content)[infra], data[infra])
+
+    def test_api_merge_reports(self):
+        # report views build their response on the view, run together
+        # they must not see each other's data
+        blocks = json.loads(self.client.get(
+            "/api/v1/boundary/admin1/8773/admin2").content)['features']
+        endpoints = [
+            "/reports/summary/boundary/?id=%s" % boundary_id
+            for boundary_id in [8773, blocks[0]['properties']['id']]
+        ]
+        response = self.client.get('/api/v1/merge', {'endpoints': endpoints})
+        self.assertEqual(response.status_code, 200, "merge status code is 200")
+        data = json.loads(response.content)
+        for endpoint in endpoints:
+            single = json.loads(self.client.get('/api/v1' + endpoint).content)
+            self.assertEqual(data[endpoint], single)
+        self.assertNotEqual(data[endpoints[0]], data[endpoints[1]])
+
+
+class SubstringIndexTestCase(unittest.TestCase):
+
+    def test_substring_search(self):
+        from schools.search import SubstringIndex
+        index = SubstringIndex([
+            (u'jayapura', 1), (u'puttur', 2), (u'hosapura', 3), (u'bidar', 4)
+        ])
+        self.assertEqual(index.search(u'pura', 10), [3, 1])
+        self.assertEqual(index.search(u'pu', 10), [2, 3, 1])
+        self.assertEqual(index.search(u'pu', 1), [2])
+        self.assertEqual(index.search(u'xyz', 10), [])
+
+
+class FacetBitsetTestCase(unittest.TestCase):
+
+    def test_facet_filter_and_counts(self):
+        from schools.facets import Facet, to_bitset, to_bytes, to_positions
+        size = 70
+        facet = Facet(size, {'few': [1, 2, 3], 'many': range(0, size, 2)})
+        result = to_bitset(range(10), size)
+        self.assertEqual(to_positions(result, size), range(10))
+        self.assertEqual(
+            to_positions(facet.get('few') & facet.get('many'), size), [2])
+        self.assertEqual(facet.counts(result, to_bytes(result, size)),
+                         {'few': 3, 'many': 5})
+        self.assertEqual(facet.get('missing'), 0)
+
+
+class KeysetFilterTestCase(unittest.TestCase):
+
+    def test_cursor_roundtrip(self):
+        import datetime
+        from common.pagination import encode_cursor, decode_cursor
+        values = [datetime.datetime(2015, 1, 2, 3, 4, 5, 6789), 42]
+        self.assertEqual(decode_cursor(encode_cursor(values)),
+                         ['2015-01-02T03:04:05.006789', 42])
+
+    def test_keyset_filter(self):
+        from common.pagination import keyset_filter
+        q = keyset_filter(('-date', '-id'), ['2015-01-01', 7])
+        self.assertEqual(q.connector, 'OR')
+        self.assertEqual(len(q.children), 2)
+
+
+class SparseFieldsTestCase(unittest.TestCase):
+
+    def test_related_lookups(self):
+        from schools.serializers import SchoolInfoSerializer
+        factory = RequestFactory()
+
+        request = factory.get('/', {'fields': 'id,name,ward'})
+        select_related, prefetch_related = \
+            SchoolInfoSerializer.related_lookups(request)
+        self.assertEqual(select_related, ['electedrep__ward'])
+        self.assertEqual(prefetch_related, [])
+
+        request = factory.get('/', {'omit': 'basic_facilities,meeting_reports'})
+        select_related, prefetch_related = \
+            SchoolInfoSerializer.related_lookups(request)
+        self.assertTrue('address' in select_related)
+        self.assertEqual(prefetch_related, [])
+
+        request = factory.get('/', {'geometry': 'yes', 'fields': 'id'})
+        select_related, prefetch_related = \
+            SchoolInfoSerializer.related_lookups(request)
+        self.assertEqual(select_related, ['instcoord'])
+
+
+class CohortDetailsTestCase(unittest.TestCase):
+
+    class FakeQuerySet(object):
+        def __init__(self, rows):
+            self.rows = rows
+
+        def values(self, *fields):
+            return self
+
+        def annotate(self, **kwargs):
+            return self.rows
+
+    def test_cohort_details(self):
+        from schools.loaders import cohort_details
+        rows = self.FakeQuerySet([
+            {'school': 1, 'assessment': 2, 'studentgroup': '4', 'sex': 'male', 'mt': 'kannada', 'total': 10},
+            {'school': 1, 'assessment': 2, 'studentgroup': '4', 'sex': 'female', 'mt': 'kannada', 'total': 5},
+            {'school': 1, 'assessment': 2, 'studentgroup': '4', 'sex': 'male', 'mt': 'urdu', 'total': 1},
+            {'school': 3, 'assessment': 2, 'studentgroup': '4', 'sex': 'male', 'mt': 'urdu', 'total': 7},
+        ])
+        details = cohort_details(rows, 'school')
+        cohorts = details[(1, 2, '4')]
+        self.assertEqual(cohorts['total'], 16)
+        self.assertEqual(sorted(cohorts['gender']), [
+            {'sex': 'female', 'total': 5}, {'sex': 'male', 'total': 11}])
+        self.assertEqual(sorted(cohorts['mt']), [
+            {'mt': 'kannada', 'total': 15}, {'mt': 'urdu', 'total': 1}])
+        self.assertEqual(details[(3, 2, '4')]['total'], 7)
+
+
+class RenderProfileTestCase(unittest.TestCase):
+
+    def test_render_profile_is_stable(self):
+        from schools.profiles import render_profile
+        first = render_profile({'info': {'name': u'a', 'id': 1}, 'finance': {}})
+        second = render_profile({'finance': {}, 'info': {'id': 1, 'name': u'a'}})
+        self.assertEqual(first, second)
+        self.assertEqual(json.loads(first)['info'], {'id': 1, 'name': u'a'})
+
+
+class SnapshotFileTestCase(unittest.TestCase):
+
+    def test_snapshot_file(self):
+        from schools.snapshots import snapshot_file, snapshot_key
+        params = {'year': '2014-2015', 'id': '1', 'language': 'english'}
+        path = '/api/v1/reports/summary/boundary/'
+        self.assertEqual(
+            snapshot_file(path, params),
+            'api/v1/reports/summary/boundary/'
+            'id=1&language=english&year=2014-2015.json')
+        self.assertEqual(
+            snapshot_key(path, params),
+            path + '?id=1&language=english&year=2014-2015')
+        self.assertEqual(snapshot_file('/api/v1/boundary/admin/1', {}),
+                         'api/v1/boundary/admin/1/index.json')
+
+    def test_gzipped_is_stable(self):
+        import gzip
+        from cStringIO import StringIO
+        from schools.snapshots import gzipped
+        content = json.dumps({'a': 1})
+        self.assertEqual(gzipped(content), gzipped(content))
+        self.assertEqual(
+            gzip.GzipFile(fileobj=StringIO(gzipped(content))).read(), content)
+
+
+class MergeExecutorTestCase(unittest.TestCase):
+
+    def get_executor(self, timeout=None):
+        from schools.merge import MergeExecutor, MergeError
+
+        class SleepingExecutor(MergeExecutor):
+            # /sleep/<seconds>, or /fail
+            def run_endpoint(self, endpoint):
+                if endpoint == '/fail':
+                    raise MergeError('failed', 400)
+                time.sleep(float(endpoint.split('/')[-1]))
+                return endpoint
+
+            def get_cached(self, endpoints):
+                return {}
+
+        return SleepingExecutor(None, None, '/api/v1/', timeout=timeout)
+
+    def test_runs_concurrently(self):
+        endpoints = ['/sleep/0.3', '/sleep/0.2', '/sleep/0.2', '/sleep/0.1']
+        start = time.time()
+        data, errors = self.get_executor().run(endpoints)
+        elapsed = time.time() - start
+        self.assertEqual(sorted(data.keys()), sorted(endpoints))
+        self.assertEqual(errors, {})
+        # about the slowest endpoint, well under the 0.8s they sum up to
+        self.assertTrue(elapsed < 0.6, "merge took %.2fs" % elapsed)
+
+    def test_partial_failure(self):
+        data, errors = self.get_executor(timeout=0.3).run(
+            ['/sleep/0.1', '/sleep/1', '/fail'])
+        self.assertEqual(data.keys(), ['/sleep/0.1'])
+        self.assertEqual(errors['/sleep/1']['status'], 504)
+        self.assertEqual(errors['/fail'], {'status': 400, 'detail': 'failed'})